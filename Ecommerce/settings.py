@@ -50,6 +50,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # أول واحد عشان الـ latency تشمل كل الـ middlewares (شوف /api/metrics/)
+    'EcommerceApi.metrics.MetricsMiddleware',
+    # في الـ DEBUG بس: بيسجل الـ N+1 والـ views اللي عدّت الـ query_budgets (شوف querycheck.py)
+    'EcommerceApi.querycheck.NPlusOneMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -135,7 +139,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # اليوزر والـ roles من الـ token نفسه من غير query (شوف EcommerceApi/authentication.py)
+        'EcommerceApi.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -145,9 +150,24 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 4,
 
+    # orjson هو الافتراضي، و MessagePack بس لو العميل طلبه (Accept: application/msgpack أو ?format=msgpack)
+    'DEFAULT_RENDERER_CLASSES': [
+        'EcommerceApi.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'EcommerceApi.renderers.MessagePackRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'EcommerceApi.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        'EcommerceApi.renderers.MessagePackParser',
+    ],
+
+     # token bucket: رقم واحد لكل key بدل list timestamps (شوف EcommerceApi/throttling.py)
      "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",   # للزوار (غير عاملين لوج إن)
-        "rest_framework.throttling.UserRateThrottle",   # للمستخدمين
+        "EcommerceApi.throttling.AnonBucketThrottle",   # للزوار (غير عاملين لوج إن)
+        "EcommerceApi.throttling.UserBucketThrottle",   # للمستخدمين
+        "EcommerceApi.throttling.ScopedBucketThrottle", # throttle_scope بتاع كل view (cart، order، review، payment)
     ],
     "DEFAULT_THROTTLE_RATES": {
          "anon": "20/minute",   # غير المسجل
@@ -163,6 +183,9 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=12),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=90),
     'AUTH_HEADER_TYPES': ('JWT',),
+    # الـ tokens فيها username و email و roles عشان الـ authentication ما يروحش للداتابيز
+    'TOKEN_OBTAIN_SERIALIZER': 'EcommerceApi.authentication.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'EcommerceApi.authentication.ClaimsTokenRefreshSerializer',
     
 }
 
@@ -178,10 +201,54 @@ EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
 STRIPE_SECRET_KEY ='sk_test_51S9DqtDs1DQyStKVbDBFCM1ktIGOXYNcYZVh5AUIzzHd5FPcCTwjgpEb7vw1AeU93kKLv2EyYY0YbdJc61bl3M8q00Kp7AQoFe'
 
+# 'stripe' أو 'stub' (provider لوكال للـ load tests من غير نت)
+PAYMENT_PROVIDER = 'stripe'
+PAYMENT_TIMEOUT = 10            # أقصى وقت (ثواني) الـ worker يستنى فيه الـ provider
+PAYMENT_MAX_WORKERS = 4         # threads بتكلم الـ provider في كل process
+PAYMENT_BREAKER_THRESHOLD = 5   # عدد مرات الفشل ورا بعض قبل ما الدايرة تتفتح
+PAYMENT_BREAKER_RESET = 30      # ثواني قبل ما نجرب الـ provider تاني
+PAYMENT_STUB_LATENCY = 0
+
+# /api/metrics/
+METRICS_ENABLED = True
+METRICS_TOKEN = None            # Bearer token للـ Prometheus scraper (المانجر يقدر يقرا بالـ JWT بتاعه)
+METRICS_SLOW_REQUEST_MS = 1000  # الريكويستات الأبطأ من كده بتتسجل في اللوج مع الـ SQL (None يقفلها)
+METRICS_SLOW_SAMPLE_RATE = 0.1  # نسبة الريكويستات البطيئة اللي بتتسجل
+
+THROTTLE_ENABLED = True          # False: كل الـ TokenBucketThrottle بتعدي (loadbench من غير --throttle)
+
+QUERY_DETECTOR_ENABLED = DEBUG   # الـ N+1 detector (بيعمل stack trace لكل query متكررة، مش للـ production)
+QUERY_DETECTOR_THRESHOLD = 3     # كام مرة نفس شكل الـ query في ريكويست واحد يعتبر N+1
+QUERY_DETECTOR_RAISE = False     # True: الريكويست يفشل بدل warning في اللوج
+
+# /api/batch/
+BATCH_MAX_REQUESTS = 20         # أقصى عدد sub-requests في الـ batch
+BATCH_MAX_WORKERS = 4           # GETs بتشتغل بالتوازي في كل process
+
 
 CACHES = {
+    # LRU محلي في كل worker قدام الكاش المشترك ('shared')
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-    }
+        'BACKEND': 'EcommerceApi.cache_backends.TwoTierCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {
+            'LOCAL_MAX_BYTES': 32 * 1024 * 1024,
+            'LOCAL_TIMEOUT': 60,
+            # counters والـ throttles لازم تبقى واحدة بين كل الـ workers
+            'SHARED_ONLY_PREFIXES': ['generation:', 'user-roles:', 'throttle_', 'idem:', 'jwt-', 'replica-pin:'],
+        },
+    },
+    # للتجربة لوكال file cache، في البرودكشن يتغير لـ Redis/Memcached
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.django_cache',
+        # الـ default (300 entry) صغير على الـ throttles والـ idempotency keys والـ ETags، ولما يتملى بيمسح
+        # 1/CULL_FREQUENCY من الـ keys عشوائي. الـ token versions في الـ DB (TokenVersion) والكاش قدامها بس
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+            'CULL_FREQUENCY': 10,
+        },
+    },
 }
+# الـ tests بتستخدم كاش مشترك في temp directory (الـ cache.clear() اللي فيها ما يمسحش .django_cache)
+TEST_RUNNER = 'Ecommerce.test_runner.TestRunner'
@@ -0,0 +1,50 @@
+"""
+Production profile على SQLite: DJANGO_SETTINGS_MODULE=Ecommerce.settings_production
+
+- WAL: القراية ما بتستناش الكتابة (الـ checkout وقفل الـ featured item) والعكس.
+- الـ pragmas بتتنفذ مرة لكل connection (EcommerceApi.signals.configure_sqlite) والـ connections
+  بتفضل مفتوحة بين الريكويستات (CONN_MAX_AGE).
+- list و retrieve في الـ viewsets بيقروا من replica (EcommerceApi.db_routers)، والـ replica
+  نسخة من الـ primary بتتعمل بـ `manage.py syncreplica --interval 5` (لازم تتشغل مرة قبل أول ريكويست).
+  الـ lists المتكاشة (cache_page_versioned) بتتبني من الـ primary عشان ما تتخزنش من replica متأخرة.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, MIDDLEWARE, SECRET_KEY
+
+DEBUG = False
+QUERY_DETECTOR_ENABLED = False
+ALLOWED_HOSTS = [host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', 'localhost').split(',') if host]
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', SECRET_KEY)
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',       # مع WAL آمن من الـ corruption، وآخر commit بس ممكن يضيع لو الجهاز وقع
+    'busy_timeout': 5000,          # ms يستنى فيها الكاتب التاني بدل "database is locked" على طول
+    'cache_size': -64000,          # 64MB page cache لكل connection (السالب بالـ KiB)
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+_sqlite = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'CONN_MAX_AGE': 600,
+    'CONN_HEALTH_CHECKS': True,
+    'OPTIONS': {'timeout': 5},     # busy handler بتاع sqlite3.connect (ثواني)
+}
+
+DATABASES = {
+    'default': {**_sqlite, 'NAME': os.environ.get('DJANGO_DB_PATH', BASE_DIR / 'db.sqlite3')},
+    'replica': {
+        **_sqlite,
+        'NAME': os.environ.get('DJANGO_REPLICA_DB_PATH', BASE_DIR / 'db_replica.sqlite3'),
+        # في الـ tests الـ replica هي نفس الـ test database
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_ROUTERS = ['EcommerceApi.db_routers.PrimaryReplicaRouter']
+REPLICA_PIN_SECONDS = 30           # لازم تبقى أطول من الـ --interval بتاع syncreplica
+
+# بعد MetricsMiddleware على طول
+MIDDLEWARE = [MIDDLEWARE[0], 'EcommerceApi.db_routers.ReplicaRoutingMiddleware', *MIDDLEWARE[1:]]
@@ -0,0 +1,21 @@
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """زي DiscoverRunner، بس الكاش المشترك ('shared') في temp directory بيتمسح في الآخر"""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._cache_dir = tempfile.TemporaryDirectory(prefix='ecommerce-test-cache-')
+        shared = {**settings.CACHES['shared'], 'LOCATION': self._cache_dir.name}
+        self._cache_settings = override_settings(CACHES={**settings.CACHES, 'shared': shared})
+        self._cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache_settings.disable()
+        self._cache_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
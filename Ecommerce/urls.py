@@ -21,6 +21,8 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from EcommerceApi.views import RevokeTokensView
+
 schema_view = get_schema_view(
    openapi.Info(
       title="E-Commerce API",
@@ -37,6 +39,7 @@ schema_view = get_schema_view(
 urlpatterns = [
     path('auth/', include('djoser.urls')),
     path('auth/', include('djoser.urls.jwt')),
+    path('auth/jwt/revoke/', RevokeTokensView.as_view(), name='jwt-revoke'),
     path('admin/', admin.site.urls),
     path('api/', include('EcommerceApi.urls')),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
@@ -4,14 +4,16 @@ from .models import MenuItem, Category, Cart, CartItem, Order, OrderItem, MenuIt
 # Register your models here.
 admin.site.register(MenuItem)
 admin.site.register(Category)   
-admin.site.register(Order)
-admin.site.register(OrderItem)
 admin.site.register(MenuItemReview)
 
 class CartItemInline(admin.TabularInline):  # أو StackedInline
     model = CartItem
     extra = 0
 
+    def get_queryset(self, request):
+        # CartItem.__str__ بيقرا menuitem و cart.user لكل سطر
+        return super().get_queryset(request).select_related('menuitem', 'cart__user')
+
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
     list_display = ('user',)
@@ -19,4 +21,12 @@ class CartAdmin(admin.ModelAdmin):
 
 @admin.register(CartItem)
 class CartItemAdmin(admin.ModelAdmin):
-    list_display = ('cart', 'menuitem', 'quantity')
\ No newline at end of file
+    list_display = ('cart', 'menuitem', 'quantity')
+# Order.__str__ و OrderItem.__str__ بيقروا relations، فالـ changelist بيجيبها في نفس الـ query
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_select_related = ('user',)
+
+@admin.register(OrderItem)
+class OrderItemAdmin(admin.ModelAdmin):
+    list_select_related = ('menuitem',)
@@ -0,0 +1,197 @@
+from decimal import Decimal
+
+from django.db import connections, router, transaction
+from django.db.models import Case, Count, F, Q, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import OrderItem, DailySalesRollup, CategorySalesRollup, MenuItemSalesRollup
+
+DELIVERED = 1
+# الأعمدة اللي الـ upsert بيزوّدها، آخر حاجة في كل صف وبنفس الترتيب ده
+COUNTERS = ('quantity', 'revenue', 'order_count', 'delivered_quantity', 'delivered_revenue', 'delivered_order_count')
+MONEY = ('revenue', 'delivered_revenue')
+# الجدول، الـ keys بتاعة الـ ON CONFLICT، والحقول اللي قبل العدادات في كل صف
+DAILY_ROLLUP = (DailySalesRollup, ('day',), ('day',))
+CATEGORY_ROLLUP = (CategorySalesRollup, ('day', 'category'), ('day', 'category'))
+MENUITEM_ROLLUP = (MenuItemSalesRollup, ('day', 'menuitem'), ('day', 'menuitem', 'category'))
+REPORT_GROUPS = {
+    'day': (DailySalesRollup, ('day',)),
+    'category': (CategorySalesRollup, ('category_id', 'category__name')),
+    'menuitem': (MenuItemSalesRollup, ('menuitem_id', 'menuitem__title', 'category_id')),
+}
+REBUILD_BATCH_SIZE = 5000
+
+
+def _upsert(rollup, rows):
+    """
+    INSERT ... ON CONFLICT (keys) DO UPDATE بيزوّد العدادات بالـ deltas اللي في الصف
+    (bulk_create(update_conflicts) بيكتب القيمة فوق القديمة بدل ما يجمع). query واحدة لكل جدول.
+    الـ category في جدول الـ menu items بتفضل بتاعة أول بيعة في اليوم.
+    """
+    model, keys, fields = rollup
+    if not rows:
+        return
+    connection = connections[router.db_for_write(model)]
+    ops, meta = connection.ops, model._meta
+    table = ops.quote_name(meta.db_table)
+    column = {name: ops.quote_name(meta.get_field(name).column) for name in (*fields, *COUNTERS)}
+    sql = 'INSERT INTO %s (%s) VALUES (%s) ON CONFLICT (%s) DO UPDATE SET %s' % (
+        table,
+        ', '.join(column[name] for name in (*fields, *COUNTERS)),
+        ', '.join(['%s'] * (len(fields) + len(COUNTERS))),
+        ', '.join(column[name] for name in keys),
+        ', '.join(f'{column[name]} = {table}.{column[name]} + excluded.{column[name]}' for name in COUNTERS),
+    )
+    revenue = meta.get_field('revenue')
+    money = {len(fields) + COUNTERS.index(name) for name in MONEY}
+    params = [
+        [ops.adapt_datefield_value(row[0])] + [
+            ops.adapt_decimalfield_value(Decimal(value), revenue.max_digits, revenue.decimal_places) if index in money else value
+            for index, value in enumerate(row[1:], 1)
+        ]
+        for row in rows
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def _combine(lines):
+    """مجموع الـ deltas بتاعة items أوردر واحد، والأوردر نفسه بيتحسب مرة واحدة (±1)"""
+    total = [sum(column) for column in zip(*lines)]
+    for index in (COUNTERS.index('order_count'), COUNTERS.index('delivered_order_count')):
+        total[index] = max(-1, min(1, total[index]))
+    return total
+
+
+def _record(day, lines):
+    """lines: (menuitem_id, category_id, deltas بترتيب COUNTERS) لأوردر واحد → upsert في التلات جداول"""
+    if not lines:
+        return
+    categories = {}
+    for _, category_id, deltas in lines:
+        categories.setdefault(category_id, []).append(deltas)
+    _upsert(MENUITEM_ROLLUP, [(day, menuitem_id, category_id, *deltas) for menuitem_id, category_id, deltas in lines])
+    _upsert(CATEGORY_ROLLUP, [(day, category_id, *_combine(deltas)) for category_id, deltas in categories.items()])
+    _upsert(DAILY_ROLLUP, [(day, *_combine([deltas for _, _, deltas in lines]))])
+
+
+def record_order(order, items):
+    """
+    أوردر جديد (OrderSerializer.create): items هي الـ OrderItems ومعاها الـ menuitem،
+    فمفيش قراية، بس الـ upserts.
+    """
+    delivered = order.status == DELIVERED
+    _record(timezone.localdate(order.created_at), [
+        (item.menuitem_id, item.menuitem.category_id,
+         (item.quantity, item.price, 1, *((item.quantity, item.price, 1) if delivered else (0, 0, 0))))
+        for item in items
+    ])
+
+
+def _order_lines(order):
+    """
+    (menuitem_id, category_id, quantity, price) لكل item في الأوردر: من الـ items المحملة لو اتعملها
+    prefetch مع الـ menuitem (الـ view اللي بيغيّر الـ status بيجيبها للـ response أصلا)، وإلا query واحدة.
+    """
+    items = getattr(order, '_prefetched_objects_cache', {}).get('items')
+    if items is not None and all(not item.get_deferred_fields() and OrderItem.menuitem.is_cached(item) for item in items):
+        return [(item.menuitem_id, item.menuitem.category_id, item.quantity, item.price) for item in items]
+    return OrderItem.objects.filter(order_id=order.pk).values_list('menuitem_id', 'menuitem__category_id', 'quantity', 'price')
+
+
+def record_status_change(order, old_status, new_status):
+    """الـ delivered_* بتزيد لما الأوردر يتسلم وبتقل لو رجع out for delivery"""
+    if (old_status == DELIVERED) == (new_status == DELIVERED):
+        return
+    sign = 1 if new_status == DELIVERED else -1
+    _record(timezone.localdate(order.created_at), [
+        (menuitem_id, category_id, (0, 0, 0, sign * quantity, sign * price, sign))
+        for menuitem_id, category_id, quantity, price in _order_lines(order)
+    ])
+
+
+def record_order_deleted(order):
+    """عكس record_order: الأوردر بيتشال من الأرقام كلها (ومن الـ delivered_* لو كان متسلم)"""
+    delivered = order.status == DELIVERED
+    _record(timezone.localdate(order.created_at), [
+        (menuitem_id, category_id,
+         (-quantity, -price, -1, *((-quantity, -price, -1) if delivered else (0, 0, 0))))
+        for menuitem_id, category_id, quantity, price in _order_lines(order)
+    ])
+
+
+def _rebuild_table(model, group_fields, start, end):
+    delivered = Q(order__status=DELIVERED)
+    items = OrderItem.objects.annotate(sale_day=TruncDate('order__created_at'))
+    rollups = model.objects.all()
+    if start is not None:
+        items, rollups = items.filter(sale_day__gte=start), rollups.filter(day__gte=start)
+    if end is not None:
+        items, rollups = items.filter(sale_day__lte=end), rollups.filter(day__lte=end)
+    rows = items.values('sale_day', *group_fields.values()).annotate(
+        total_quantity=Sum('quantity'),
+        total_revenue=Sum('price'),
+        total_order_count=Count('order_id', distinct=True),
+        total_delivered_quantity=Sum(Case(When(delivered, then=F('quantity')), default=0)),
+        total_delivered_revenue=Sum(Case(When(delivered, then=F('price')), default=Decimal(0))),
+        total_delivered_order_count=Count('order_id', distinct=True, filter=delivered),
+    ).order_by()
+
+    rollups.delete()
+    created, batch = 0, []
+    for row in rows.iterator(chunk_size=REBUILD_BATCH_SIZE):
+        batch.append(model(
+            day=row['sale_day'],
+            **{field: row[source] for field, source in group_fields.items()},
+            **{name: row['total_' + name] for name in COUNTERS},
+        ))
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            created += len(model.objects.bulk_create(batch))
+            batch = []
+    return created + len(model.objects.bulk_create(batch))
+
+
+def rebuild(start=None, end=None):
+    """
+    بيمسح الـ rollups في الفترة دي (الأيام كلها لو None) ويحسبها تاني من الأوردرات (للـ backfill،
+    أو بعد bulk_create أو update() أو SQL مباشر لأن دول ما بيبعتوش signals فما بيحدثوش الـ rollups). التلات جداول في transaction واحدة
+    فالـ checkout اللي بيحصل في النص بيستنى بدل ما يتحسب مرتين أو يضيع. بيرجع عدد الصفوف لكل جدول.
+    """
+    with transaction.atomic(using=router.db_for_write(DailySalesRollup)):
+        return {
+            'days': _rebuild_table(DailySalesRollup, {}, start, end),
+            'categories': _rebuild_table(CategorySalesRollup, {'category_id': 'menuitem__category_id'}, start, end),
+            'menu_items': _rebuild_table(
+                MenuItemSalesRollup, {'menuitem_id': 'menuitem_id', 'category_id': 'menuitem__category_id'}, start, end,
+            ),
+        }
+
+
+def _money(value):
+    return f'{(value or Decimal(0)).quantize(Decimal("0.01"))}'
+
+
+def _counters(row):
+    return {name: _money(row['total_' + name]) if name in MONEY else row['total_' + name] or 0 for name in COUNTERS}
+
+
+def sales_report(start, end, group_by='day', limit=None):
+    """
+    الإجماليات والمبيعات مجمعة (يوم، category أو menu item) من الـ rollups بس: queryين على صفوف
+    الفترة دي. الإجماليات والأيام من الجدول اليومي، والـ category والـ menu items من جداولهم
+    (أعلى limit في الإيرادات).
+    """
+    model, fields = REPORT_GROUPS[group_by]
+    sums = {'total_' + name: Sum(name) for name in COUNTERS}
+    totals = DailySalesRollup.objects.filter(day__gte=start, day__lte=end).aggregate(**sums)
+
+    grouped = model.objects.filter(day__gte=start, day__lte=end).values(*fields).annotate(**sums)
+    if group_by == 'day':
+        grouped = grouped.order_by('day')
+    else:
+        grouped = grouped.order_by('-total_revenue', fields[0])[:limit]
+
+    labels = {'category__name': 'category', 'menuitem__title': 'menuitem'}
+    results = [{**{labels.get(field, field): row[field] for field in fields}, **_counters(row)} for row in grouped]
+    return {'start': start, 'end': end, 'group_by': group_by, 'totals': _counters(totals), 'results': results}
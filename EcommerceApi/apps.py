@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class LittlelemonapiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'EcommerceApi'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .search import ensure_fts_triggers
+        post_migrate.connect(ensure_fts_triggers, sender=self)
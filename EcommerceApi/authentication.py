@@ -0,0 +1,143 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router, transaction
+from django.db.models import F
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import TokenVersion
+from .roles import get_roles
+
+User = get_user_model()
+
+# أعمدة اليوزر اللي بتتحط في الـ token (أي عمود تاني بيتقرا من الداتابيز لما حد يحتاجه)
+CLAIM_FIELDS = ('username', 'email', 'is_staff', 'is_superuser')
+ROLES_CLAIM = 'roles'
+CLAIMS_VERSION_CLAIM = 'cv'
+TOKENS_VERSION_CLAIM = 'tv'
+
+# versions لكل يوزر في جدول TokenVersion، والكاش المشترك قدامه (القراية في كل ريكويست)
+VERSIONS_KEY = 'jwt-versions:{}'
+VERSIONS_CACHE_TIMEOUT = 60 * 15
+
+
+def _versions(user_id):
+    """(claims_version, tokens_version): من الكاش، ولو مش موجود (أو اتعمله cull) من الداتابيز"""
+    key = VERSIONS_KEY.format(user_id)
+    versions = cache.get(key)
+    if versions is None:
+        versions = TokenVersion.objects.filter(user_id=user_id).values_list(
+            'claims_version', 'tokens_version',
+        ).first() or (0, 0)
+        cache.set(key, versions, VERSIONS_CACHE_TIMEOUT)
+    return versions
+
+
+def _bump(user_ids, *fields):
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    with transaction.atomic():
+        TokenVersion.objects.bulk_create([TokenVersion(user_id=pk) for pk in user_ids], ignore_conflicts=True)
+        TokenVersion.objects.filter(user_id__in=user_ids).update(**{field: F(field) + 1 for field in fields})
+    keys = [VERSIONS_KEY.format(pk) for pk in user_ids]
+    # دلوقتي عشان الريكويست ده، وبعد الـ commit عشان أي قراية في النص تكون خزنت الـ version القديمة
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def expire_claims(user_ids):
+    """الـ access tokens الحالية بترجع 401 والعميل يعمل refresh ياخد claims جديدة"""
+    _bump(user_ids, 'claims_version')
+
+
+def revoke_tokens(user_ids):
+    """كل الـ tokens (access و refresh) بتاعة اليوزرز دول بتترفض، ولازم login تاني"""
+    _bump(user_ids, 'claims_version', 'tokens_version')
+
+
+def set_claims(token, user):
+    claims_version, tokens_version = _versions(user.pk)
+    for field in CLAIM_FIELDS:
+        token[field] = getattr(user, field)
+    token[ROLES_CLAIM] = sorted(get_roles(user))
+    token[CLAIMS_VERSION_CLAIM] = claims_version
+    token[TOKENS_VERSION_CLAIM] = tokens_version
+    return token
+
+
+def claims_user(token):
+    """
+    User من الـ claims من غير query: instance حقيقي (ينفع في الـ FKs والـ filters و save())
+    بس كل الأعمدة اللي مش في الـ token deferred وبتتحمل من الداتابيز أول ما تتقرا.
+    """
+    data = {field: token[field] for field in CLAIM_FIELDS}
+    data['id'] = User._meta.pk.to_python(token[api_settings.USER_ID_CLAIM])
+    data['is_active'] = True  # اليوزر الـ inactive ما بياخدش token، والـ deactivate بيعمل revoke
+    fields = [field.attname for field in User._meta.concrete_fields if field.attname in data]
+    user = User.from_db(router.db_for_read(User), fields, [data[name] for name in fields])
+    # نفس الـ cache اللي roles.get_roles بتستخدمه، فـ is_manager و is_delivery_crew ما بيعملوش query
+    user._roles_cache = frozenset(token[ROLES_CLAIM])
+    return user
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    زي JWTAuthentication بس اليوزر بيتبني من الـ claims بدل User.objects.get في كل ريكويست.
+    الشيء الوحيد اللي بيتقرا في كل ريكويست هو الـ versions من الكاش المشترك (أو TokenVersion).
+    الـ tokens القديمة اللي مافيهاش claims بتتعامل زي الأول (من الداتابيز).
+    """
+
+    def get_user(self, validated_token):
+        if ROLES_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        claims_version, _tokens_version = _versions(user_id)
+        if validated_token.get(CLAIMS_VERSION_CLAIM, 0) < claims_version:
+            raise AuthenticationFailed(_("Token claims are out of date."), code="token_expired_claims")
+        return claims_user(validated_token)
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return set_claims(super().get_token(user), user)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    الـ access token الجديد بياخد الـ claims من الداتابيز دلوقتي (مش من الـ refresh token)،
+    فأي تغيير في الـ roles بيظهر بعد refresh واحد.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first() if user_id else None
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+        if refresh.payload.get(TOKENS_VERSION_CLAIM, 0) < _versions(user.pk)[1]:
+            raise AuthenticationFailed(_("Token has been revoked."), code="token_revoked")
+
+        data = {"access": str(set_claims(refresh.access_token, user))}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    pass
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            set_claims(refresh, user)
+            data["refresh"] = str(refresh)
+        return data
+
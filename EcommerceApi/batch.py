@@ -0,0 +1,185 @@
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.urls import resolve, Resolver404
+from django.http import HttpResponse
+from rest_framework import permissions, serializers
+from rest_framework.views import APIView
+
+logger = logging.getLogger(__name__)
+
+BATCH_PREFIX = '/api/'
+SAFE_METHODS = ('GET', 'HEAD')
+
+# headers العميل يقدر يبعتها لكل sub-request لوحده
+FORWARDED_HEADERS = ('If-None-Match', 'Idempotency-Key')
+# headers بنرجعها من كل sub-response
+RETURNED_HEADERS = ('ETag', 'Location', 'Retry-After', 'Idempotent-Replayed')
+
+# headers الـ batch نفسه اللي ما ينفعش تتنقل للـ sub-requests
+_DROPPED_META = ('HTTP_AUTHORIZATION', 'HTTP_COOKIE', 'HTTP_IF_NONE_MATCH', 'HTTP_IDEMPOTENCY_KEY', 'CONTENT_TYPE', 'CONTENT_LENGTH')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_setting('BATCH_MAX_WORKERS', 4), thread_name_prefix='batch')
+        return _executor
+
+
+class SubRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE'], default='GET')
+    path = serializers.CharField(max_length=2000)
+    body = serializers.JSONField(required=False, default=None)
+    headers = serializers.DictField(child=serializers.CharField(max_length=255), required=False, default=dict)
+
+    def validate_path(self, value):
+        path = urlsplit(value).path
+        if not path.startswith(BATCH_PREFIX):
+            raise serializers.ValidationError('Only %s endpoints can be batched.' % BATCH_PREFIX)
+        try:
+            match = resolve(path)
+        except Resolver404:
+            raise serializers.ValidationError('Not found.')
+        if getattr(match.func, 'view_class', None) is BatchView:
+            raise serializers.ValidationError('Batches cannot be nested.')
+        return value
+
+    def validate_headers(self, value):
+        unknown = set(value) - set(FORWARDED_HEADERS)
+        if unknown:
+            raise serializers.ValidationError('Unsupported headers: %s' % ', '.join(sorted(unknown)))
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = SubRequestSerializer(many=True, allow_empty=False)
+
+    def validate_requests(self, value):
+        max_requests = _setting('BATCH_MAX_REQUESTS', 20)
+        if len(value) > max_requests:
+            raise serializers.ValidationError('At most %d requests per batch.' % max_requests)
+        return value
+
+
+class BatchView(APIView):
+    """
+    POST /api/batch/ {"requests": [{"method": "GET", "path": "/api/menu-items/?page_size=5"}, ...]}
+
+    كل sub-request بيتبعت لنفس الـ view اللي الـ router بيوصله، بس من غير round trip
+    ولا middleware ولا JWT decode تاني: اليوزر اللي اتعمله authenticate مرة واحدة للـ batch
+    بيتحط على كل sub-request. الـ permissions والـ throttles بتاعة كل view بتشتغل عادي.
+
+    الـ GETs اللي ورا بعض بتشتغل بالتوازي، وأي كتابة بتستنى اللي قبلها وبتتنفذ بالترتيب.
+    الرد: {"responses": [{"status": ..., "headers": {...}, "body": ...}, ...]} بنفس ترتيب الطلبات.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sub_requests = [self._build_request(request, item) for item in serializer.validated_data['requests']]
+
+        results = [None] * len(sub_requests)
+        pending_reads = []
+        for index, sub_request in enumerate(sub_requests):
+            if sub_request.method in SAFE_METHODS:
+                pending_reads.append(index)
+                continue
+            self._run_reads(sub_requests, pending_reads, results)
+            pending_reads = []
+            results[index] = _dispatch(sub_request)
+        self._run_reads(sub_requests, pending_reads, results)
+
+        # الـ bodies جاهزة JSON فبنلزقها زي ما هي بدل parse ثم render تاني
+        parts = [b'{"responses":[']
+        for i, (status_code, headers, body) in enumerate(results):
+            if i:
+                parts.append(b',')
+            parts.append(json.dumps({'status': status_code, 'headers': headers}, separators=(',', ':'))[:-1].encode())
+            parts.append(b',"body":')
+            parts.append(body)
+            parts.append(b'}')
+        parts.append(b']}')
+        return HttpResponse(b''.join(parts), content_type='application/json')
+
+    @staticmethod
+    def _run_reads(sub_requests, indexes, results):
+        if len(indexes) < 2 or _setting('BATCH_MAX_WORKERS', 4) <= 1:
+            for index in indexes:
+                results[index] = _dispatch(sub_requests[index])
+            return
+        executor = _get_executor()
+        futures = {index: executor.submit(_dispatch_in_thread, sub_requests[index]) for index in indexes}
+        for index, future in futures.items():
+            results[index] = future.result()
+
+    @staticmethod
+    def _build_request(request, item):
+        parts = urlsplit(item['path'])
+        body = b'' if item['body'] is None else json.dumps(item['body']).encode()
+
+        environ = {key: value for key, value in request.META.items() if key not in _DROPPED_META}
+        environ.update({
+            'REQUEST_METHOD': item['method'],
+            'PATH_INFO': parts.path,
+            'QUERY_STRING': parts.query,
+            'HTTP_ACCEPT': 'application/json',
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': BytesIO(body),
+        })
+        for name, value in item['headers'].items():
+            environ['HTTP_' + name.upper().replace('-', '_')] = value
+
+        sub_request = WSGIRequest(environ)
+        # DRF بتستخدم الـ forced auth بدل الـ authenticators (زي APIClient.force_authenticate)
+        sub_request._force_auth_user = request.user
+        sub_request._force_auth_token = request.auth
+        return sub_request
+
+
+def _dispatch(sub_request):
+    match = resolve(sub_request.path_info)
+    try:
+        response = match.func(sub_request, *match.args, **match.kwargs)
+        if hasattr(response, 'render') and not response.is_rendered:
+            response = response.render()  # ممكن يرجع response تاني (الـ 304 بتاع cache_page_versioned)
+    except Exception:
+        # زي الـ 500 العادية: الـ traceback في اللوج، والـ batch نفسه بيكمل باقي الطلبات
+        logger.exception("Error in batch sub-request %s %s", sub_request.method, sub_request.path)
+        return 500, {}, b'{"detail":"A server error occurred."}'
+
+    content = b''.join(response.streaming_content) if response.streaming else response.content
+    if not content:
+        body = b'null'
+    elif response.get('Content-Type', '').startswith('application/json'):
+        body = content
+    else:
+        body = json.dumps(content.decode(response.charset, errors='replace')).encode()
+    headers = {name: response[name] for name in RETURNED_HEADERS if response.has_header(name)}
+    return response.status_code, headers, body
+
+
+def _dispatch_in_thread(sub_request):
+    try:
+        return _dispatch(sub_request)
+    finally:
+        # الـ DB connections بتاعة الـ thread ده ما تفضلش مفتوحة بين الـ batches
+        connections.close_all()
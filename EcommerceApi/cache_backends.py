@@ -0,0 +1,175 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+_MISSING = object()
+
+
+class LocalLRU:
+    """LRU محدود بالحجم، واحد لكل process ومشترك بين كل الـ threads (زي LocMemCache)"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, pickled)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0}
+
+    def count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, pickled = entry
+            if expires_at < time.monotonic():
+                self._delete(key)
+                return _MISSING
+            self._entries.move_to_end(key)
+            self._stats["local_hits"] += 1
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(pickled) > self.max_bytes:
+            return
+        with self._lock:
+            self._delete(key)
+            self._entries[key] = (time.monotonic() + timeout, pickled)
+            self._bytes += len(pickled)
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._stats["evictions"] += 1
+
+    def has_key(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] >= time.monotonic()
+
+    def delete(self, key):
+        with self._lock:
+            self._delete(key)
+
+    def _delete(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "local_entries": len(self._entries),
+                "local_bytes": self._bytes,
+                "local_max_bytes": self.max_bytes,
+            }
+
+
+_local_tiers = {}
+_local_tiers_lock = threading.Lock()
+
+
+class TwoTierCache(BaseCache):
+    """
+    كاش على مستويين: LRU صغير جوه كل process قدام cache مشترك بين الـ workers.
+
+    LOCATION هو اسم الـ alias بتاع الكاش المشترك في CACHES.
+    OPTIONS:
+        LOCAL_MAX_BYTES: أقصى حجم للـ LRU المحلي (بالـ bytes بعد الـ pickle)
+        LOCAL_TIMEOUT: أقصى مدة يفضل فيها entry في الـ LRU المحلي
+        SHARED_ONLY_PREFIXES: keys بتتغير كتير أو لازم تبقى متزامنة بين الـ workers
+            (counters، throttles...) فما بتتخزنش محليًا خالص
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._shared_alias = location
+        self._local_timeout = options.get("LOCAL_TIMEOUT", 60)
+        self._shared_only_prefixes = tuple(options.get("SHARED_ONLY_PREFIXES", ()))
+        # Django بيعمل instance لكل thread، فالـ LRU نفسه لازم يكون على مستوى الـ process
+        max_bytes = options.get("LOCAL_MAX_BYTES", 16 * 1024 * 1024)
+        with _local_tiers_lock:
+            self._local = _local_tiers.setdefault((location, max_bytes), LocalLRU(max_bytes))
+
+    @property
+    def _shared(self):
+        return caches[self._shared_alias]
+
+    def _is_shared_only(self, key):
+        return key.startswith(self._shared_only_prefixes)
+
+    def _local_set(self, key, value, timeout, version):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        timeout = self._local_timeout if timeout is None else min(timeout, self._local_timeout)
+        if timeout > 0:
+            self._local.set(self.make_and_validate_key(key, version=version), value, timeout)
+
+    def _local_discard(self, key, version):
+        self._local.delete(self.make_and_validate_key(key, version=version))
+
+    def get(self, key, default=None, version=None):
+        if self._is_shared_only(key):
+            return self._shared.get(key, default, version=version)
+
+        value = self._local.get(self.make_and_validate_key(key, version=version))
+        if value is not _MISSING:
+            return value
+
+        value = self._shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            self._local.count("misses")
+            return default
+        self._local.count("shared_hits")
+        self._local_set(key, value, DEFAULT_TIMEOUT, version)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._shared.set(key, value, timeout, version=version)
+        if not self._is_shared_only(key):
+            self._local_set(key, value, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local_discard(key, version)
+        return self._shared.add(key, value, timeout, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._local_discard(key, version)
+        return self._shared.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        if not self._is_shared_only(key) and self._local.has_key(self.make_and_validate_key(key, version=version)):
+            return True
+        return self._shared.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._local_discard(key, version)
+        return self._shared.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self._local_discard(key, version)
+        return self._shared.decr(key, delta, version=version)
+
+    def clear(self):
+        self._local.clear()
+        self._shared.clear()
+
+    def stats(self):
+        return self._local.stats()
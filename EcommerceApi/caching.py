@@ -0,0 +1,123 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+
+from .db_routers import primary_reads
+from .metrics import mark
+
+MENU_ITEMS = "menu-items"
+CATEGORIES = "categories"
+REVIEWS = "reviews"
+
+GENERATION_KEY = "generation:{}"
+RESPONSE_KEY = "viewcache:{}"
+
+
+def _initial_generation():
+    # بنبدأ من الوقت الحالي عشان لو الكاش اتمسح ما نرجعش لرقم قديم ونقرا entries قديمة
+    return int(time.time() * 1000)
+
+
+def get_generations(resources):
+    keys = [GENERATION_KEY.format(resource) for resource in resources]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, _initial_generation(), None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def _incr_generation(resource):
+    key = GENERATION_KEY.format(resource)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_generation(), None)
+
+
+def bump_generation(*resources):
+    """
+    أي كتابة على الـ resource بتغيّر الـ generation فكل الـ cache keys القديمة تتهمل.
+    بعد الـ commit بس (أو على طول لو مفيش transaction): أي ريكويست قرا قبلها اتخزن على
+    الـ generation القديمة، ومفيش حد يقرا الجديدة قبل ما الداتا الجديدة تبان.
+    """
+    transaction.on_commit(lambda: [_incr_generation(resource) for resource in resources])
+
+
+def _etag_matches(request, etag):
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return etag in etags or "*" in etags
+
+
+def cache_page_versioned(timeout, *resources):
+    """
+    بديل cache_page: الـ key فيه الـ generation بتاعة كل resource، فالكاش يفضل صالح
+    لحد ما يحصل save/delete بدل ما نعتمد على TTL قصير.
+    كمان بيرجع ETag قوي و 304 لو العميل عنده نفس النسخة.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view_func(request, *args, **kwargs)
+
+            generations = get_generations(resources)
+            raw_key = "|".join([
+                request.get_full_path(),
+                request.META.get("HTTP_ACCEPT", ""),
+                *map(str, generations),
+            ])
+            key = RESPONSE_KEY.format(hashlib.md5(raw_key.encode()).hexdigest())
+
+            entry = cache.get(key)
+            mark(request, "cache", "miss" if entry is None else "hit")
+            if entry is not None:
+                if _etag_matches(request, entry["etag"]):
+                    response = HttpResponseNotModified()
+                else:
+                    response = HttpResponse(entry["content"], content_type=entry["content_type"])
+                response["ETag"] = entry["etag"]
+                patch_cache_control(response, no_cache=True)
+                return response
+
+            # الـ entry بيفضل لحد الكتابة الجاية (ساعات)، فما ينفعش يتبني من replica متأخرة
+            # عن الكتابة اللي غيرت الـ generation؛ الـ misses قليلة فالـ primary مستحملها
+            with primary_reads():
+                response = view_func(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+            def _store(rendered):
+                etag = quote_etag(hashlib.sha1(rendered.content).hexdigest())
+                rendered["ETag"] = etag
+                cache.set(key, {
+                    "content": rendered.content,
+                    "content_type": rendered["Content-Type"],
+                    "etag": etag,
+                }, timeout)
+                # miss بس العميل عنده نفس النسخة (مثلا الـ generation اتغيرت بسبب resource تاني)
+                if _etag_matches(request, etag):
+                    not_modified = HttpResponseNotModified()
+                    for header in ("ETag", "Cache-Control", "Vary"):
+                        if rendered.has_header(header):
+                            not_modified[header] = rendered[header]
+                    return not_modified
+
+            patch_cache_control(response, no_cache=True)
+            # الـ callback بيرجع الـ 304 مكان الـ response بعد الـ render (SimpleTemplateResponse.render)
+            if hasattr(response, "add_post_render_callback"):
+                response.add_post_render_callback(_store)
+                return response
+            return _store(response) or response
+        return _wrapped_view
+    return decorator
@@ -0,0 +1,257 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from .caching import MENU_ITEMS, CATEGORIES, bump_generation
+from .models import MenuItem, Category
+
+CSV, NDJSON = 'csv', 'ndjson'
+FORMATS = (CSV, NDJSON)
+CONTENT_TYPES = {CSV: 'text/csv', NDJSON: 'application/x-ndjson'}
+
+MENU_ITEM_FIELDS = ['id', 'title', 'price', 'inventory', 'category']
+CATEGORY_FIELDS = ['id', 'name']
+
+# الـ featured مش جزء من الكتالوج: ليه قيد (منتج واحد بس) وبيتظبط من الـ API
+RESOURCES = {
+    'menu-items': MENU_ITEM_FIELDS,
+    'categories': CATEGORY_FIELDS,
+}
+
+DEFAULT_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 2000
+MAX_REPORTED_ERRORS = 100
+
+
+class _Echo:
+    """csv.writer بيكتب فيه وبيرجع السطر بدل ما يخزنه"""
+
+    def write(self, value):
+        return value
+
+
+# ---- export ----
+
+def export_rows(resource):
+    """صفوف الكتالوج مرتبة بالـ id من server-side iterator (الميموري ثابتة مهما كان الحجم)"""
+    if resource == 'categories':
+        queryset = Category.objects.order_by('id').values_list('id', 'name')
+    else:
+        queryset = MenuItem.objects.order_by('id').values_list('id', 'title', 'price', 'inventory', 'category__name')
+    for row in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield dict(zip(RESOURCES[resource], row))
+
+
+def export_catalog(resource, fmt):
+    """generator بيطلع الكتالوج سطر سطر (CSV بـ header أو NDJSON)"""
+    fields = RESOURCES[resource]
+    if fmt == CSV:
+        writer = csv.writer(_Echo())
+        yield writer.writerow(fields)
+        for row in export_rows(resource):
+            yield writer.writerow([row[field] for field in fields])
+    else:
+        for row in export_rows(resource):
+            yield json.dumps(row, default=str, ensure_ascii=False) + '\n'
+
+
+# ---- import ----
+
+def read_rows(lines, fmt):
+    """(رقم السطر, dict) من أي iterable of str، من غير ما نقرا الملف كله في الميموري"""
+    if fmt == CSV:
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None
+            continue
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def decode_lines(chunks, encoding='utf-8'):
+    """سطور نصية من bytes (ملف مرفوع أو body الريكويست)"""
+    return io.TextIOWrapper(_BytesReader(chunks), encoding=encoding, newline='')
+
+
+class _BytesReader(io.RawIOBase):
+    """يلف أي iterable of bytes كـ stream عشان TextIOWrapper يقسمه سطور"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+class RowError(ValueError):
+    pass
+
+
+class CatalogImporter:
+    """
+    Import للـ menu items أو الـ categories على batches ثابتة الحجم:
+    كل batch بيتعمله upsert بـ bulk_create(update_conflicts) على الـ id (صف من غير id بيتضاف جديد).
+    الـ categories بتتجاب من map في الميموري بالاسم (واللي مش موجودة بتتعمل)،
+    والصفوف الغلط بتتسجل في errors ويتعداها من غير ما توقف الباقي.
+
+    progress(processed, errors) بتتنده بعد كل batch.
+    """
+
+    def __init__(self, resource, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+        self.resource = resource
+        self.batch_size = batch_size
+        self.progress = progress
+        self.processed = 0
+        self.error_count = 0
+        self.errors = []
+        self._categories = None
+
+    # ---- categories map ----
+
+    def _category_id(self, name):
+        if self._categories is None:
+            self._categories = {}
+            for pk, category_name in Category.objects.order_by('-id').values_list('id', 'name'):
+                self._categories[category_name] = pk
+        if name not in self._categories:
+            self._categories[name] = Category.objects.create(name=name).pk
+        return self._categories[name]
+
+    # ---- row parsing ----
+
+    @staticmethod
+    def _text(row, field, max_length):
+        value = row.get(field)
+        value = '' if value is None else str(value).strip()
+        if not value:
+            raise RowError(f'{field} is required')
+        if len(value) > max_length:
+            raise RowError(f'{field} is longer than {max_length} characters')
+        return value
+
+    @staticmethod
+    def _id(row):
+        value = row.get('id')
+        if value in (None, ''):
+            return None
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise RowError('id must be an integer')
+        if value < 1:
+            raise RowError('id must be positive')
+        return value
+
+    def _menu_item(self, row):
+        try:
+            price = Decimal(str(row.get('price')))
+        except (InvalidOperation, ValueError):
+            raise RowError('price must be a number')
+        if not price.is_finite() or price < 0 or price.as_tuple().exponent < -2 or price >= 10 ** 6:
+            raise RowError('price must be between 0 and 999999.99 with at most 2 decimals')
+        try:
+            inventory = int(row.get('inventory'))
+        except (TypeError, ValueError):
+            raise RowError('inventory must be an integer')
+
+        return MenuItem(
+            id=self._id(row),
+            title=self._text(row, 'title', 120),
+            price=price,
+            inventory=inventory,
+            category_id=self._category_id(self._text(row, 'category', 100)),
+        )
+
+    def _category(self, row):
+        return Category(id=self._id(row), name=self._text(row, 'name', 100))
+
+    # ---- batches ----
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        model = type(batch[0])
+        update_fields = ['name'] if model is Category else ['title', 'price', 'inventory', 'category']
+        with transaction.atomic():
+            for with_id in (True, False):
+                objs = [obj for obj in batch if (obj.pk is not None) == with_id]
+                if not objs:
+                    continue
+                if with_id:
+                    model.objects.bulk_create(
+                        objs, update_conflicts=True, unique_fields=['id'], update_fields=update_fields,
+                    )
+                else:
+                    model.objects.bulk_create(objs)
+        self.processed += len(batch)
+        if self.progress:
+            self.progress(self.processed, self.error_count)
+
+    def _record_error(self, line_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line_number, 'error': message})
+
+    def run(self, lines, fmt):
+        try:
+            self._run(lines, fmt)
+        finally:
+            # bulk_create ما بيبعتش signals، فالكاش لازم يتهمل هنا، حتى لو ملف بايظ وقّف الـ import
+            # في النص (الـ batches اللي قبله اتحفظت)
+            if self.processed:
+                bump_generation(MENU_ITEMS, CATEGORIES)
+        return self.summary()
+
+    def _run(self, lines, fmt):
+        build = self._category if self.resource == 'categories' else self._menu_item
+        batch, ids = [], set()
+        for line_number, row in read_rows(lines, fmt):
+            if row is None:
+                self._record_error(line_number, 'invalid row')
+                continue
+            try:
+                obj = build(row)
+            except RowError as e:
+                self._record_error(line_number, str(e))
+                continue
+            # نفس الـ id مرتين في batch واحد بيكسر الـ ON CONFLICT، فبنقفل الـ batch الأول
+            if obj.pk is not None and obj.pk in ids:
+                self._flush(batch)
+                batch, ids = [], set()
+            batch.append(obj)
+            if obj.pk is not None:
+                ids.add(obj.pk)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch, ids = [], set()
+        self._flush(batch)
+
+    def summary(self):
+        return {
+            'resource': self.resource,
+            'processed': self.processed,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
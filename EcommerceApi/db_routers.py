@@ -0,0 +1,97 @@
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_ALIAS = 'replica'
+# actions الـ viewsets اللي بتقرا بس؛ أي action تاني (حتى لو GET زي success_payment) بيروح للـ primary
+READ_ACTIONS = ('list', 'retrieve')
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# الريكويست الحالي مسموح له يقرا من الـ replica؟ (بيتحدد في ReplicaRoutingMiddleware.process_view)
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def reads_from_replica(view_func, method):
+    actions = getattr(view_func, 'actions', None)  # viewsets: {'get': 'list', ...}
+    return bool(actions) and actions.get(method.lower()) in READ_ACTIONS
+
+
+@contextmanager
+def primary_reads():
+    """
+    القراية جوه الـ block من الـ primary حتى لو الريكويست رايح للـ replica: للي هيتخزن في
+    cache_page_versioned تحت الـ generation الجديدة (الـ replica ممكن تكون لسه ما شافتش الكتابة اللي غيرتها).
+    """
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    الكتابة دايما على الـ primary (default). القراية بتروح للـ replica بس لو الريكويست
+    read-only action ومفيش transaction مفتوحة على الـ primary (اللي جوه atomic لازم يشوف كتابته).
+    """
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return REPLICA_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # الـ replica نسخة من نفس الداتابيز
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # الـ replica بتتعمل نسخة من الـ primary (manage.py syncreplica) فمالهاش migrations
+        return db != REPLICA_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    بيعلّم الريكويستات اللي بتروح للـ replica (list و retrieve في الـ viewsets).
+
+    الـ replica متأخرة لحد الـ sync الجاي، فالعميل اللي لسه كاتب حاجة (نفس الـ Authorization
+    أو الـ IP) بيقرا من الـ primary لمدة REPLICA_PIN_SECONDS عشان يشوف الأوردر اللي لسه عامله.
+    العملاء التانيين بيشوفوا الكتابة مع الـ sync الجاي، إلا الـ lists المتكاشة: الـ miss بيتبني
+    من الـ primary (primary_reads في cache_page_versioned).
+    """
+
+    def __init__(self, get_response):
+        if REPLICA_ALIAS not in settings.DATABASES:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.pin_seconds = _setting('REPLICA_PIN_SECONDS', 30)
+
+    def __call__(self, request):
+        token = _use_replica.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+        if request.method not in SAFE_METHODS and response.status_code < 400 and self.pin_seconds:
+            cache.set(self.pin_key(request), True, self.pin_seconds)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if reads_from_replica(view_func, request.method) and not cache.get(self.pin_key(request)):
+            _use_replica.set(True)
+
+    @staticmethod
+    def pin_key(request):
+        client = request.META.get('HTTP_AUTHORIZATION') or request.META.get('REMOTE_ADDR', '')
+        return 'replica-pin:' + hashlib.sha1(client.encode()).hexdigest()
@@ -0,0 +1,118 @@
+from decimal import Decimal, getcontext
+from operator import itemgetter
+
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+from .models import MenuItem, RATING_CHOICES
+
+
+class FastPathUnsupported(Exception):
+    """حقل الـ serializer مالوش مقابل في values() → الـ view بيرجع للـ serializer العادي"""
+
+
+def _histogram(prefix):
+    columns = [f'{prefix}rating_{rating}_count' for rating in RATING_CHOICES]
+    pairs = [(str(rating), column) for rating, column in zip(RATING_CHOICES, columns)]
+    return columns, lambda row: {key: row[column] for key, column in pairs}
+
+
+# properties على الموديل (مش أعمدة): الأعمدة اللي محتاجاها + إزاي تتبني من الصف
+COMPUTED_SOURCES = {
+    (MenuItem, 'rating_histogram'): _histogram,
+}
+
+
+def _converter(field):
+    """
+    دالة واحدة بتتحسب مرة لكل حقل بدل field.to_representation لكل صف.
+    القيم اللي جاية من الداتابيز نوعها صح أصلا (str/int/bool) فبتعدي زي ما هي.
+    """
+    if isinstance(field, (serializers.CharField, serializers.IntegerField, serializers.BooleanField)):
+        return None
+    if (isinstance(field, serializers.DecimalField)
+            and getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+            and field.decimal_places is not None and not field.localize and not field.normalize_output):
+        # نفس DecimalField.quantize بس الـ exponent والـ context محسوبين مرة واحدة
+        exponent = Decimal('.1') ** field.decimal_places
+        context = getcontext().copy()
+        if field.max_digits is not None:
+            context.prec = field.max_digits
+        rounding = field.rounding
+
+        def convert(value):
+            if value is None:
+                return None
+            if not isinstance(value, Decimal):
+                value = Decimal(str(value).strip())
+            return f'{value.quantize(exponent, rounding=rounding, context=context):f}'
+        return convert
+    to_representation = field.to_representation
+    return lambda value: None if value is None else to_representation(value)
+
+
+class RowBuilder:
+    """
+    بيحوّل serializer (بعد ?fields= و ?expand=) لخطة ثابتة: أعمدة values() + getter لكل حقل،
+    وبيبني من كل صف dict بنفس المفاتيح والترتيب والقيم اللي serializer.data بيطلعها.
+
+    الحقول المدعومة: أعمدة الموديل، nested ModelSerializer على FK، و COMPUTED_SOURCES.
+    أي حاجة غير كده (SerializerMethodField، many=True، source فيه نقط...) بترمي FastPathUnsupported.
+    """
+
+    def __init__(self, serializer):
+        self.columns = []
+        self._plan = self._compile(serializer, serializer.Meta.model, '')
+
+    def __call__(self, row):
+        return {key: getter(row) for key, getter in self._plan}
+
+    def _column(self, name):
+        if name not in self.columns:
+            self.columns.append(name)
+        return name
+
+    def _compile(self, serializer, model, prefix):
+        concrete = {field.name: field for field in model._meta.concrete_fields}
+        attnames = {field.attname for field in model._meta.concrete_fields}
+        plan = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            source = field.source
+
+            if (model, source) in COMPUTED_SOURCES:
+                columns, getter = COMPUTED_SOURCES[model, source](prefix)
+                for column in columns:
+                    self._column(column)
+                plan.append((name, getter))
+
+            elif isinstance(field, serializers.ModelSerializer) and source in concrete and concrete[source].many_to_one:
+                related = concrete[source].related_model
+                key = self._column(f'{prefix}{source}__{related._meta.pk.name}')
+                nested = self._compile(field, related, f'{prefix}{source}__')
+                plan.append((name, self._nested_getter(key, nested)))
+
+            elif isinstance(field, serializers.Serializer) or '.' in source or source == '*':
+                raise FastPathUnsupported(name)
+
+            elif source in concrete and not concrete[source].is_relation or source in attnames:
+                column = self._column(prefix + source)
+                convert = _converter(field)
+                plan.append((name, itemgetter(column) if convert is None else self._converted_getter(column, convert)))
+
+            else:
+                raise FastPathUnsupported(name)
+        return plan
+
+    @staticmethod
+    def _converted_getter(column, convert):
+        return lambda row: convert(row[column])
+
+    @staticmethod
+    def _nested_getter(key, plan):
+        def getter(row):
+            if row[key] is None:
+                return None
+            return {name: field_getter(row) for name, field_getter in plan}
+        return getter
@@ -0,0 +1,123 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyLock
+
+IDEMPOTENCY_HEADER = "HTTP_IDEMPOTENCY_KEY"
+REPLAY_HEADER = "Idempotent-Replayed"
+
+RECORD_KEY = "idem:{}"
+
+# أقصى وقت ريكويست ممكن ياخده قبل ما نعتبر الـ lock بتاعه ميت
+LOCK_TIMEOUT = 60
+
+# أخطاء مؤقتة: الـ retry بنفس الـ key ممكن ينجح، فما بتتخزنش (زي الـ 5xx)
+TRANSIENT_STATUSES = {
+    status.HTTP_408_REQUEST_TIMEOUT,
+    status.HTTP_409_CONFLICT,
+    status.HTTP_423_LOCKED,
+    status.HTTP_425_TOO_EARLY,
+    status.HTTP_429_TOO_MANY_REQUESTS,
+}
+
+
+def _replayable(status_code):
+    return status_code < 500 and status_code not in TRANSIENT_STATUSES
+
+
+def _fingerprint(request):
+    data = request.data
+    if hasattr(data, "lists"):
+        data = dict(data.lists())
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _acquire_lock(digest):
+    """
+    INSERT بالـ key كـ primary key: الداتابيز بيضمن إن ريكويست واحد بس ينجح حتى من processes مختلفة
+    (cache.add مش atomic على الـ FileBasedCache). الـ lock بيبان للباقيين بعد الـ commit، فجوه transaction
+    خارجية (ATOMIC_REQUESTS مثلا) بيحمي الريكويستات اللي على نفس الـ connection بس.
+    """
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                IdempotencyLock.objects.create(key=digest)
+            return True
+        except IntegrityError:
+            # الـ process اللي خده ممكن يكون وقع قبل الـ finally: الـ lock الأقدم من LOCK_TIMEOUT بيتشال ونجرب تاني
+            expired = timezone.now() - timedelta(seconds=LOCK_TIMEOUT)
+            if not IdempotencyLock.objects.filter(key=digest, created_at__lt=expired).delete()[0]:
+                return False
+    return False
+
+
+def _release_lock(digest):
+    IdempotencyLock.objects.filter(key=digest).delete()
+
+
+def idempotent(timeout=60 * 60 * 24):
+    """
+    دعم Idempotency-Key للـ POST: أول response بيتخزن في الكاش المشترك وأي ريكويست بنفس
+    الـ key من نفس اليوزر على نفس الـ path بياخد نفس الـ response من غير ما الـ view يتنفذ تاني.
+    الـ 2xx وباقي الـ 4xx (validation، out of stock، رفض الـ provider) بتترجع زي ما هي لحد
+    الـ timeout؛ الـ 5xx والـ TRANSIENT_STATUSES لأ، فالـ retry بنفس الـ key بيشغّل الـ view تاني.
+
+    - نفس الـ key والأولاني لسه شغال (الـ lock صف في IdempotencyLock) → 409
+    - نفس الـ key بـ body مختلف → 422
+    - من غير header → الـ view بيشتغل عادي
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def _wrapped(self, request, *args, **kwargs):
+            key = request.META.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return view_method(self, request, *args, **kwargs)
+            if len(key) > 255:
+                return Response({"detail": "Idempotency-Key is too long."}, status=status.HTTP_400_BAD_REQUEST)
+
+            raw_key = "|".join([str(request.user.pk), request.method, request.path, key])
+            digest = hashlib.sha256(raw_key.encode()).hexdigest()
+            record_key = RECORD_KEY.format(digest)
+            fingerprint = _fingerprint(request)
+
+            record = cache.get(record_key)
+            if record is None:
+                if not _acquire_lock(digest):
+                    return Response(
+                        {"detail": "A request with this Idempotency-Key is still in progress."},
+                        status=status.HTTP_409_CONFLICT,
+                    )
+                try:
+                    # ممكن الأولاني يكون خلص بين الـ get والـ add
+                    record = cache.get(record_key)
+                    if record is None:
+                        response = view_method(self, request, *args, **kwargs)
+                        if _replayable(response.status_code):
+                            cache.set(record_key, {
+                                "fingerprint": fingerprint,
+                                "status": response.status_code,
+                                "data": response.data,
+                            }, timeout)
+                        return response
+                finally:
+                    _release_lock(digest)
+
+            if record["fingerprint"] != fingerprint:
+                return Response(
+                    {"detail": "Idempotency-Key was already used with a different request body."},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            response = Response(record["data"], status=record["status"])
+            response[REPLAY_HEADER] = "true"
+            return response
+        return _wrapped
+    return decorator
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from EcommerceApi.analytics import rebuild
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the sales rollup tables from existing orders (all days, or --start/--end). "
+            "Needed once for the order history and after bulk imports or order deletes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="أول يوم YYYY-MM-DD (الافتراضي من الأول)")
+        parser.add_argument('--end', help="آخر يوم YYYY-MM-DD (الافتراضي لحد النهارده)")
+
+    def handle(self, *args, **options):
+        start, end = (self.parse(options[name], name) for name in ('start', 'end'))
+        if start and end and start > end:
+            raise CommandError("--start must be on or before --end.")
+        began = time.perf_counter()
+        rows = rebuild(start, end)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {rows['days']} day, {rows['categories']} category and {rows['menu_items']} menu item rollup rows "
+            f"in {time.perf_counter() - began:.1f}s"
+        ))
+
+    @staticmethod
+    def parse(value, name):
+        if value is None:
+            return None
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise CommandError(f"--{name} must be a date (YYYY-MM-DD).")
+        return day
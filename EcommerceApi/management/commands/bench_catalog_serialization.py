@@ -0,0 +1,91 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from EcommerceApi.fastpath import RowBuilder
+from EcommerceApi.models import MenuItem, Category
+from EcommerceApi.serializers import MenuItemSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare MenuItemSerializer with the values() fast path on the same rows (seeded rows are rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help="عدد الـ menu items اللي بتتعمل مؤقتا للقياس")
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.seed(options['rows'])
+                self.run(options['repeat'])
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def seed(self, rows):
+        categories = Category.objects.bulk_create([Category(name=f'Bench category {i}') for i in range(10)])
+        MenuItem.objects.bulk_create([
+            MenuItem(
+                title=f'Bench item {i}',
+                price=Decimal(i % 5000) / 100 + 1,
+                inventory=i % 50,
+                category=categories[i % len(categories)],
+                review_count=i % 7,
+                rating_sum=(i % 7) * 3,
+                rating_average=Decimal('3.00') if i % 7 else 0,
+            )
+            for i in range(rows)
+        ], batch_size=1000)
+
+    def timed(self, func, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def run(self, repeat):
+        renderer = JSONRenderer()
+        queryset = MenuItem.objects.order_by('price', 'id')
+        build = RowBuilder(MenuItemSerializer())
+
+        def serializer_path():
+            return renderer.render(MenuItemSerializer(queryset.select_related('category'), many=True).data)
+
+        def fast_path():
+            return renderer.render([build(row) for row in queryset.values(*build.columns)])
+
+        # التحويل بس من غير الـ query (الصفوف محملة قبل القياس)
+        instances = list(queryset.select_related('category'))
+        rows = list(queryset.values(*build.columns))
+
+        def serializer_only():
+            return MenuItemSerializer(instances, many=True).data
+
+        def fast_only():
+            return [build(row) for row in rows]
+
+        slow_total, slow_body = self.timed(serializer_path, repeat)
+        fast_total, fast_body = self.timed(fast_path, repeat)
+        slow_convert, _ = self.timed(serializer_only, repeat)
+        fast_convert, _ = self.timed(fast_only, repeat)
+
+        self.stdout.write(f"{len(rows)} menu items, best of {repeat}")
+        self.stdout.write(f"  query + serialize + render: serializer {slow_total * 1000:.1f} ms, "
+                          f"fast path {fast_total * 1000:.1f} ms ({slow_total / fast_total:.1f}x)")
+        self.stdout.write(f"  serialize only:             serializer {slow_convert * 1000:.1f} ms, "
+                          f"fast path {fast_convert * 1000:.1f} ms ({slow_convert / fast_convert:.1f}x)")
+        if slow_body == fast_body:
+            self.stdout.write(self.style.SUCCESS("  output identical"))
+        else:
+            self.stdout.write(self.style.ERROR("  output differs!"))
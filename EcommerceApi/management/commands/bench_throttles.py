@@ -0,0 +1,67 @@
+import pickle
+import time
+from types import SimpleNamespace
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from rest_framework.throttling import UserRateThrottle
+
+from EcommerceApi.throttling import UserBucketThrottle
+
+
+class Command(BaseCommand):
+    help = "Compare per-request overhead of DRF's UserRateThrottle with the token-bucket throttle on the configured cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=5000, help="إجمالي الريكويستات لكل throttle")
+        parser.add_argument('--rate', default='60/minute')
+        parser.add_argument('--cache', default='default', help="alias من CACHES، أو locmem عشان نقيس الـ CPU من غير IO")
+        parser.add_argument('--repeat', type=int, default=5,
+                            help="عدد الجولات (الـ throttles بالتبادل)، وبناخد أسرع جولة لكل واحد زي timeit")
+
+    def handle(self, *args, **options):
+        users, total, rate = options['users'], options['requests'], options['rate']
+        cache = LocMemCache('bench-throttles', {}) if options['cache'] == 'locmem' else caches[options['cache']]
+        self.stdout.write(f"{total} requests from {users} users at {rate} on {type(cache).__name__}")
+        classes = (UserRateThrottle, UserBucketThrottle)
+        best = {}
+        for round_number in range(max(1, options['repeat'])):
+            # بالتبادل عشان حالة الـ disk والـ cache directory ما تظلمش واحد فيهم
+            for throttle_class in classes[::1 if round_number % 2 == 0 else -1]:
+                result = self.run(throttle_class, cache, users, total, rate)
+                if throttle_class not in best or result[0] < best[throttle_class][0]:
+                    best[throttle_class] = result
+        for throttle_class in classes:
+            elapsed, allowed, value_size = best[throttle_class]
+            self.stdout.write(
+                f"  {throttle_class.__name__:<20} {elapsed / total * 1e6:8.1f} us/request, "
+                f"{allowed} allowed, {value_size} bytes per key"
+            )
+
+    def run(self, throttle_class, cache, users, total, rate):
+        # ids بعيدة عن اليوزرز الحقيقيين، والـ keys بتتمسح في الآخر
+        requests = [
+            SimpleNamespace(user=SimpleNamespace(is_authenticated=True, pk=10 ** 9 + i), META={'REMOTE_ADDR': '127.0.0.1'})
+            for i in range(users)
+        ]
+        throttle_class = type('Bench' + throttle_class.__name__, (throttle_class,), {'rate': rate, 'cache': cache})
+        clock = SimpleNamespace(now=time.time())
+        # كل يوزر بيبعت ريكويست كل ثانية تقريبا، فالـ window بتاعة DRF بتفضل مليانة
+        step = 1.0 / users
+
+        keys = set()
+        allowed = 0
+        start = time.perf_counter()
+        for i in range(total):
+            clock.now += step
+            throttle = throttle_class()
+            throttle.timer = lambda: clock.now
+            allowed += throttle.allow_request(requests[i % users], None)
+            keys.add(throttle.key)
+        elapsed = time.perf_counter() - start
+
+        value_size = max(len(pickle.dumps(cache.get(key), pickle.HIGHEST_PROTOCOL)) for key in keys)
+        cache.delete_many(keys)
+        return elapsed, allowed, value_size
@@ -0,0 +1,27 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from EcommerceApi.catalog import export_catalog, FORMATS, RESOURCES
+
+
+class Command(BaseCommand):
+    help = "Stream menu items or categories to a CSV/NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resource', choices=list(RESOURCES), default='menu-items')
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--output', '-o', help="الملف اللي هيتكتب فيه (الافتراضي stdout)")
+
+    def handle(self, *args, **options):
+        rows = export_catalog(options['resource'], options['format'])
+        if not options['output']:
+            for line in rows:
+                sys.stdout.write(line)
+            return
+        count = -1 if options['format'] == 'csv' else 0  # الـ header مش صف
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            for line in rows:
+                output.write(line)
+                count += 1
+        self.stdout.write(self.style.SUCCESS(f"Exported {count} {options['resource']} to {options['output']}"))
@@ -0,0 +1,299 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User, Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models.signals import post_delete
+from django.utils import timezone
+
+from EcommerceApi.analytics import rebuild as rebuild_sales_rollups
+from EcommerceApi.authentication import revoke_tokens
+from EcommerceApi.caching import MENU_ITEMS, CATEGORIES, REVIEWS, bump_generation
+from EcommerceApi.models import (
+    Category, MenuItem, Cart, CartItem, Order, OrderItem, MenuItemReview,
+    CategorySalesRollup, MenuItemSalesRollup, RATING_CHOICES,
+)
+from EcommerceApi.roles import MANAGER, DELIVERY_CREW
+from EcommerceApi.signals import user_deleted
+
+# كل الداتا المتولدة بتتعرف من هنا (عشان --reset وعشان loadbench يلاقي اليوزرز)
+USERNAME_PREFIX = 'bench_'
+CATEGORY_PREFIX = 'Bench '
+DEFAULT_PASSWORD = 'bench-pass-123'
+
+# الأحجام عند --scale 1
+BASE_COUNTS = {
+    'categories': 20,
+    'menu_items': 100_000,
+    'customers': 10_000,
+    'managers': 3,
+    'crew': 50,
+    'carts': 2_000,
+    'orders': 1_000_000,
+    'reviews': 200_000,
+}
+
+CATEGORY_NAMES = ['Soups', 'Salads', 'Grill', 'Pasta', 'Pizza', 'Seafood', 'Desserts', 'Drinks', 'Breakfast',
+                  'Sandwiches', 'Vegan', 'Sides', 'Curries', 'Noodles', 'Bakery', 'Kids', 'Specials', 'Mezze']
+ADJECTIVES = ['Spicy', 'Grilled', 'Roasted', 'Crispy', 'Smoked', 'Creamy', 'Classic', 'Garlic', 'Lemon',
+              'Honey', 'Stuffed', 'Baked', 'Fresh', 'Herb', 'Tangy', 'Golden', 'Slow-cooked', 'Chili']
+DISHES = ['Lentil Soup', 'Chicken Shawarma', 'Falafel Wrap', 'Beef Kofta', 'Greek Salad', 'Margherita',
+          'Shrimp Tagine', 'Mushroom Risotto', 'Lamb Chops', 'Koshari', 'Baklava', 'Om Ali', 'Hummus Plate',
+          'Salmon Fillet', 'Pad Thai', 'Butter Chicken', 'Mint Lemonade', 'Molokhia', 'Fattoush', 'Brownie']
+COMMENTS = ['Great taste', 'Too salty', 'Would order again', 'Arrived cold', 'Perfect portion', 'Just okay', None]
+
+
+class Command(BaseCommand):
+    help = ("Generate a reproducible synthetic dataset (categories, menu items, users in the Manager and "
+            "Delivery_crew groups, carts, orders with items, reviews) for load benchmarks.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=0.01,
+                            help="مضروب في الأحجام الأساسية (1 = 100k menu item و مليون أوردر)")
+        for name in BASE_COUNTS:
+            parser.add_argument('--' + name.replace('_', '-'), type=int, help=f"بدل {name} المحسوبة من --scale")
+        parser.add_argument('--items-per-order', type=int, default=3, help="متوسط عدد الـ items في الأوردر")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help="باسورد كل اليوزرز المتولدين")
+        parser.add_argument('--reset', action='store_true', help="يمسح الداتا المتولدة قبل كده الأول")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        if self.batch_size < 1:
+            raise CommandError("--batch-size must be positive")
+        counts = {
+            # الجداول الصغيرة (categories، managers) ما بتقلش عن 5 حتى مع scale صغير
+            name: options[name] if options[name] is not None else max(min(base, 5), int(base * options['scale']))
+            for name, base in BASE_COUNTS.items()
+        }
+        counts['carts'] = min(counts['carts'], counts['customers'])
+
+        if options['reset']:
+            self.step('reset', self.reset)
+        elif User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+            raise CommandError("Generated data already exists; pass --reset to replace it.")
+
+        self.now = timezone.now()
+        categories = self.step('categories', self.create_categories, counts['categories'])
+        items = self.step('menu items', self.create_menu_items, counts['menu_items'], categories)
+        customers, crew = self.step('users', self.create_users, counts, options['password'])
+        self.step('carts', self.create_carts, counts['carts'], customers, items)
+        self.step('orders', self.create_orders, counts['orders'], customers, crew, items, options['items_per_order'])
+        self.step('reviews', self.create_reviews, counts['reviews'], customers, items)
+        # الأوردرات اتعملت بـ bulk_create فالـ rollups بتتحسب مرة واحدة في الآخر
+        self.step('sales rollups', rebuild_sales_rollups)
+
+        # bulk_create و update ما بيبعتوش signals
+        bump_generation(MENU_ITEMS, CATEGORIES, REVIEWS)
+        self.stdout.write(self.style.SUCCESS(
+            "Generated " + ", ".join(f"{count} {name.replace('_', ' ')}" for name, count in counts.items())
+        ))
+
+    def step(self, name, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        self.stdout.write(f"{name}: {time.perf_counter() - start:.1f}s")
+        return result
+
+    def progress(self, name, done, total):
+        if total >= self.batch_size * 4 and done % (self.batch_size * 4) < self.batch_size:
+            self.stdout.write(f"  {name}: {done}/{total}")
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield range(start, min(start + self.batch_size, total))
+
+    def random_date(self):
+        return self.now - timedelta(seconds=self.rng.randrange(365 * 24 * 3600))
+
+    def set_created_at(self, objs, dates):
+        """
+        تواريخ الأوردرات والريفيوهات متوزعة على السنة اللي فاتت بدل ما تبقى كلها "دلوقتي":
+        الـ auto_now_add بيكتب الوقت الحالي في الـ bulk_create، فبنعدلها بعده بـ UPDATE واحد (executemany)
+        """
+        model = type(objs[0])
+        quote = connection.ops.quote_name
+        sql = 'UPDATE %s SET %s = %%s WHERE %s = %%s' % (
+            quote(model._meta.db_table), quote(model._meta.get_field('created_at').column), quote(model._meta.pk.column),
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, [[connection.ops.adapt_datetimefield_value(date), obj.pk] for obj, date in zip(objs, dates)])
+
+    # ---- steps ----
+
+    def reset(self):
+        users = User.objects.filter(username__startswith=USERNAME_PREFIX)
+        categories = Category.objects.filter(name__startswith=CATEGORY_PREFIX)
+        items = MenuItem.objects.filter(category__in=categories)
+        user_ids = list(users.values_list('pk', flat=True))
+        with transaction.atomic():
+            # من تحت لفوق بـ _raw_delete: DELETE واحد لكل جدول من غير ما الـ Collector يحمّل الصفوف.
+            # الـ delete() العادي ما بيعرفش يعمل fast delete هنا لأن Order و MenuItem و MenuItemReview و Category
+            # عليهم signals (rollups وgenerations) كانت هتشتغل مرة لكل صف؛ الـ rollups بتتبني تاني في الآخر
+            for queryset in (
+                CategorySalesRollup.objects.filter(category__in=categories),
+                MenuItemSalesRollup.objects.filter(category__in=categories),
+                MenuItemSalesRollup.objects.filter(menuitem__in=items),
+                OrderItem.objects.filter(order__user__in=users),
+                OrderItem.objects.filter(menuitem__in=items),
+                Order.objects.filter(user__in=users),
+                MenuItemReview.objects.filter(user__in=users),
+                MenuItemReview.objects.filter(menuitem__in=items),
+                CartItem.objects.filter(cart__user__in=users),
+                CartItem.objects.filter(menuitem__in=items),
+                Cart.objects.filter(user__in=users),
+                items,
+                categories,
+            ):
+                queryset._raw_delete(queryset.db)
+            # اليوزرز بالـ delete العادي (جداول Django زي الجروبات والـ tokens بتتمسح بالـ cascade)،
+            # من غير revoke لكل يوزر لوحده: batch واحد لكل batch-size يوزر
+            post_delete.disconnect(user_deleted, sender=User)
+            try:
+                users.delete()
+            finally:
+                post_delete.connect(user_deleted, sender=User)
+            for batch in self.batches(len(user_ids)):
+                revoke_tokens(user_ids[batch.start:batch.stop])
+
+    def create_categories(self, count):
+        names = [
+            f"{CATEGORY_PREFIX}{CATEGORY_NAMES[i % len(CATEGORY_NAMES)]}" + (f" {i // len(CATEGORY_NAMES) + 1}" if i >= len(CATEGORY_NAMES) else '')
+            for i in range(count)
+        ]
+        return [category.pk for category in Category.objects.bulk_create([Category(name=name) for name in names])]
+
+    def create_menu_items(self, count, categories):
+        items = []
+        for batch in self.batches(count):
+            objs = [
+                MenuItem(
+                    title=f"{self.rng.choice(ADJECTIVES)} {self.rng.choice(DISHES)}",
+                    price=Decimal(self.rng.randrange(150, 25000)) / 100,
+                    # مخزون كبير عشان الـ checkout في loadbench ما يخلصوش
+                    inventory=self.rng.randrange(10_000, 1_000_000),
+                    category_id=self.rng.choice(categories),
+                )
+                for _ in batch
+            ]
+            with transaction.atomic():
+                MenuItem.objects.bulk_create(objs)
+            items.extend((obj.pk, obj.price) for obj in objs)
+            self.progress('menu items', batch.stop, count)
+        return items
+
+    def create_users(self, counts, password):
+        # hash واحد لكل اليوزرز (الـ hashing أبطأ من الـ insert نفسه بمراحل)
+        password_hash = make_password(password)
+        roles = [('manager', counts['managers'], MANAGER), ('crew', counts['crew'], DELIVERY_CREW),
+                 ('customer', counts['customers'], None)]
+        created = {}
+        for kind, count, group_name in roles:
+            users = User.objects.bulk_create([
+                User(username=f"{USERNAME_PREFIX}{kind}_{i}", email=f"{kind}{i}@bench.example.com",
+                     password=password_hash, date_joined=self.random_date())
+                for i in range(count)
+            ], batch_size=self.batch_size)
+            created[kind] = [user.pk for user in users]
+            if group_name:
+                group, _ = Group.objects.get_or_create(name=group_name)
+                User.groups.through.objects.bulk_create(
+                    [User.groups.through(user_id=pk, group_id=group.pk) for pk in created[kind]],
+                    batch_size=self.batch_size,
+                )
+        return created['customer'], created['crew']
+
+    def create_carts(self, count, customers, items):
+        carts = Cart.objects.bulk_create([Cart(user_id=pk) for pk in self.rng.sample(customers, count)],
+                                         batch_size=self.batch_size)
+        cart_items = []
+        for cart in carts:
+            for pk, _price in self.rng.sample(items, min(len(items), self.rng.randint(1, 5))):
+                cart_items.append(CartItem(cart_id=cart.pk, menuitem_id=pk, quantity=self.rng.randint(1, 4)))
+        CartItem.objects.bulk_create(cart_items, batch_size=self.batch_size)
+
+    def create_orders(self, count, customers, crew, items, items_per_order):
+        for batch in self.batches(count):
+            orders, lines = [], []
+            for _ in batch:
+                order_lines = [
+                    (pk, price, self.rng.randint(1, 3))
+                    for pk, price in self.rng.sample(items, min(len(items), self.rng.randint(1, items_per_order * 2 - 1)))
+                ]
+                orders.append(Order(
+                    user_id=self.rng.choice(customers),
+                    # الأوردرات الجديدة لسه مالهاش delivery crew
+                    delivery_crew_id=self.rng.choice(crew) if self.rng.random() < 0.8 else None,
+                    status=self.rng.choice((0, 1)),
+                    total=sum(price * quantity for _, price, quantity in order_lines),
+                ))
+                lines.append(order_lines)
+            dates = [self.random_date() for _ in orders]
+            with transaction.atomic():
+                Order.objects.bulk_create(orders)
+                self.set_created_at(orders, dates)
+                OrderItem.objects.bulk_create([
+                    OrderItem(order_id=order.pk, menuitem_id=pk, quantity=quantity, unit_price=price, price=price * quantity)
+                    for order, order_lines in zip(orders, lines)
+                    for pk, price, quantity in order_lines
+                ])
+            self.progress('orders', batch.stop, count)
+
+    def create_reviews(self, count, customers, items):
+        # (menuitem, user) لازم تبقى unique
+        pairs = set()
+        max_pairs = len(customers) * len(items)
+        count = min(count, max_pairs)
+        while len(pairs) < count:
+            pairs.add((self.rng.choice(items)[0], self.rng.choice(customers)))
+        pairs = sorted(pairs)
+
+        stats = {}
+        for batch in self.batches(count):
+            reviews = []
+            for index in batch:
+                menuitem_id, user_id = pairs[index]
+                # التقييمات مايلة ناحية 4 و 5 زي الحقيقة
+                rating = self.rng.choices(RATING_CHOICES, weights=(1, 1, 3, 5, 6))[0]
+                reviews.append(MenuItemReview(menuitem_id=menuitem_id, user_id=user_id, rating=rating,
+                                              comment=self.rng.choice(COMMENTS)))
+                histogram = stats.setdefault(menuitem_id, [0] * len(RATING_CHOICES))
+                histogram[rating - 1] += 1
+            dates = [self.random_date() for _ in reviews]
+            with transaction.atomic():
+                MenuItemReview.objects.bulk_create(reviews)
+                self.set_created_at(reviews, dates)
+            self.progress('reviews', batch.stop, count)
+
+        # إحصائيات التقييم على الـ menu items (زي backfill الـ migration 0004)
+        updated = []
+        for pk, histogram in stats.items():
+            item = MenuItem(pk=pk, review_count=sum(histogram))
+            item.rating_sum = sum(rating * n for rating, n in zip(RATING_CHOICES, histogram))
+            item.rating_average = (Decimal(item.rating_sum) / item.review_count).quantize(Decimal('0.01'), ROUND_HALF_UP)
+            for rating, n in zip(RATING_CHOICES, histogram):
+                setattr(item, f'rating_{rating}_count', n)
+            updated.append(item)
+        # UPDATE واحد بـ executemany (bulk_update بيبني CASE ضخم لكل batch وبيبقى أبطأ بكتير هنا)
+        fields = ['review_count', 'rating_sum', 'rating_average'] + [f'rating_{rating}_count' for rating in RATING_CHOICES]
+        quote = connection.ops.quote_name
+        sql = 'UPDATE %s SET %s WHERE %s = %%s' % (
+            quote(MenuItem._meta.db_table),
+            ', '.join('%s = %%s' % quote(MenuItem._meta.get_field(name).column) for name in fields),
+            quote(MenuItem._meta.pk.column),
+        )
+        decimal_field = MenuItem._meta.get_field('rating_average')
+        rows = [
+            [getattr(item, name) if name != 'rating_average'
+             else connection.ops.adapt_decimalfield_value(item.rating_average, decimal_field.max_digits, decimal_field.decimal_places)
+             for name in fields] + [item.pk]
+            for item in updated
+        ]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
@@ -0,0 +1,41 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from EcommerceApi.catalog import CatalogImporter, FORMATS, RESOURCES, DEFAULT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Import menu items or categories from a CSV/NDJSON file (upsert by id, in batches)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="ملف CSV أو NDJSON (أو - للـ stdin)")
+        parser.add_argument('--resource', choices=list(RESOURCES), default='menu-items')
+        parser.add_argument('--format', choices=FORMATS, help="بيتعرف من امتداد الملف لو مش متحدد")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        if path != '-' and not os.path.exists(path):
+            raise CommandError(f"File not found: {path}")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive")
+
+        def progress(processed, errors):
+            self.stdout.write(f"{processed} rows imported, {errors} errors")
+
+        importer = CatalogImporter(options['resource'], batch_size=options['batch_size'], progress=progress)
+        if path == '-':
+            summary = importer.run(sys.stdin, fmt)
+        else:
+            with open(path, encoding='utf-8', newline='') as lines:
+                summary = importer.run(lines, fmt)
+
+        for error in summary['errors']:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {summary['processed']} {summary['resource']} ({summary['error_count']} rows skipped)"
+        ))
+
@@ -0,0 +1,256 @@
+import json
+import platform
+import random
+import subprocess
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import Client, override_settings
+
+from EcommerceApi.metrics import QueryRecorder
+from EcommerceApi.models import Category, Cart, MenuItem, MenuItemReview, Order
+
+from .generatedata import USERNAME_PREFIX, DEFAULT_PASSWORD
+
+# وزن كل flow في الـ mix (نسبة تقريبية من الترافيك)
+FLOWS = {
+    'browse': 35,
+    'search': 15,
+    'add_to_cart': 15,
+    'checkout': 5,
+    'orders': 20,
+    'reviews': 10,
+}
+SEARCH_TERMS = ['soup', 'chicken', 'grilled', 'spicy', 'salad', 'lemon', 'kofta', 'baklava', 'shrimp', 'crispy']
+PERCENTILES = (50, 95, 99)
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(ordered, p):
+    """nearest-rank على list مترتبة"""
+    if not ordered:
+        return None
+    index = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = ("Drive the main API flows (browse, search, add to cart, checkout, order and review listing) "
+            "in-process and report p50/p95/p99 latency, throughput and SQL queries per endpoint as JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help="عدد الـ flows اللي بتتنفذ بعد الـ warmup")
+        parser.add_argument('--warmup', type=int, default=100)
+        parser.add_argument('--users', type=int, default=50, help="عدد الـ customers المتولدين اللي بيستخدموا الـ API")
+        parser.add_argument('--flows', default=','.join(FLOWS), help="flows مفصولة بـ comma")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--password', default=DEFAULT_PASSWORD)
+        parser.add_argument('--output', default='loadbench.json', help="ملف النتايج (JSON)")
+        parser.add_argument('--compare', help="ملف نتايج قديم نقارن بيه")
+        parser.add_argument('--keep-writes', action='store_true',
+                            help="ما ترجعش الكروت والأوردرات اللي اتعملت (الافتراضي rollback في الآخر)")
+        parser.add_argument('--throttle', action='store_true', help="سيب الـ throttles شغالة (بتوقف الـ bench بسرعة)")
+
+    def handle(self, *args, **options):
+        flows = [name.strip() for name in options['flows'].split(',') if name.strip()]
+        unknown = set(flows) - set(FLOWS)
+        if unknown:
+            raise CommandError(f"Unknown flows: {', '.join(sorted(unknown))}")
+        self.rng = random.Random(options['seed'])
+        self.client = Client(HTTP_HOST='localhost')
+        self.samples = {}
+
+        with ExitStack() as stack:
+            if not options['throttle']:
+                stack.enter_context(override_settings(THROTTLE_ENABLED=False))
+            try:
+                with transaction.atomic():
+                    self.prepare(options)
+                    self.run(flows, options['warmup'])
+                    self.samples = {}
+                    start = time.perf_counter()
+                    self.run(flows, options['requests'])
+                    elapsed = time.perf_counter() - start
+                    if not options['keep_writes']:
+                        raise Rollback()
+            except Rollback:
+                pass
+        # الكاش ممكن يكون فيه responses من داتا اترجعت
+        if not options['keep_writes']:
+            cache.clear()
+
+        results = self.report(options, flows, elapsed)
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(results, output, indent=2)
+        self.print_report(results)
+        if options['compare']:
+            self.print_comparison(results, options['compare'])
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    # ---- setup ----
+
+    def prepare(self, options):
+        customers = list(
+            User.objects.filter(username__startswith=f'{USERNAME_PREFIX}customer_').order_by('id')
+            .values_list('username', flat=True)[:options['users']]
+        )
+        managers = list(User.objects.filter(username__startswith=f'{USERNAME_PREFIX}manager_').values_list('username', flat=True)[:1])
+        crew = list(User.objects.filter(username__startswith=f'{USERNAME_PREFIX}crew_').values_list('username', flat=True)[:5])
+        if not customers or not managers or not crew:
+            raise CommandError("No generated users found; run `manage.py generatedata` first.")
+
+        self.password = options['password']
+        self.customers = [self.login(username) for username in customers]
+        self.staff = [self.login(username) for username in managers + crew]
+        # sample بالـ seed (مش order_by('?')) عشان كل run يطلب نفس الـ items
+        menu_items = list(MenuItem.objects.order_by('id').values_list('id', flat=True))
+        self.menu_items = self.rng.sample(menu_items, min(1000, len(menu_items)))
+        self.categories = list(Category.objects.values_list('id', flat=True))
+        self.reviewed_items = list(
+            MenuItemReview.objects.order_by('menuitem_id').values_list('menuitem_id', flat=True).distinct()[:1000]
+        ) or self.menu_items
+        self.dataset = {
+            'menu_items': MenuItem.objects.count(),
+            'categories': len(self.categories),
+            'users': User.objects.count(),
+            'orders': Order.objects.count(),
+            'reviews': MenuItemReview.objects.count(),
+        }
+        # الكارت لازم يتعمل الأول (POST /api/carts/) قبل ما نضيف فيه
+        with_cart = set(Cart.objects.filter(user__username__in=customers).values_list('user__username', flat=True))
+        for username, token in zip(customers, self.customers):
+            if username not in with_cart:
+                self.client.post('/api/carts/', HTTP_AUTHORIZATION=token)
+
+    def login(self, username):
+        response = self.client.post('/auth/jwt/create/', {'username': username, 'password': self.password},
+                                    content_type='application/json')
+        if response.status_code != 200:
+            raise CommandError(f"Login failed for {username} ({response.status_code}); check --password.")
+        return 'JWT ' + response.json()['access']
+
+    # ---- flows ----
+
+    def run(self, flows, count):
+        weights = [FLOWS[name] for name in flows]
+        for _ in range(count):
+            getattr(self, 'flow_' + self.rng.choices(flows, weights)[0])()
+
+    def request(self, name, method, path, token=None, data=None):
+        recorder = QueryRecorder(keep_sql=False)
+        headers = {'HTTP_AUTHORIZATION': token} if token else {}
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            start = time.perf_counter()
+            if method == 'GET':
+                response = self.client.get(path, **headers)
+            else:
+                response = self.client.post(path, json.dumps(data or {}), content_type='application/json', **headers)
+            elapsed = time.perf_counter() - start
+        self.samples.setdefault(name, []).append((elapsed, recorder.count, response.status_code))
+        return response
+
+    def flow_browse(self):
+        self.request('GET /api/menu-items/', 'GET', '/api/menu-items/?page_size=20&ordering=price')
+        self.request('GET /api/categories/{id}/menu-items/', 'GET',
+                     f'/api/categories/{self.rng.choice(self.categories)}/menu-items/?page_size=20')
+        self.request('GET /api/menu-items/{id}/', 'GET', f'/api/menu-items/{self.rng.choice(self.menu_items)}/')
+
+    def flow_search(self):
+        self.request('GET /api/menu-items/?search=', 'GET', f'/api/menu-items/?search={self.rng.choice(SEARCH_TERMS)}')
+
+    def flow_add_to_cart(self):
+        self.request('POST /api/cart-items/', 'POST', '/api/cart-items/', self.rng.choice(self.customers),
+                     {'menuitem_id': self.rng.choice(self.menu_items), 'quantity': self.rng.randint(1, 3)})
+
+    def flow_checkout(self):
+        token = self.rng.choice(self.customers)
+        self.request('POST /api/cart-items/', 'POST', '/api/cart-items/', token,
+                     {'menuitem_id': self.rng.choice(self.menu_items), 'quantity': 1})
+        self.request('POST /api/orders/', 'POST', '/api/orders/', token)
+
+    def flow_orders(self):
+        if self.rng.random() < 0.7:
+            self.request('GET /api/orders/ (customer)', 'GET', '/api/orders/?page_size=20', self.rng.choice(self.customers))
+        else:
+            self.request('GET /api/orders/ (staff)', 'GET', '/api/orders/?page_size=20', self.rng.choice(self.staff))
+
+    def flow_reviews(self):
+        self.request('GET /api/menu-items/{id}/reviews/', 'GET',
+                     f'/api/menu-items/{self.rng.choice(self.reviewed_items)}/reviews/?page_size=20')
+        self.request('GET /api/reviews/', 'GET', '/api/reviews/?page_size=20')
+
+    # ---- report ----
+
+    def report(self, options, flows, elapsed):
+        endpoints = {}
+        for name, samples in sorted(self.samples.items()):
+            latencies = sorted(sample[0] * 1000 for sample in samples)
+            queries = [sample[1] for sample in samples]
+            endpoints[name] = {
+                'requests': len(samples),
+                'errors': sum(1 for sample in samples if sample[2] >= 400),
+                **{f'p{p}_ms': round(percentile(latencies, p), 3) for p in PERCENTILES},
+                'mean_ms': round(sum(latencies) / len(latencies), 3),
+                'max_ms': round(latencies[-1], 3),
+                'queries_mean': round(sum(queries) / len(queries), 2),
+                'queries_max': max(queries),
+            }
+        total = sum(endpoint['requests'] for endpoint in endpoints.values())
+        return {
+            'started_at': datetime.now(dt_timezone.utc).isoformat(),
+            'git_commit': self.git_commit(),
+            'python': platform.python_version(),
+            'database': settings.DATABASES['default']['ENGINE'],
+            'debug': settings.DEBUG,
+            'options': {key: options[key] for key in ('requests', 'warmup', 'users', 'seed', 'throttle')},
+            'flows': flows,
+            'dataset': self.dataset,
+            'duration_s': round(elapsed, 3),
+            'throughput_rps': round(total / elapsed, 1) if elapsed else None,
+            'endpoints': endpoints,
+        }
+
+    @staticmethod
+    def git_commit():
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  cwd=settings.BASE_DIR, timeout=5).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    def print_report(self, results):
+        if results['debug']:
+            self.stdout.write(self.style.WARNING("DEBUG=True: Django keeps every query in memory, numbers are pessimistic"))
+        self.stdout.write(f"{results['throughput_rps']} req/s over {results['duration_s']}s, dataset {results['dataset']}")
+        self.stdout.write(f"{'endpoint':<42}{'reqs':>6}{'err':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}")
+        for name, row in results['endpoints'].items():
+            self.stdout.write(
+                f"{name:<42}{row['requests']:>6}{row['errors']:>5}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}"
+                f"{row['p99_ms']:>9.2f}{row['queries_mean']:>9.1f}"
+            )
+
+    def print_comparison(self, results, path):
+        with open(path, encoding='utf-8') as previous_file:
+            previous = json.load(previous_file)
+        self.stdout.write(f"Compared with {path} ({previous.get('git_commit')}): "
+                          f"throughput {previous['throughput_rps']} -> {results['throughput_rps']} req/s")
+        for name, row in results['endpoints'].items():
+            old = previous['endpoints'].get(name)
+            if not old:
+                continue
+            change = (row['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100 if old['p95_ms'] else 0
+            self.stdout.write(
+                f"  {name:<42} p95 {old['p95_ms']:.2f} -> {row['p95_ms']:.2f} ms ({change:+.0f}%), "
+                f"queries {old['queries_mean']} -> {row['queries_mean']}"
+            )
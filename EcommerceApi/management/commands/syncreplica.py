@@ -0,0 +1,57 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from EcommerceApi.db_routers import REPLICA_ALIAS
+
+
+def sync(source_path, target_path, pages=-1):
+    """
+    نسخة من الـ primary للـ replica بالـ SQLite backup API. النسخة بتتكتب جوه ملف الـ replica نفسه
+    (مش ملف جديد بـ rename) عشان الـ connections المفتوحة (CONN_MAX_AGE) تشوف الداتا الجديدة،
+    والقرايات اللي شغالة عليها بتكمل على الـ snapshot بتاعها (WAL).
+    """
+    source = sqlite3.connect(f'file:{source_path}?mode=ro', uri=True)
+    target = sqlite3.connect(target_path, timeout=30)
+    try:
+        source.backup(target, pages=pages)
+    finally:
+        target.close()
+        source.close()
+
+
+class Command(BaseCommand):
+    help = ("Copy the primary SQLite database into the read replica (a stand-in for real replication). "
+            "Run once before starting the production profile, then with --interval to keep the replica fresh.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--replica', default=REPLICA_ALIAS)
+        parser.add_argument('--interval', type=float, default=0, help="ثواني بين كل sync (0 = مرة واحدة)")
+        parser.add_argument('--pages', type=int, default=-1,
+                            help="عدد الـ pages في كل خطوة (-1 = كله في خطوة واحدة، snapshot متسق)")
+
+    def handle(self, *args, **options):
+        source, target = (self.sqlite_path(options[alias]) for alias in ('database', 'replica'))
+        if source == target:
+            raise CommandError("The primary and the replica point at the same file.")
+
+        while True:
+            start = time.perf_counter()
+            sync(source, target, options['pages'])
+            self.stdout.write(f"Synced {source} -> {target} in {(time.perf_counter() - start) * 1000:.0f} ms")
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    @staticmethod
+    def sqlite_path(alias):
+        database = settings.DATABASES.get(alias)
+        if database is None:
+            raise CommandError(f"No database named {alias!r}; use the production settings or --database/--replica.")
+        if database['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError(f"{alias!r} is not a SQLite database.")
+        return str(database['NAME'])
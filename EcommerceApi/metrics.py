@@ -0,0 +1,225 @@
+import hmac
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# أقصى عدد queries بنحتفظ بالـ SQL بتاعها لكل ريكويست (للـ slow log بس)
+MAX_RECORDED_SQL = 200
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # آخر خانة هي +Inf
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    """
+    كل الأرقام في الـ process ده (زي CacheStatsView): كل ريكويست بياخد الـ lock مرة واحدة بس.
+    الـ labels: view (اسم الـ URL) و action (action الـ viewset أو الـ method).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = Counter()        # (view, action, method, status)
+        self.latency = {}                # (view, action) -> Histogram
+        self.queries = {}                # (view, action) -> Histogram
+        self.db_seconds = Counter()      # (view, action)
+        self.cache_page = Counter()      # (view, action, result)
+        self.throttled = Counter()       # (view, action, scope)
+
+    def record(self, view, action, method, status, duration, query_count, db_seconds, marks):
+        key = (view, action)
+        with self._lock:
+            self.requests[view, action, method, status] += 1
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = Histogram(LATENCY_BUCKETS)
+                self.queries[key] = Histogram(QUERY_BUCKETS)
+            histogram.observe(duration)
+            self.queries[key].observe(query_count)
+            self.db_seconds[key] += db_seconds
+            if 'cache' in marks:
+                self.cache_page[view, action, marks['cache']] += 1
+            if 'throttle' in marks:
+                self.throttled[view, action, marks['throttle']] += 1
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            lines = []
+            _counter(lines, 'http_requests_total', 'Requests by route, action, method and status.',
+                     ('view', 'action', 'method', 'status'), self.requests)
+            _histograms(lines, 'http_request_duration_seconds', 'Request latency until the response is returned.',
+                        self.latency)
+            _histograms(lines, 'http_request_db_queries', 'SQL queries per request.', self.queries)
+            _counter(lines, 'http_request_db_seconds_total', 'Time spent in SQL queries.',
+                     ('view', 'action'), self.db_seconds)
+            _counter(lines, 'http_cache_page_total', 'cache_page_versioned lookups by result.',
+                     ('view', 'action', 'result'), self.cache_page)
+            _counter(lines, 'http_throttled_total', 'Requests rejected by a throttle, by scope.',
+                     ('view', 'action', 'scope'), self.throttled)
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    if extra:
+        pairs = f'{pairs},{extra}' if pairs else extra
+    return '{%s}' % pairs
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _counter(lines, name, help_text, label_names, counter):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} counter')
+    for labels, value in sorted(counter.items()):
+        lines.append(f'{name}{_labels(label_names, labels)} {_number(value)}')
+
+
+def _histograms(lines, name, help_text, histograms):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} histogram')
+    names = ('view', 'action')
+    for labels, histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip((*histogram.buckets, '+Inf'), histogram.counts):
+            cumulative += count
+            le = 'le="%s"' % (bound if bound == '+Inf' else _number(float(bound)))
+            lines.append(f'{name}_bucket{_labels(names, labels, le)} {cumulative}')
+        lines.append(f'{name}_sum{_labels(names, labels)} {_number(histogram.sum)}')
+        lines.append(f'{name}_count{_labels(names, labels)} {cumulative}')
+
+
+registry = Registry()
+
+
+def mark(request, name, value):
+    """
+    الـ views والـ throttles بيعلّموا الريكويست (cache hit/miss، throttle scope)
+    والـ middleware بيضيف العلامات دي للـ metrics بتاعة الـ route.
+    """
+    request = getattr(request, '_request', request)  # DRF Request → HttpRequest اللي الـ middleware شايفه
+    marks = getattr(request, '_metrics_marks', None)
+    if marks is not None:
+        marks[name] = value
+
+
+class QueryRecorder:
+    """execute_wrapper بيعد الـ queries ووقتها، وبيحتفظ بالـ SQL لو الـ slow log شغال"""
+
+    def __init__(self, keep_sql):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = [] if keep_sql else None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.seconds += elapsed
+            if self.statements is not None and len(self.statements) < MAX_RECORDED_SQL:
+                self.statements.append((sql, elapsed))
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched', request.method.lower()
+    actions = getattr(match.func, 'actions', None)  # viewsets: {'get': 'list', ...}
+    action = actions.get(request.method.lower()) if actions else None
+    return match.view_name or match.route, action or request.method.lower()
+
+
+class MetricsMiddleware:
+    """
+    لكل route و action: latency histogram، عدد الـ queries ووقتها، cache_page hit/miss،
+    والـ throttle rejections. بيتعرضوا على /api/metrics/ بصيغة Prometheus.
+
+    الريكويستات اللي أبطأ من METRICS_SLOW_REQUEST_MS (نسبة METRICS_SLOW_SAMPLE_RATE منها)
+    بتتسجل في اللوج ومعاها أبطأ الـ queries والـ SQL اللي اتكرر (غالبا N+1).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_ms = _setting('METRICS_SLOW_REQUEST_MS', None)
+        self.sample_rate = _setting('METRICS_SLOW_SAMPLE_RATE', 1.0)
+
+    def __call__(self, request):
+        if not _setting('METRICS_ENABLED', True):
+            return self.get_response(request)
+
+        recorder = QueryRecorder(keep_sql=self.slow_ms is not None)
+        request._metrics_marks = {}
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        view, action = _route(request)
+        registry.record(view, action, request.method, response.status_code, duration,
+                        recorder.count, recorder.seconds, request._metrics_marks)
+
+        if self.slow_ms is not None and duration * 1000 >= self.slow_ms and random.random() < self.sample_rate:
+            self.log_slow_request(request, response, view, action, duration, recorder)
+        return response
+
+    @staticmethod
+    def log_slow_request(request, response, view, action, duration, recorder):
+        slowest = sorted(recorder.statements, key=lambda statement: statement[1], reverse=True)[:5]
+        repeated = [(sql, count) for sql, count in Counter(sql for sql, _ in recorder.statements).most_common(3) if count > 1]
+        lines = [
+            f'Slow request {request.method} {request.get_full_path()} ({view}/{action}) -> {response.status_code}: '
+            f'{duration * 1000:.0f} ms, {recorder.count} queries in {recorder.seconds * 1000:.0f} ms'
+        ]
+        lines += [f'  {elapsed * 1000:.1f} ms: {sql}' for sql, elapsed in slowest]
+        lines += [f'  repeated {count}x: {sql}' for sql, count in repeated]
+        logger.warning('\n'.join(lines))
+
+
+def metrics_token_matches(request):
+    """Prometheus بيعمل scrape بـ Authorization: Bearer <METRICS_TOKEN> (من غير JWT)"""
+    token = _setting('METRICS_TOKEN', None)
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if not token or not header.startswith('Bearer '):
+        return False
+    return hmac.compare_digest(header[len('Bearer '):].encode(), token.encode())
+
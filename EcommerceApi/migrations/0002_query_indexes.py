@@ -0,0 +1,55 @@
+# Generated by Django 4.2.24 on 2026-10-18 05:07
+
+from django.db import migrations, models
+
+
+def keep_single_featured(apps, schema_editor):
+    # قبل الـ unique constraint: لو فيه أكتر من عنصر featured نسيب آخر واحد بس
+    MenuItem = apps.get_model('EcommerceApi', 'MenuItem')
+    featured = MenuItem.objects.filter(featured=True).order_by('-id')
+    latest = featured.first()
+    if latest is not None:
+        featured.exclude(pk=latest.pk).update(featured=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EcommerceApi', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['price', 'id'], name='menuitem_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['category', 'price', 'id'], name='menuitem_category_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitemreview',
+            index=models.Index(fields=['created_at', 'id'], name='review_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitemreview',
+            index=models.Index(fields=['menuitem', 'created_at', 'id'], name='review_menuitem_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['delivery_crew', 'created_at', 'id'], name='order_crew_created_idx'),
+        ),
+        migrations.RunPython(keep_single_featured, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='menuitem',
+            constraint=models.UniqueConstraint(condition=models.Q(('featured', True)), fields=('featured',), name='unique_featured_menuitem'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+from django.db import migrations
+
+FTS_TABLE = 'EcommerceApi_menuitem_fts'
+
+# external content table: النصوص نفسها في جدول الـ menuitem، والـ FTS فيه الـ index بس.
+# الـ triggers بتخلي الـ index متزامن مع أي INSERT/UPDATE/DELETE (حتى bulk_create و update())
+CREATE_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE "{FTS_TABLE}" USING fts5(
+        title,
+        category_id UNINDEXED,
+        content='EcommerceApi_menuitem',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER "{FTS_TABLE}_ai" AFTER INSERT ON "EcommerceApi_menuitem" BEGIN
+        INSERT INTO "{FTS_TABLE}"(rowid, title, category_id) VALUES (new.id, new.title, new.category_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER "{FTS_TABLE}_ad" AFTER DELETE ON "EcommerceApi_menuitem" BEGIN
+        INSERT INTO "{FTS_TABLE}"("{FTS_TABLE}", rowid, title, category_id) VALUES ('delete', old.id, old.title, old.category_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER "{FTS_TABLE}_au" AFTER UPDATE OF title, category_id ON "EcommerceApi_menuitem" BEGIN
+        INSERT INTO "{FTS_TABLE}"("{FTS_TABLE}", rowid, title, category_id) VALUES ('delete', old.id, old.title, old.category_id);
+        INSERT INTO "{FTS_TABLE}"(rowid, title, category_id) VALUES (new.id, new.title, new.category_id);
+    END
+    """,
+    # index للصفوف الموجودة قبل الـ migration
+    f"""INSERT INTO "{FTS_TABLE}"("{FTS_TABLE}") VALUES ('rebuild')""",
+]
+
+DROP_SQL = [
+    f'DROP TRIGGER IF EXISTS "{FTS_TABLE}_ai"',
+    f'DROP TRIGGER IF EXISTS "{FTS_TABLE}_ad"',
+    f'DROP TRIGGER IF EXISTS "{FTS_TABLE}_au"',
+    f'DROP TABLE IF EXISTS "{FTS_TABLE}"',
+]
+
+
+def create_fts(apps, schema_editor):
+    # FTS5 خاص بـ SQLite؛ على أي داتابيز تانية البحث بيرجع لـ SearchFilter العادي
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EcommerceApi', '0002_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,122 @@
+# Generated by Django 4.2.24 on 2026-10-18 05:10
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+from django.db.models import Count, Sum, Q
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    MenuItem = apps.get_model('EcommerceApi', 'MenuItem')
+    MenuItemReview = apps.get_model('EcommerceApi', 'MenuItemReview')
+    stats = MenuItemReview.objects.values('menuitem').annotate(
+        count=Count('id'),
+        total=Sum('rating'),
+        **{f'r{rating}': Count('id', filter=Q(rating=rating)) for rating in range(1, 6)},
+    )
+    items = []
+    for row in stats:
+        item = MenuItem(pk=row['menuitem'], review_count=row['count'], rating_sum=row['total'])
+        item.rating_average = (Decimal(row['total']) / row['count']).quantize(Decimal('0.01'), ROUND_HALF_UP)
+        for rating in range(1, 6):
+            setattr(item, f'rating_{rating}_count', row[f'r{rating}'])
+        items.append(item)
+    MenuItem.objects.bulk_update(
+        items,
+        ['review_count', 'rating_sum', 'rating_average'] + [f'rating_{rating}_count' for rating in range(1, 6)],
+        batch_size=500,
+    )
+
+
+FTS_TABLE = 'EcommerceApi_menuitem_fts'
+
+# AddField على SQLite بيعيد بنا جدول الـ menuitem (create + copy + drop + rename) والـ drop بيمسح
+# الـ triggers بتاعة migration 0003، فبنرجعها بعد الـ AddFields (وبعد الـ RemoveFields في الرجوع).
+# الـ rowids ما بتتغيرش في النسخ فالـ index نفسه سليم.
+FTS_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS "{FTS_TABLE}_ai" AFTER INSERT ON "EcommerceApi_menuitem" BEGIN
+        INSERT INTO "{FTS_TABLE}"(rowid, title, category_id) VALUES (new.id, new.title, new.category_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS "{FTS_TABLE}_ad" AFTER DELETE ON "EcommerceApi_menuitem" BEGIN
+        INSERT INTO "{FTS_TABLE}"("{FTS_TABLE}", rowid, title, category_id) VALUES ('delete', old.id, old.title, old.category_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS "{FTS_TABLE}_au" AFTER UPDATE OF title, category_id ON "EcommerceApi_menuitem" BEGIN
+        INSERT INTO "{FTS_TABLE}"("{FTS_TABLE}", rowid, title, category_id) VALUES ('delete', old.id, old.title, old.category_id);
+        INSERT INTO "{FTS_TABLE}"(rowid, title, category_id) VALUES (new.id, new.title, new.category_id);
+    END
+    """,
+]
+
+
+def restore_fts_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in FTS_TRIGGERS:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EcommerceApi', '0003_menuitem_fts'),
+    ]
+
+    operations = [
+        # في الرجوع بيتنفذ آخر حاجة، بعد الـ RemoveFields
+        migrations.RunPython(migrations.RunPython.noop, restore_fts_triggers),
+        migrations.AddField(
+            model_name='menuitem',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='rating_average',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=4),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['rating_average', 'id'], name='menuitem_rating_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['review_count', 'id'], name='menuitem_reviews_id_idx'),
+        ),
+        migrations.RunPython(restore_fts_triggers, migrations.RunPython.noop),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.24 on 2026-10-18 05:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EcommerceApi', '0004_menuitem_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='payment_session_expires_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='payment_session_id',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='payment_session_url',
+            field=models.URLField(blank=True, default='', editable=False, max_length=1000),
+        ),
+    ]
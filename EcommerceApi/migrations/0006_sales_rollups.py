@@ -0,0 +1,72 @@
+# Generated by Django 4.2.24 on 2026-10-18 05:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EcommerceApi', '0005_order_payment_session'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategorySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('order_count', models.IntegerField(default=0)),
+                ('delivered_quantity', models.IntegerField(default=0)),
+                ('delivered_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('delivered_order_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('order_count', models.IntegerField(default=0)),
+                ('delivered_quantity', models.IntegerField(default=0)),
+                ('delivered_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('delivered_order_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MenuItemSalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('order_count', models.IntegerField(default=0)),
+                ('delivered_quantity', models.IntegerField(default=0)),
+                ('delivered_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('delivered_order_count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='EcommerceApi.category')),
+                ('menuitem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='EcommerceApi.menuitem')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailysalesrollup',
+            constraint=models.UniqueConstraint(fields=('day',), name='dailysales_day_uniq'),
+        ),
+        migrations.AddField(
+            model_name='categorysalesrollup',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='EcommerceApi.category'),
+        ),
+        migrations.AddConstraint(
+            model_name='menuitemsalesrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'menuitem'), name='menuitemsales_day_menuitem_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='categorysalesrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'category'), name='categorysales_day_category_uniq'),
+        ),
+    ]
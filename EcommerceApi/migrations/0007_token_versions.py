@@ -0,0 +1,21 @@
+# Generated by Django 4.2.24 on 2026-10-18 06:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EcommerceApi', '0006_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenVersion',
+            fields=[
+                ('user_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('claims_version', models.PositiveIntegerField(default=0)),
+                ('tokens_version', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.24 on 2026-10-18 06:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EcommerceApi', '0007_token_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuItemSearchIndex',
+            fields=[
+                ('menuitem', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='EcommerceApi.menuitem')),
+                ('title', models.TextField()),
+                ('category_id', models.IntegerField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'EcommerceApi_menuitem_fts',
+                'managed': False,
+            },
+        ),
+    ]
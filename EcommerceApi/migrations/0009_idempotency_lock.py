@@ -0,0 +1,21 @@
+# Generated by Django 4.2.24 on 2026-10-18 07:07
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EcommerceApi', '0008_menuitem_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyLock',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models import F, Sum, Value, Prefetch
+from django.db.models.functions import Coalesce, NullIf, Round
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class Category(models.Model):
     name=models.CharField(max_length=100)
@@ -7,6 +10,40 @@ class Category(models.Model):
     def __str__(self):
         return self.name
     
+RATING_CHOICES = range(1, 6)
+
+
+class MenuItemQuerySet(models.QuerySet):
+    def apply_rating_change(self, added=None, removed=None):
+        """
+        بيحدّث إحصائيات الريفيوهات في UPDATE واحد بـ F() (من غير ما نقرا الصف):
+        added = الـ rating اللي اتضاف، removed = اللي اتشال (في التعديل الاتنين)
+        """
+        count_delta = (added is not None) - (removed is not None)
+        sum_delta = (added or 0) - (removed or 0)
+        updates = {
+            'review_count': F('review_count') + count_delta,
+            'rating_sum': F('rating_sum') + sum_delta,
+            # average متخزن مقرّب لرقمين عشان الترتيب والـ keyset cursor يبقوا مظبوطين
+            'rating_average': Coalesce(
+                Round((F('rating_sum') + sum_delta) * Value(1.0) / NullIf(F('review_count') + count_delta, 0), 2),
+                Value(0),
+                output_field=models.DecimalField(max_digits=4, decimal_places=2),
+            ),
+        }
+        histogram = {}
+        if added is not None:
+            histogram[added] = histogram.get(added, 0) + 1
+        if removed is not None:
+            histogram[removed] = histogram.get(removed, 0) - 1
+        for rating, delta in histogram.items():
+            # ريفيوهات قديمة قبل validation الـ 1..5 بتدخل في الـ count والـ sum بس
+            if delta and rating in RATING_CHOICES:
+                field = f'rating_{rating}_count'
+                updates[field] = F(field) + delta
+        return self.update(**updates)
+
+
 class MenuItem(models.Model):
     title = models.CharField(max_length=120)
     price = models.DecimalField(max_digits=8, decimal_places=2)
@@ -14,21 +51,106 @@ class MenuItem(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='menu_items')
     featured = models.BooleanField(default=False)
 
+    # إحصائيات الريفيوهات (بتتحدث مع كل create/update/delete للريفيو بدل aggregate على كل الريفيوهات)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_average = models.DecimalField(max_digits=4, decimal_places=2, default=0, editable=False)
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = MenuItemQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # الترتيب بالسعر (ordering_fields + keyset pagination)
+            models.Index(fields=['price', 'id'], name='menuitem_price_id_idx'),
+            # ?category_id= أو /categories/<id>/menu-items/ مع الترتيب بالسعر
+            models.Index(fields=['category', 'price', 'id'], name='menuitem_category_price_idx'),
+            # الترتيب بالتقييم بنفس تكلفة الترتيب بالسعر
+            models.Index(fields=['rating_average', 'id'], name='menuitem_rating_id_idx'),
+            models.Index(fields=['review_count', 'id'], name='menuitem_reviews_id_idx'),
+        ]
+        constraints = [
+            # partial unique index: عنصر واحد بس featured، وكمان بيخلّي البحث عن featured=True سريع
+            models.UniqueConstraint(fields=['featured'], condition=models.Q(featured=True), name='unique_featured_menuitem'),
+        ]
+
     def __str__(self):
         return self.title
 
+    @property
+    def rating_histogram(self):
+        return {str(rating): getattr(self, f'rating_{rating}_count') for rating in RATING_CHOICES}
+
+
+class MenuItemSearchIndex(models.Model):
+    """
+    الـ FTS5 table بتاعة البحث (migration 0003، على SQLite بس). unmanaged: موجودة عشان الـ ORM يعمل
+    JOIN عليها ويفلتر ويرتب بالـ rank في نفس query الـ menu items (شوف EcommerceApi.search).
+    """
+    menuitem = models.OneToOneField(
+        MenuItem, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid', related_name='search_index',
+    )
+    title = models.TextField()
+    category_id = models.IntegerField()
+    # الـ hidden column بتاعة FTS5: الـ bm25 (الأصغر أنسب)
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'EcommerceApi_menuitem_fts'
+
     
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        """
+        الكروت مع اليوزر والـ items والـ menuitems في 3 queries ثابتة،
+        والإجمالي محسوب في الداتابيز كـ annotation اسمه total
+        """
+        return self.select_related('user').with_items().with_total()
+
+    def with_items(self):
+        return self.prefetch_related(Prefetch('items', queryset=CartItem.objects.with_subtotals()))
+
+    def with_total(self):
+        return self.annotate(
+            total=Coalesce(
+                Sum(F('items__quantity') * F('items__menuitem__price'), output_field=models.DecimalField(max_digits=10, decimal_places=2)),
+                Value(0),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            )
+        )
+
+
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
 
+    objects = CartQuerySet.as_manager()
+
     def __str__(self):
         return f"Cart of {self.user.username}"
     
+class CartItemQuerySet(models.QuerySet):
+    def with_subtotals(self):
+        # subtotal = quantity * menuitem.price محسوب في الداتابيز
+        return self.select_related('menuitem').annotate(
+            subtotal=models.ExpressionWrapper(
+                F('quantity') * F('menuitem__price'),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            )
+        )
+
+
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
     menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
 
+    objects = CartItemQuerySet.as_manager()
+
     class Meta:
         unique_together = ('cart', 'menuitem')
 
@@ -46,10 +168,36 @@ class Order(models.Model):
     status = models.IntegerField(choices=STATUS_CHOICES, default=0)
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    # آخر payment session اتعملت للأوردر، بنرجعها تاني لحد ما تنتهي بدل ما نكلم الـ provider
+    payment_session_id = models.CharField(max_length=255, blank=True, default='', editable=False)
+    payment_session_url = models.URLField(max_length=1000, blank=True, default='', editable=False)
+    payment_session_expires_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # المانجر: كل الأوردرات بالأحدث
+            models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+            # اليوزر العادي وفريق التوصيل بيشوفوا أوردراتهم بس
+            models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_idx'),
+            models.Index(fields=['delivery_crew', 'created_at', 'id'], name='order_crew_created_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.id} by {self.user.username}"
 
+    # الـ status زي ما اتقرا من الداتابيز: الـ post_save بيقارن بيه عشان الـ sales rollups
+    # (signals.order_status_changed) بدل SELECT قبل كل save
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        order = super().from_db(db, field_names, values)
+        order._loaded_status = order.__dict__.get('status')
+        return order
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        if fields is None or 'status' in fields:
+            self._loaded_status = self.__dict__.get('status')
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
@@ -74,5 +222,82 @@ class MenuItemReview(models.Model):
 
     class Meta:
         unique_together = ('menuitem', 'user')
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='review_created_idx'),
+            models.Index(fields=['menuitem', 'created_at', 'id'], name='review_menuitem_created_idx'),
+        ]
+
+  
+
+
+class SalesRollup(models.Model):
+    """
+    مبيعات اليوم متجمعة عشان تقارير المانجر تقرا آلاف الصفوف بدل كل الـ OrderItems.
+    بتتحدث بـ upsert بيزوّد الأرقام (EcommerceApi.analytics) مع كل أوردر جديد ومع تغيير الـ status،
+    و `manage.py backfill_sales` بيبنيها من الأول.
+    """
+    day = models.DateField()
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    order_count = models.IntegerField(default=0)
+    # نفس الأرقام للأوردرات اللي اتسلمت (status = 1)
+    delivered_quantity = models.IntegerField(default=0)
+    delivered_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    delivered_order_count = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class DailySalesRollup(SalesRollup):
+    """يوم واحد لكل صف: التقارير باليوم والإجماليات (الأوردر بيتحسب مرة واحدة حتى لو فيه كذا category)"""
+
+    class Meta:
+        constraints = [
+            # الـ ON CONFLICT بتاع الـ upsert، وكمان index للتقارير بالتاريخ
+            models.UniqueConstraint(fields=['day'], name='dailysales_day_uniq'),
+        ]
+
+
+class CategorySalesRollup(SalesRollup):
+    """يوم × category: التقارير بالـ category (سنة = 365 × عدد الـ categories صف)"""
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'category'], name='categorysales_day_category_uniq'),
+        ]
+
+
+class MenuItemSalesRollup(SalesRollup):
+    """يوم × menu item (والـ category وقت البيع): أكتر الـ items مبيعا"""
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='+')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'menuitem'], name='menuitemsales_day_menuitem_uniq'),
+        ]
+
+
+class TokenVersion(models.Model):
+    """
+    versions الـ JWT لكل يوزر (EcommerceApi.authentication): أي token اتعمل على version أقدم بيترفض.
+    الكاش المشترك قدامها بس، فلو الـ entry اتمسح (cull أو clear) الـ revoke بيفضل شغال.
+    user_id من غير FK عشان الصف يفضل بعد ما اليوزر يتمسح والـ tokens بتاعته تفضل مرفوضة.
+    """
+    user_id = models.IntegerField(primary_key=True)
+    # بتزيد لما الـ roles أو بيانات اليوزر تتغير → الـ access tokens بس (الـ refresh بيطلع claims جديدة)
+    claims_version = models.PositiveIntegerField(default=0)
+    # بتزيد مع الـ revoke (باسورد، deactivate، حذف، logout من كل الأجهزة) → كل الـ tokens
+    tokens_version = models.PositiveIntegerField(default=0)
+
 
-  
\ No newline at end of file
+class IdempotencyLock(models.Model):
+    """
+    الـ lock بتاع Idempotency-Key وهو شغال (EcommerceApi.idempotency): الـ primary key هو اللي بيضمن إن
+    ريكويست واحد بس ياخده، لأن cache.add مش atomic على الـ FileBasedCache (الكاش المشترك بين الـ processes).
+    الصف بيتمسح أول ما الـ view يخلص، والصف الأقدم من LOCK_TIMEOUT lock ميت (الـ process وقع).
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    created_at = models.DateTimeField(default=timezone.now)
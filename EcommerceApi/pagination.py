@@ -0,0 +1,233 @@
+import base64
+import binascii
+import datetime
+import decimal
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination بترتيب ثابت زي (created_at, id):
+    بدل COUNT(*) و OFFSET بنفلتر بـ WHERE (created_at, id) > (آخر قيم في الصفحة اللي فاتت)
+    فكل صفحة بتاخد نفس الوقت مهما كانت بعيدة.
+
+    الـ cursor مجرد base64 لقيم آخر صف (أو أول صف لو رايحين لورا)، والترتيب لازم ينتهي بـ id
+    عشان يبقى unique. الحقول اللي بنرتب بيها ما ينفعش تبقى NULL.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.current_ordering = self.get_ordering(request, queryset, view)
+
+        cursor = self.decode_cursor(request, queryset)
+        reverse, position = cursor if cursor else (False, None)
+
+        ordering = self.current_ordering
+        if reverse:
+            ordering = [self._flip(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+
+        # صف زيادة عشان نعرف فيه صفحة بعدها ولا لأ من غير COUNT
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        has_next = has_more if not reverse else True
+        has_previous = position is not None if not reverse else has_more
+        self.next_position = self._position(rows[-1]) if rows and has_next else None
+        self.previous_position = self._position(rows[0]) if rows and has_previous else None
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        """
+        لو العميل باعت ?ordering= (وهو من ordering_fields) بنرتب بيه وبعده id بنفس الاتجاه.
+        """
+        for backend in getattr(view, 'filter_backends', ()):
+            if hasattr(backend, 'get_keyset_ordering'):
+                ordering = backend().get_keyset_ordering(request, queryset, view)
+                if ordering:
+                    return list(ordering)
+
+        allowed = getattr(view, 'ordering_fields', None)
+        # من غير ordering_fields صريحة الـ OrderingFilter بيسمح بكل حقول الـ serializer (relations كمان)
+        if api_settings.ORDERING_PARAM in request.query_params and isinstance(allowed, (list, tuple)):
+            for backend in getattr(view, 'filter_backends', ()):
+                if issubclass(backend, OrderingFilter):
+                    ordering = backend().get_ordering(request, queryset, view)
+                    columns = [self._column(queryset.model, field, allowed) for field in ordering or ()]
+                    if columns and None not in columns:
+                        if columns[-1].lstrip('-') != 'id':
+                            columns.append('-id' if columns[-1].startswith('-') else 'id')
+                        return columns
+        return list(self.ordering)
+
+    @staticmethod
+    def _column(model, field, allowed):
+        """
+        العمود اللي بنعمل عليه keyset لحقل من ?ordering=: الـ FK بيتقارن بالـ <fk>_id، والحقول
+        اللي مش في ordering_fields أو nullable أو مش أعمدة (reverse/m2m) مرفوضة (None)
+        """
+        name = field.lstrip('-')
+        if name not in allowed:
+            return None
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete or model_field.many_to_many or model_field.null:
+            return None
+        return field[:len(field) - len(name)] + model_field.attname
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page (max %d).' % self.max_page_size,
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self._link(False, self.next_position)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self._link(True, self.previous_position)
+
+    # ---- helpers ----
+
+    def _link(self, reverse, position):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(reverse, position))
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else '-' + field
+
+    @staticmethod
+    def _after(ordering, position):
+        """
+        (a, b, c) > (x, y, z) بالترتيب المعجمي:
+        a > x  OR  (a = x AND b > y)  OR  (a = x AND b = y AND c > z)
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = '%s__lt' % name if field.startswith('-') else '%s__gt' % name
+            condition |= Q(**equal, **{lookup: value})
+            equal[name] = value
+        return condition
+
+    def _position(self, row):
+        values = []
+        for field in self.current_ordering:
+            name = field.lstrip('-')
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            if isinstance(value, (datetime.datetime, datetime.date)):
+                value = value.isoformat()
+            elif isinstance(value, decimal.Decimal):
+                value = str(value)
+            values.append(value)
+        return values
+
+    def encode_cursor(self, reverse, position):
+        payload = json.dumps({'r': int(reverse), 'p': position}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            reverse, position = bool(payload['r']), payload['p']
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.current_ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # الـ cursor جاي من العميل: كل قيمة لازم تبقى من نوع الحقل قبل ما تدخل الـ filter
+        try:
+            position = [
+                self._ordering_field(queryset, field).to_python(value)
+                for field, value in zip(self.current_ordering, position)
+            ]
+        except (ValidationError, TypeError, ValueError, FieldDoesNotExist):
+            raise NotFound(self.invalid_cursor_message)
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, position
+
+    @staticmethod
+    def _ordering_field(queryset, field):
+        name = field.lstrip('-')
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return queryset.model._meta.get_field(name)
+
+
+class PriceKeysetPagination(KeysetPagination):
+    ordering = ('price', 'id')
@@ -0,0 +1,264 @@
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+
+import stripe
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import Order, OrderItem
+
+logger = logging.getLogger(__name__)
+
+# Stripe Checkout sessions بتنتهي بعد 24 ساعة
+SESSION_TTL = timedelta(hours=24)
+
+# ما نرجعش session فاضل على انتهائها أقل من كده
+SESSION_REUSE_MARGIN = timedelta(minutes=5)
+
+
+@dataclass
+class PaymentSession:
+    id: str
+    url: str
+    expires_at: datetime
+
+
+class PaymentUnavailable(APIException):
+    """الـ provider بطيء أو واقع: بنرجع 503 بسرعة بدل ما نحجز الـ worker"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Payment provider is unavailable, try again later.'
+    default_code = 'payment_unavailable'
+
+
+class PaymentFailed(Exception):
+    """الـ provider رفض الطلب نفسه (داتا غلط مثلا): مش عطل، فما بيفتحش الدايرة"""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ---- providers ----
+
+class StripeProvider:
+    """Stripe Checkout بـ timeout صريح ومن غير retries (الـ retry قرار الـ client مش الـ worker)"""
+
+    def __init__(self, timeout):
+        self.client = stripe.StripeClient(
+            settings.STRIPE_SECRET_KEY,
+            http_client=stripe.RequestsClient(timeout=timeout),
+            max_network_retries=0,
+        )
+
+    def create_session(self, order_id, customer_email, line_items):
+        try:
+            session = self.client.v1.checkout.sessions.create(params={
+                "payment_method_types": ["card"],
+                "line_items": line_items,
+                "metadata": {"order_id": order_id},
+                "customer_email": customer_email,
+                "mode": "payment",
+                "success_url": f"http://127.0.0.1:8000/api/orders/{order_id}/success_payment",
+                "cancel_url": f"http://127.0.0.1:8000/api/orders/{order_id}/cancel_payment",
+            })
+        except (stripe.InvalidRequestError, stripe.CardError) as e:
+            raise PaymentFailed(str(e))
+        expires_at = datetime.fromtimestamp(session.expires_at, tz=dt_timezone.utc)
+        return PaymentSession(id=session.id, url=session.url, expires_at=expires_at)
+
+
+class StubProvider:
+    """
+    provider لوكال للـ load tests من غير نت: بيستنى PAYMENT_STUB_LATENCY ثانية
+    وبيرجع session وهمية، أو بيرمي exception لو PAYMENT_STUB_FAIL = True.
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+
+    def create_session(self, order_id, customer_email, line_items):
+        time.sleep(_setting('PAYMENT_STUB_LATENCY', 0))
+        if _setting('PAYMENT_STUB_FAIL', False):
+            raise ConnectionError('stub provider failure')
+        session_id = 'cs_stub_%s' % uuid.uuid4().hex
+        return PaymentSession(
+            id=session_id,
+            url=f'http://127.0.0.1:8000/stub-checkout/{session_id}',
+            expires_at=timezone.now() + SESSION_TTL,
+        )
+
+
+PROVIDERS = {
+    'stripe': StripeProvider,
+    'stub': StubProvider,
+}
+
+
+# ---- circuit breaker ----
+
+class CircuitBreaker:
+    """
+    بعد failure_threshold فشل ورا بعض الدايرة بتتفتح وكل الطلبات بترجع 503 فورًا
+    لمدة reset_timeout، وبعدها طلب واحد بس بيجرب (half-open): لو نجح الدايرة بتتقفل.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+
+# ---- executor ----
+
+_lock = threading.Lock()
+_executor = None
+_slots = None
+_breaker = None
+_providers = {}
+
+
+def _runtime():
+    """الـ pool والـ breaker واحد لكل process، بيتعملوا أول مرة بس"""
+    global _executor, _slots, _breaker
+    with _lock:
+        if _executor is None:
+            max_workers = _setting('PAYMENT_MAX_WORKERS', 4)
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='payments')
+            # الطابور محدود: طلب شغال + طلب مستني لكل thread، والباقي 503 على طول
+            _slots = threading.BoundedSemaphore(max_workers * 2)
+            _breaker = CircuitBreaker(
+                _setting('PAYMENT_BREAKER_THRESHOLD', 5),
+                _setting('PAYMENT_BREAKER_RESET', 30),
+            )
+        return _executor, _slots, _breaker
+
+
+def get_provider(timeout):
+    """instance واحدة لكل provider (بالـ HTTP session بتاعتها) بدل واحدة لكل ريكويست"""
+    name = _setting('PAYMENT_PROVIDER', 'stripe')
+    with _lock:
+        if (name, timeout) not in _providers:
+            _providers[name, timeout] = PROVIDERS[name](timeout)
+        return _providers[name, timeout]
+
+
+def build_line_items(order):
+    """الـ line items من query واحدة (order items + menu items)"""
+    items = OrderItem.objects.filter(order=order).select_related('menuitem').only(
+        'quantity', 'unit_price', 'menuitem__title',
+    )
+    return [
+        {
+            "price_data": {
+                "currency": "usd",  # غيّرها للعملة اللي عايزها (مثلا egp)
+                "product_data": {
+                    "name": item.menuitem.title,
+                    "description": f"Quantity: {item.quantity}",
+                },
+                "unit_amount": int(item.unit_price * 100),  # Stripe بيحسب بالـ cents
+            },
+            "quantity": item.quantity,
+        }
+        for item in items
+    ]
+
+
+def saved_session(order):
+    """الـ session المتخزنة على الأوردر لو لسه صالحة"""
+    expires_at = order.payment_session_expires_at
+    if not order.payment_session_url or expires_at is None:
+        return None
+    if expires_at - SESSION_REUSE_MARGIN <= timezone.now():
+        return None
+    return PaymentSession(id=order.payment_session_id, url=order.payment_session_url, expires_at=expires_at)
+
+
+def initiate_payment(order):
+    """
+    بيرجع الـ session المتخزنة على الأوردر لو لسه صالحة، وإلا بيعمل واحدة جديدة ويحفظها.
+    الـ DB queries بتحصل في الـ request thread، ونداء الـ provider بيتنفذ في thread pool محدود
+    والـ worker بيستنى بحد أقصى PAYMENT_TIMEOUT.
+
+    بيرمي PaymentFailed لو الـ provider رفض الطلب، و PaymentUnavailable لو الدايرة مفتوحة
+    أو الطابور مليان أو الـ provider فشل/اتأخر.
+    """
+    session = saved_session(order)
+    if session is not None:
+        return session
+
+    executor, slots, breaker = _runtime()
+    timeout = _setting('PAYMENT_TIMEOUT', 10)
+    line_items = build_line_items(order)
+    customer_email = User.objects.filter(pk=order.user_id).values_list('email', flat=True).first()
+    provider = get_provider(timeout)
+
+    if not slots.acquire(blocking=False):
+        raise PaymentUnavailable()
+    if not breaker.allow():
+        slots.release()
+        raise PaymentUnavailable()
+    try:
+        future = executor.submit(provider.create_session, order.id, customer_email, line_items)
+    except BaseException:
+        slots.release()
+        breaker.record_failure()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+
+    try:
+        session = future.result(timeout=timeout)
+    except FutureTimeoutError:
+        # الـ thread هيكمل لوحده لحد الـ HTTP timeout بتاع الـ provider، بس الـ worker مش مستنيه
+        breaker.record_failure()
+        raise PaymentUnavailable('Payment provider timed out.')
+    except PaymentFailed:
+        breaker.record_success()
+        raise
+    except Exception:
+        logger.exception("Error creating payment session for order %s", order.id)
+        breaker.record_failure()
+        raise PaymentUnavailable()
+    breaker.record_success()
+    Order.objects.filter(pk=order.pk).update(
+        payment_session_id=session.id,
+        payment_session_url=session.url,
+        payment_session_expires_at=session.expires_at,
+    )
+    return session
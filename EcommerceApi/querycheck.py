@@ -0,0 +1,173 @@
+import logging
+import re
+import traceback
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# IN (%s, %s, %s) بيختلف طوله من ريكويست للتاني بس هو نفس الـ query
+_PLACEHOLDER_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+_IGNORED_PREFIXES = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT', 'BEGIN', 'COMMIT', 'ROLLBACK')
+# عدد الـ frames اللي بتتسجل لكل query متكررة (من كود المشروع بس)
+STACK_DEPTH = 8
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def query_shape(sql):
+    """الـ SQL من غير القيم (Django بيبعتها params أصلا) ومن غير طول الـ IN lists"""
+    return _PLACEHOLDER_LIST.sub('(%s, ...)', sql.strip())
+
+
+# entry points والـ middlewares اللي بتعد الـ queries: موجودين في كل stack فمش بيقولوا حاجة
+_SKIPPED_FILES = ('manage.py', 'wsgi.py', 'asgi.py', 'metrics.py', 'querycheck.py')
+
+
+def _project_stack():
+    base = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(base) and 'site-packages' not in frame.filename
+        and not frame.filename.endswith(_SKIPPED_FILES)
+    ]
+    return traceback.format_list(frames[-STACK_DEPTH:]) or ['(no project code in the stack)\n']
+
+
+class QueryShapeRecorder:
+    """
+    execute_wrapper بيعد كل شكل query اتنفذ كام مرة. أول ما شكل يتكرر بنحفظ الـ stack بتاع
+    التكرار ده (عادة ده المكان اللي فيه الـ lazy relation: __str__، SerializerMethodField، source='x.y').
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+        self.shapes = {}   # shape → [count, stack]
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(_IGNORED_PREFIXES):
+            self.count += 1
+            self.statements.append(sql)
+            shape = query_shape(sql)
+            seen = self.shapes.get(shape)
+            if seen is None:
+                self.shapes[shape] = [1, None]
+            else:
+                seen[0] += 1
+                if seen[1] is None:
+                    seen[1] = _project_stack()
+        return execute(sql, params, many, context)
+
+    def repeated(self, threshold):
+        return [(shape, count, stack) for shape, (count, stack) in self.shapes.items() if count >= threshold]
+
+    def describe(self, threshold):
+        lines = []
+        for shape, count, stack in self.repeated(threshold):
+            lines.append(f'  repeated {count}x: {shape}')
+            lines += ['    ' + line.rstrip().replace('\n', '\n    ') for line in stack or ()]
+        return '\n'.join(lines)
+
+
+@contextmanager
+def record_query_shapes():
+    recorder = QueryShapeRecorder()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        yield recorder
+
+
+def view_action(match, method):
+    """(view class, action) من الـ resolver_match: action الـ viewset أو الـ method لو مش viewset"""
+    func = getattr(match, 'func', None)
+    view_class = getattr(func, 'cls', None) or getattr(func, 'view_class', None)
+    actions = getattr(func, 'actions', None)
+    action = actions.get(method.lower()) if actions else None
+    return view_class, action or method.lower()
+
+
+def query_budget(view_class, action):
+    """الحد الأقصى للـ queries المعلن على الـ view (query_budgets = {'list': 2, ...}) أو None"""
+    return (getattr(view_class, 'query_budgets', None) or {}).get(action)
+
+
+class NPlusOneDetected(Exception):
+    pass
+
+
+class NPlusOneMiddleware:
+    """
+    للتطوير بس (QUERY_DETECTOR_ENABLED، افتراضيا = DEBUG): أي query بنفس الشكل اتكررت
+    QUERY_DETECTOR_THRESHOLD مرة في ريكويست واحد بتتسجل في اللوج مع الـ stack اللي عملها،
+    وكمان لو الـ view عدّى الـ query_budgets بتاعه. مع QUERY_DETECTOR_RAISE الريكويست بيفشل.
+    """
+
+    def __init__(self, get_response):
+        if not _setting('QUERY_DETECTOR_ENABLED', settings.DEBUG):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        # 2 بيمسك حاجات طبيعية (الـ admin بيعمل COUNT مرتين مثلا)، الـ tests بتستخدم 2
+        self.threshold = _setting('QUERY_DETECTOR_THRESHOLD', 3)
+        self.raise_errors = _setting('QUERY_DETECTOR_RAISE', False)
+
+    def __call__(self, request):
+        with record_query_shapes() as recorder:
+            response = self.get_response(request)
+
+        problems = []
+        if recorder.repeated(self.threshold):
+            problems.append(recorder.describe(self.threshold))
+        view_class, action = view_action(getattr(request, 'resolver_match', None), request.method)
+        budget = query_budget(view_class, action)
+        if budget is not None and recorder.count > budget:
+            problems.append(f'  {recorder.count} queries, budget for {view_class.__name__}.{action} is {budget}')
+        if problems:
+            message = f'Query problems in {request.method} {request.get_full_path()}:\n' + '\n'.join(problems)
+            if self.raise_errors:
+                raise NPlusOneDetected(message)
+            logger.warning(message)
+        return response
+
+
+class QueryBudgetMixin:
+    """
+    للـ tests: self.assertWithinQueryBudget(self.client.get, url) بيبعت الريكويست ويفشل لو
+    عدد الـ queries عدّى الـ query_budgets المعلن على الـ viewset للـ action ده، أو لو فيه
+    query اتكررت (N+1). الـ action لازم يكون ليه budget معلن.
+
+    الـ budget هو الريكويست كله زي ما NPlusOneMiddleware بيعده، بالـ authentication: self.authenticate(client, user)
+    بيبعت JWT حقيقي والـ versions بتاعة اليوزر مش في الكاش (force_authenticate بيعدّي الـ query دي).
+    """
+    query_repeat_threshold = 2
+
+    def authenticate(self, client, user):
+        from rest_framework_simplejwt.tokens import AccessToken
+        from .authentication import VERSIONS_KEY, set_claims
+
+        token = set_claims(AccessToken.for_user(user), user)
+        cache.delete(VERSIONS_KEY.format(user.pk))
+        client.credentials(HTTP_AUTHORIZATION=f'JWT {token}')
+        return client
+
+    def assertWithinQueryBudget(self, send, path, *args, **kwargs):
+        with record_query_shapes() as recorder:
+            response = send(path, *args, **kwargs)
+
+        view_class, action = view_action(response.resolver_match, response.request['REQUEST_METHOD'])
+        budget = query_budget(view_class, action)
+        if budget is None:
+            self.fail(f'{getattr(view_class, "__name__", view_class)}.{action} has no query_budgets entry ({path})')
+        if recorder.count > budget:
+            self.fail(f'{path}: {recorder.count} queries, {view_class.__name__}.{action} budget is {budget}\n'
+                      + '\n'.join('  ' + sql for sql in recorder.statements))
+        if recorder.repeated(self.query_repeat_threshold):
+            self.fail(f'{path}: repeated queries (N+1)\n' + recorder.describe(self.query_repeat_threshold))
+        return response
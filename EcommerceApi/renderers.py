@@ -0,0 +1,74 @@
+import codecs
+
+import msgpack
+import orjson
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# أي نوع orjson ما بيطلعوش زي DRF بالظبط بيعدي على JSONEncoder.default بتاعها:
+# الـ datetime ('Z' بدل '+00:00')، والـ Decimal (string أو float حسب COERCE_DECIMAL_TO_STRING)
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer بـ orjson: نفس البايتات اللي JSONRenderer بتاعة DRF بتطلعها (compact، UTF-8،
+    و U+2028/U+2029 escaped)، ولو حاجة مش مدعومة (indent، int أكبر من 64 bit...) بنرجع لـ DRF.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.ensure_ascii or not self.compact or self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # زي DRF: الحرفين دول valid في JSON بس بيكسروا JavaScript
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser بـ orjson للـ bodies الـ UTF-8 (أي charset تاني بيعدي على DRF)"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    MessagePack للـ clients الداخلية اللي بتبعت Accept: application/msgpack.
+    نفس القيم اللي في الـ JSON: الـ Decimal والـ datetime بيتحولوا بنفس JSONEncoder.default.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    encoder_class = JSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=self.encoder_class().default, use_bin_type=True, datetime=False)
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, TypeError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as exc:
+            raise ParseError('MessagePack parse error - %s' % str(exc))
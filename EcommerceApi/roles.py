@@ -0,0 +1,48 @@
+from django.core.cache import cache
+
+MANAGER = "Manager"
+DELIVERY_CREW = "Delivery_crew"
+
+# مدة الكاش بين الريكويستات (الكاش بيتمسح برضه لما العضوية تتغير)
+ROLES_CACHE_TIMEOUT = 60 * 15
+ROLES_CACHE_KEY = "user-roles:{}"
+
+
+def get_roles(user):
+    """
+    ترجع أسماء الجروبات بتاعة اليوزر كـ frozenset.
+    النتيجة بتتخزن على object اليوزر نفسه (نفس الـ object طول الريكويست
+    بين الـ permissions والـ viewsets والـ serializers) وكمان في الكاش بين الريكويستات.
+    """
+    if user is None or not getattr(user, "is_authenticated", False):
+        return frozenset()
+
+    roles = getattr(user, "_roles_cache", None)
+    if roles is not None:
+        return roles
+
+    key = ROLES_CACHE_KEY.format(user.pk)
+    roles = cache.get(key)
+    if roles is None:
+        roles = frozenset(user.groups.values_list("name", flat=True))
+        cache.set(key, roles, ROLES_CACHE_TIMEOUT)
+    user._roles_cache = roles
+    return roles
+
+
+def has_role(user, role):
+    return role in get_roles(user)
+
+
+def is_manager(user):
+    """Manager أو superuser"""
+    return bool(user) and (getattr(user, "is_superuser", False) or has_role(user, MANAGER))
+
+
+def is_delivery_crew(user):
+    return has_role(user, DELIVERY_CREW)
+
+
+def invalidate_roles(user_ids):
+    """تتنادى بعد أي تغيير في جروبات اليوزرز دول"""
+    cache.delete_many([ROLES_CACHE_KEY.format(pk) for pk in user_ids])
@@ -0,0 +1,130 @@
+import re
+
+from django.db import connections
+from django.db.models import F, Lookup
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
+
+from .models import MenuItemSearchIndex
+
+FTS_TABLE = MenuItemSearchIndex._meta.db_table
+
+_fts_tables = {}
+
+# نفس الـ triggers اللي في migration 0003. SQLite بيعيد بنا جدول الـ menuitem في أي AddField/AlterField
+# (create جديد + copy + drop القديم)، والـ drop بيمسح الـ triggers معاه. أي migration بتعمل كده لازم
+# ترجعها بنفسها (زي 0004)؛ الـ post_migrate هنا احتياطي لو واحدة نسيت.
+FTS_TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS "{FTS_TABLE}_ai" AFTER INSERT ON "EcommerceApi_menuitem" BEGIN
+            INSERT INTO "{FTS_TABLE}"(rowid, title, category_id) VALUES (new.id, new.title, new.category_id);
+        END
+    """,
+    f'{FTS_TABLE}_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS "{FTS_TABLE}_ad" AFTER DELETE ON "EcommerceApi_menuitem" BEGIN
+            INSERT INTO "{FTS_TABLE}"("{FTS_TABLE}", rowid, title, category_id)
+            VALUES ('delete', old.id, old.title, old.category_id);
+        END
+    """,
+    f'{FTS_TABLE}_au': f"""
+        CREATE TRIGGER IF NOT EXISTS "{FTS_TABLE}_au" AFTER UPDATE OF title, category_id ON "EcommerceApi_menuitem" BEGIN
+            INSERT INTO "{FTS_TABLE}"("{FTS_TABLE}", rowid, title, category_id)
+            VALUES ('delete', old.id, old.title, old.category_id);
+            INSERT INTO "{FTS_TABLE}"(rowid, title, category_id) VALUES (new.id, new.title, new.category_id);
+        END
+    """,
+}
+
+
+def fts_available(connection):
+    """الـ FTS5 table موجودة بس على SQLite وبعد migration 0003"""
+    if connection.vendor != 'sqlite':
+        return False
+    if connection.alias not in _fts_tables:
+        with connection.cursor() as cursor:
+            _fts_tables[connection.alias] = FTS_TABLE in connection.introspection.table_names(cursor)
+    return _fts_tables[connection.alias]
+
+
+def ensure_fts_triggers(using='default', **kwargs):
+    """
+    post_migrate: لو أي trigger ناقص بنرجعه ونعمل rebuild للـ index
+    (أي كتابة حصلت والـ triggers مش موجودة ما اتسجلتش فيه).
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        if FTS_TABLE not in connection.introspection.table_names(cursor):
+            return
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'EcommerceApi_menuitem'")
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in FTS_TRIGGERS if name not in existing]
+        if not missing:
+            return
+        for name in missing:
+            cursor.execute(FTS_TRIGGERS[name])
+        cursor.execute('INSERT INTO "{0}"("{0}") VALUES (\'rebuild\')'.format(FTS_TABLE))
+
+
+def build_match_query(terms):
+    """
+    كل كلمة بتتحط بين quotes عشان رموز FTS5 ما تكسرش الـ query،
+    والكلمة اللي آخرها * بتبقى prefix query: chick* → "chick"*
+    """
+    tokens = re.findall(r'\w+\*?', terms)
+    phrases = []
+    for token in tokens:
+        if token.endswith('*'):
+            phrases.append('"%s"*' % token[:-1])
+        else:
+            phrases.append('"%s"' % token)
+    return ' '.join(phrases) or None
+
+
+@MenuItemSearchIndex._meta.get_field('title').register_lookup
+class Match(Lookup):
+    """title__match: الـ FTS5 MATCH على عمود الـ title (العمود الوحيد المتفهرس في الـ index)"""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+class MenuItemSearchFilter(SearchFilter):
+    """
+    ?search= من الـ FTS5 index بدل LIKE '%term%' (اللي بيعمل full table scan).
+    النتايج مرتبة بالـ relevance، والـ category (?category_id= أو nested route) بتتفلتر
+    جوه الـ index نفسه. لو الـ index مش موجود بنرجع لـ SearchFilter العادي.
+    """
+
+    def _category_id(self, request, view):
+        category_id = view.kwargs.get('category_pk') or request.query_params.get('category_id')
+        try:
+            return int(category_id) if category_id else None
+        except ValueError:
+            return None
+
+    def _is_active(self, request, queryset):
+        return bool(request.query_params.get(self.search_param, '').strip()) and fts_available(connections[queryset.db])
+
+    def filter_queryset(self, request, queryset, view):
+        if not self._is_active(request, queryset):
+            return super().filter_queryset(request, queryset, view)
+
+        match = build_match_query(request.query_params[self.search_param])
+        # JOIN على الـ index: الـ MATCH والترتيب بالـ rank والـ keyset والـ LIMIT كلهم في query واحدة
+        # (من غير كلمات بنرجع none() بس بنفس الـ search_rank عشان الـ keyset ordering)
+        queryset = queryset.filter(search_index__title__match=match) if match else queryset.none()
+        category_id = self._category_id(request, view)
+        if category_id is not None:
+            queryset = queryset.filter(search_index__category_id=category_id)
+        return queryset.annotate(search_rank=F('search_index__rank'))
+
+    def get_keyset_ordering(self, request, queryset, view):
+        # لو العميل طالب ?ordering= صريح يبقى هو الأولى من الـ relevance
+        if api_settings.ORDERING_PARAM in request.query_params or not self._is_active(request, queryset):
+            return None
+        return ('search_rank', 'id')
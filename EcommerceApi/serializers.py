@@ -1,12 +1,58 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User, Group
-from .models import MenuItem, Category, Cart, CartItem, Order, OrderItem, MenuItemReview
+from .models import MenuItem, Category, Cart, CartItem, Order, OrderItem, MenuItemReview, RATING_CHOICES
 from djoser.serializers import UserCreateSerializer as DjoserUserCreateSerializer
 from collections import defaultdict
+from datetime import timedelta
+import copy
 from django.db import transaction
-from django.db.models import Q
+from django.db import models
+from django.db.models import Q, F, Sum, Case, When, Value, Prefetch
 from rest_framework.exceptions import PermissionDenied
+from rest_framework.utils.encoders import JSONEncoder
 from django.db import IntegrityError
+from django.utils import timezone
+from .caching import MENU_ITEMS, bump_generation
+from .roles import MANAGER, DELIVERY_CREW, is_manager, is_delivery_crew
+from .analytics import record_order, REPORT_GROUPS
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse_field_list(request, param):
+    """?fields=id,title → {'id', 'title'}، و None لو الـ param مش موجود أو الريكويست مش قراية"""
+    if request is None or request.method not in ('GET', 'HEAD') or param not in request.query_params:
+        return None
+    return {name.strip() for name in request.query_params[param].split(',') if name.strip()}
+
+
+class DynamicFieldsMixin:
+    """
+    ?fields=id,title → الـ response فيه الحقول دي بس (في الـ GET وللـ serializer الرئيسي بس).
+    الحقول الـ nested اللي في Meta.expandable_fields بترجع pk بس لو مطلوبة في ?fields=
+    ومش موجودة في ?expand=. من غير ?fields= الـ response زي ما هو.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent.parent if isinstance(self.parent, serializers.ListSerializer) else self.parent
+        if parent is not None:
+            return fields
+
+        request = self.context.get('request')
+        requested = parse_field_list(request, FIELDS_PARAM)
+        if requested is None:
+            return fields
+        expanded = parse_field_list(request, EXPAND_PARAM) or set()
+        collapsed = getattr(self.Meta, 'expandable_fields', {})
+        for name in list(fields):
+            if name not in requested:
+                del fields[name]
+            elif name in collapsed and name not in expanded:
+                fields[name] = copy.deepcopy(collapsed[name])
+        return fields
+
 
 # Serializer مخصص لـDjoser
 class UserCreateSerializer(DjoserUserCreateSerializer):
@@ -52,35 +98,49 @@ class BaseGroupUserSerializer(serializers.ModelSerializer):
 
 
 class ManagerUserSerializer(BaseGroupUserSerializer):
-    group_name = "Manager"
+    group_name = MANAGER
 
 
 class DeliveryUserSerializer(BaseGroupUserSerializer):
-    group_name = "Delivery_crew"
+    group_name = DELIVERY_CREW
 
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'name']
 
 
         
-class MenuItemSerializer(serializers.ModelSerializer):
+class MenuItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), source='category', write_only=True)
 
+    rating_histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+
     class Meta:
         model = MenuItem
-        fields = ['id', 'title', 'price', 'inventory', 'category', 'category_id', 'featured']
+        fields = ['id', 'title', 'price', 'inventory', 'category', 'category_id', 'featured',
+                  'review_count', 'rating_sum', 'rating_average', 'rating_histogram']
+        read_only_fields = ['review_count', 'rating_sum', 'rating_average']
+        # DRF بيعمل validator من unique_featured_menuitem يرفض عنصر مميز تاني، واحنا بنلغي القديم بدل كده (create/update)
+        extra_kwargs = {'featured': {'validators': []}}
+        expandable_fields = {'category': serializers.IntegerField(source='category_id', read_only=True)}
 
     def create(self, validated_data):
         category_id = self.context.get('category_id')
         if category_id:
             # override category من الـ body أو لو مش موجود ضعها
             validated_data['category'] = Category.objects.get(pk=category_id)
-        return MenuItem.objects.create(**validated_data)
+        try:
+            with transaction.atomic():
+                if validated_data.get('featured'):
+                    # زي الـ update: عنصر مميز واحد بس (قيد unique_featured_menuitem)، فنلغي القديم الأول
+                    MenuItem.objects.select_for_update().filter(featured=True).update(featured=False)
+                return MenuItem.objects.create(**validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError("Could not set featured due to concurrency. Please retry.")
 
     
     def update(self, instance, validated_data):
@@ -92,7 +152,7 @@ class MenuItemSerializer(serializers.ModelSerializer):
         featured_value = validated_data.pop('featured', None)
 
         # فحص الصلاحية مبكراً
-        if featured_in_payload and not (user and (user.is_superuser or user.groups.filter(name="Manager").exists())):
+        if featured_in_payload and not is_manager(user):
             raise PermissionDenied("Only managers/superusers can change the 'featured' status.")
 
         try:
@@ -126,7 +186,7 @@ class MenuItemShortSerializer(serializers.ModelSerializer):
         model = MenuItem
         fields = ['id', 'title', 'price']
 
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     menuitem_title = serializers.CharField(source='menuitem.title', read_only=True)
     menuitem_price = serializers.DecimalField(
         source='menuitem.price', max_digits=10, decimal_places=2, read_only=True
@@ -144,6 +204,9 @@ class CartItemSerializer(serializers.ModelSerializer):
         fields = ['cart_name','id', 'menuitem_title','menuitem_price', 'quantity', 'subtotal', 'menuitem_id']
 
     def calculate_price(self,cart_item: CartItem):
+        # لو الـ queryset جاية من with_subtotals يبقى الـ subtotal محسوب جاهز
+        if hasattr(cart_item, 'subtotal'):
+            return cart_item.subtotal
         return cart_item.quantity * cart_item.menuitem.price
     
     def create(self, validated_data):
@@ -151,19 +214,92 @@ class CartItemSerializer(serializers.ModelSerializer):
         menuitem = validated_data['menuitem']
         quantity = validated_data.get('quantity', 1)
 
-        # حاول نجيب item موجود مسبقًا لنفس ال user ونفس ال menuitem
+        cart = validated_data.get('cart') or Cart.objects.get(user=user)
+
+        # حاول نجيب item موجود مسبقًا لنفس الكارت ونفس ال menuitem
         cart_item, created = CartItem.objects.get_or_create(
-            cart__user=user,
+            cart=cart,
             menuitem=menuitem,
             defaults={'quantity': quantity}
         )
 
         if not created:
-            # لو موجود بالفعل، نزود الكمية
-            cart_item.quantity += quantity
-            cart_item.save()
+            # لو موجود بالفعل، نزود الكمية في الداتابيز (آمن لو فيه ريكويستين في نفس الوقت)
+            CartItem.objects.filter(pk=cart_item.pk).update(quantity=F('quantity') + quantity)
+            cart_item.refresh_from_db(fields=['quantity'])
+            # get() ما بيحطش الـ relations اللي عندنا أصلا، والـ response محتاجهم
+            cart_item.cart, cart_item.menuitem = cart, menuitem
 
         return cart_item
+
+
+class CartBulkItemSerializer(serializers.Serializer):
+    menuitem_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=0, required=False, default=1)
+
+
+class CartBulkSerializer(serializers.Serializer):
+    """
+    تعديل كذا منتج في الكارت في ريكويست واحد:
+        add     → يزود الكمية (أو يضيف المنتج)
+        set     → يحط الكمية دي بالظبط (0 = يشيله)
+        replace → زي set بس أي منتج مش في الليستة بيتشال (إعادة بناء الكارت من ليستة محفوظة)
+        remove  → يشيل المنتجات دي
+    كل الـ ids بتتشيك في query واحدة والتعديلات بتتعمل بـ bulk upsert على (cart, menuitem).
+    """
+    OPS = ('add', 'set', 'replace', 'remove')
+    MAX_ITEMS = 100
+
+    op = serializers.ChoiceField(choices=OPS)
+    items = CartBulkItemSerializer(many=True, max_length=MAX_ITEMS)
+
+    def validate(self, attrs):
+        items = attrs['items']
+        if not items and attrs['op'] != 'replace':
+            raise serializers.ValidationError({'items': 'This list may not be empty.'})
+
+        quantities = {}
+        for item in items:
+            if item['menuitem_id'] in quantities:
+                raise serializers.ValidationError({'items': f"Duplicate menuitem_id {item['menuitem_id']}."})
+            if attrs['op'] == 'add' and item['quantity'] < 1:
+                raise serializers.ValidationError({'items': 'Quantity must be at least 1.'})
+            quantities[item['menuitem_id']] = item['quantity']
+
+        existing = set(MenuItem.objects.filter(pk__in=quantities).values_list('pk', flat=True))
+        missing = sorted(set(quantities) - existing)
+        if missing:
+            raise serializers.ValidationError({'items': f'Invalid menuitem_id: {missing}'})
+
+        attrs['quantities'] = quantities
+        return attrs
+
+    @transaction.atomic
+    def save(self, cart):
+        op, quantities = self.validated_data['op'], self.validated_data['quantities']
+        items = CartItem.objects.filter(cart=cart)
+
+        if op == 'remove':
+            items.filter(menuitem_id__in=quantities).delete()
+            return cart
+
+        if op == 'add':
+            current = dict(items.filter(menuitem_id__in=quantities).values_list('menuitem_id', 'quantity'))
+            quantities = {pk: current.get(pk, 0) + quantity for pk, quantity in quantities.items()}
+        if op == 'replace':
+            # delete واحد للي مش في الليستة وللي كميته 0
+            items.exclude(menuitem_id__in=[pk for pk, quantity in quantities.items() if quantity]).delete()
+        else:
+            removed = [pk for pk, quantity in quantities.items() if quantity == 0]
+            if removed:
+                items.filter(menuitem_id__in=removed).delete()
+        CartItem.objects.bulk_create(
+            [CartItem(cart=cart, menuitem_id=pk, quantity=quantity) for pk, quantity in quantities.items() if quantity],
+            update_conflicts=True,
+            unique_fields=['cart', 'menuitem'],
+            update_fields=['quantity'],
+        )
+        return cart
     
 class CartItemGroupedSerializer(serializers.Serializer):
     def to_representation(self, queryset):
@@ -174,13 +310,49 @@ class CartItemGroupedSerializer(serializers.Serializer):
                 'menuitem_title': item.menuitem.title,
                 'menuitem_price': str(item.menuitem.price),
                 'quantity': item.quantity,
-                'subtotal': item.quantity * item.menuitem.price,
+                'subtotal': getattr(item, 'subtotal', None) or item.quantity * item.menuitem.price,
             })
         return grouped
 
+    @staticmethod
+    def stream(queryset, chunk_size=2000):
+        """
+        نفس شكل to_representation بس بيطلع JSON حتة حتة:
+        الترتيب باليوزر في الداتابيز، أعمدة محددة بس، و iterator بدل ما نحمّل كل الصفوف في الميموري
+        """
+        encoder = JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+        rows = queryset.order_by('cart__user__username', 'id').values_list(
+            'cart__user__username', 'id', 'menuitem__title', 'menuitem__price', 'quantity', 'subtotal'
+        ).iterator(chunk_size=chunk_size)
+
+        buffer = ['{']
+        current_username = None
+        for username, item_id, title, price, quantity, subtotal in rows:
+            if username != current_username:
+                if current_username is not None:
+                    buffer.append('],')
+                buffer.append(encoder.encode(username) + ':[')
+                current_username = username
+            else:
+                buffer.append(',')
+            buffer.append(encoder.encode({
+                'id': item_id,
+                'menuitem_title': title,
+                'menuitem_price': str(price),
+                'quantity': quantity,
+                'subtotal': subtotal,
+            }))
+            if len(buffer) >= chunk_size:
+                yield ''.join(buffer)
+                buffer = []
+        if current_username is not None:
+            buffer.append(']')
+        buffer.append('}')
+        yield ''.join(buffer)
+
     
     
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
         items = CartItemSerializer(many=True, read_only=True)
         user = UserserializerSimple(read_only=True)
         total = serializers.SerializerMethodField(method_name='calculate_total', read_only=True)
@@ -190,15 +362,24 @@ class CartSerializer(serializers.ModelSerializer):
             model = Cart
             fields = ['id', 'user', 'items', 'total']
             read_only_fields = ['user']
+            expandable_fields = {
+                'user': serializers.IntegerField(source='user_id', read_only=True),
+                'items': serializers.PrimaryKeyRelatedField(many=True, read_only=True),
+            }
             
         def create(self, validated_data):
             user = self.context['request'].user
             if Cart.objects.filter(user=user).exists():
                raise serializers.ValidationError("This user already has a cart.")
             cart = Cart.objects.create(user=user)
+            # كارت جديد فاضي: من غير ما calculate_total يقرا الـ items تاني
+            cart.total = 0
             return cart
         
         def calculate_total (self, cart: Cart):
+            # total محسوب كـ annotation من Cart.objects.with_totals()
+            if hasattr(cart, 'total'):
+                return cart.total
             items=cart.items.all()
             return sum([item.quantity * item.menuitem.price for item in items])
         
@@ -228,7 +409,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
             price=price
         )
     
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)  # read only علشان يتولد تلقائي
     total = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     delivery_crew = serializers.PrimaryKeyRelatedField(
@@ -243,62 +424,90 @@ class OrderSerializer(serializers.ModelSerializer):
         model = Order
         fields = ['id', 'user', 'created_at', 'total', 'items','delivery_crew', 'status', 'status_display', 'delivery_crew_name']
         read_only_fields = ['user', 'created_at', 'total']
-      
+        expandable_fields = {'items': serializers.PrimaryKeyRelatedField(many=True, read_only=True)}
 
+
+    @transaction.atomic
     def create(self, validated_data):
         user = self.context['request'].user
         cart_items = CartItem.objects.filter(cart__user=user)
 
-        if not cart_items.exists():
+        # query واحدة للكارت كله مع الـ menuitems (بدل query لكل item)
+        lines = list(cart_items.select_related('menuitem'))
+        if not lines:
             raise serializers.ValidationError("Cart is empty!")
 
-        # إنشاء Order جديد
-        order = Order.objects.create(user=user)
-
-        total_price = 0
-        for cart_item in cart_items:
-            unit_price = cart_item.menuitem.price
-            price = unit_price * cart_item.quantity
+        out_of_stock = [line.menuitem.title for line in lines if line.menuitem.inventory < line.quantity]
+        if out_of_stock:
+            raise serializers.ValidationError({"out_of_stock": out_of_stock})
 
-            OrderItem.objects.create(
+        # خصم المخزون في UPDATE واحد مشروط: كل صف بيتخصم بس لو المخزون يكفي
+        in_stock = Q()
+        for line in lines:
+            in_stock |= Q(pk=line.menuitem_id, inventory__gte=line.quantity)
+        reserved = MenuItem.objects.filter(in_stock).update(
+            inventory=F('inventory') - Case(*[When(pk=line.menuitem_id, then=Value(line.quantity)) for line in lines])
+        )
+        if reserved != len(lines):
+            # حد تاني سحب المخزون بعد ما قرينا الكارت → الـ transaction كلها بترجع
+            raise serializers.ValidationError("Some items are no longer in stock. Please review your cart.")
+        # update() مش بيبعت signals فبنهمل كاش الـ menu items بإيدينا
+        bump_generation(MENU_ITEMS)
+
+        # الإجمالي بيتحسب في الداتابيز
+        total = cart_items.aggregate(
+            total=Sum(F('quantity') * F('menuitem__price'), output_field=models.DecimalField(max_digits=10, decimal_places=2))
+        )['total']
+        order = Order.objects.create(user=user, total=total)
+
+        # bulk_create مش بيستدعي OrderItem.save فبنحسب price هنا
+        order_items = OrderItem.objects.bulk_create([
+            OrderItem(
                 order=order,
-                menuitem=cart_item.menuitem,
-                quantity=cart_item.quantity,
-                unit_price=unit_price,
-                price=price
+                menuitem=line.menuitem,
+                quantity=line.quantity,
+                unit_price=line.menuitem.price,
+                price=line.menuitem.price * line.quantity,
             )
-
-            total_price += price
-
-        # تحديث إجمالي الأوردر
-        order.total = total_price
-        order.save()
+            for line in lines
+        ])
+        # مبيعات اليوم (تقارير المانجر) في نفس الـ transaction
+        record_order(order, order_items)
 
         # تفريغ الكارت بعد عمل الأوردر (اختياري)
         cart_items.delete()
 
-        return order
+        # نرجّع الأوردر ومعاه الـ items جاهزة للـ response بدل query لكل item
+        return Order.objects.prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('menuitem'))
+        ).get(pk=order.pk)
     
+    @transaction.atomic
     def update(self, instance, validated_data):
         user = self.context['request'].user  # request متاح من get_serializer_context
+        # DRF بيمسح الـ prefetch من الـ instance بعد الـ update، فبنجيب الأوردر بالـ items والـ menuitems
+        # (في queryين) قبل الحفظ ونعدّل عليه هو: الـ response والـ sales rollups بياخدوا نفس الـ items
+        instance = Order.objects.select_related('delivery_crew').prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('menuitem'))
+        ).get(pk=instance.pk)
 
         # المانجر فقط يقدر يعيّن delivery_crew
-        if user.is_superuser or user.groups.filter(name="Manager").exists():
+        if is_manager(user):
             if 'delivery_crew' in validated_data:
                 instance.delivery_crew = validated_data['delivery_crew']
 
         # فريق التوصيل فقط يقدر يحدّث الحالة لـ Delivered
-        if user.groups.filter(name="Delivery_crew").exists():
+        if is_delivery_crew(user):
             new_status = validated_data.get('status')
             if new_status == 1:  # Delivered
-                if instance.delivery_crew != user:
+                if instance.delivery_crew_id != user.pk:
                     raise serializers.ValidationError("You are not assigned to this order.")
                 instance.status = 1
 
         instance.save()
         return instance
     
-class MenuItemReviewSerializer(serializers.ModelSerializer):
+class MenuItemReviewSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
         user = serializers.StringRelatedField(read_only=True)
         menuitem_id = serializers.PrimaryKeyRelatedField(
         queryset=MenuItem.objects.all(), source='menuitem', write_only=True
@@ -308,3 +517,35 @@ class MenuItemReviewSerializer(serializers.ModelSerializer):
             model = MenuItemReview
             fields = ['id', 'menuitem', 'user', 'rating', 'comment', 'created_at', 'menuitem_id']
             read_only_fields = ['user', 'created_at', 'menuitem']
+
+        def validate_rating(self, value):
+            # الـ histogram بتاع الـ MenuItem من 1 لـ 5
+            if value not in RATING_CHOICES:
+                raise serializers.ValidationError("Rating must be between 1 and 5.")
+            return value
+
+        def validate_menuitem_id(self, value):
+            # الريفيو تابع للـ menu item بتاعه: النقل كان هيسيب إحصائيات الاتنين غلط (perform_update بيعدل الـ rating بس)
+            if self.instance is not None and value.pk != self.instance.menuitem_id:
+                raise serializers.ValidationError("A review cannot be moved to another menu item.")
+            return value
+
+
+class SalesReportQuerySerializer(serializers.Serializer):
+    """?start=&end= (الافتراضي آخر 30 يوم) و ?group_by=day|category|menuitem و ?limit= للـ category/menuitem"""
+    DEFAULT_DAYS = 30
+    MAX_DAYS = 731
+
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    group_by = serializers.ChoiceField(choices=list(REPORT_GROUPS), default='day')
+    limit = serializers.IntegerField(min_value=1, max_value=1000, default=100)
+
+    def validate(self, attrs):
+        end = attrs.setdefault('end', timezone.localdate())
+        start = attrs.setdefault('start', end - timedelta(days=self.DEFAULT_DAYS - 1))
+        if start > end:
+            raise serializers.ValidationError({'start': 'start must be on or before end.'})
+        if (end - start).days >= self.MAX_DAYS:
+            raise serializers.ValidationError({'start': f'The range cannot be longer than {self.MAX_DAYS} days.'})
+        return attrs
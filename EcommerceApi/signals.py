@@ -0,0 +1,116 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .authentication import CLAIM_FIELDS, expire_claims, revoke_tokens
+from .caching import MENU_ITEMS, CATEGORIES, REVIEWS, bump_generation
+from .db_routers import REPLICA_ALIAS
+from .analytics import record_order_deleted, record_status_change
+from .models import MenuItem, Category, MenuItemReview, Order
+from .roles import invalidate_roles
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # reverse=True معناها التغيير جه من ناحية الجروب: group.user_set.add(user)
+    # (زي BaseGroupUserSerializer.create و destroy في ManagerGroupViewSet / DeliveryCrewGroupViewSet)
+    if action == "pre_clear" and reverse:
+        # بعد الـ clear مش هنعرف مين كان في الجروب، فنحفظهم قبلها
+        instance._cleared_user_ids = list(instance.user_set.values_list("pk", flat=True))
+        return
+    if action in ("post_add", "post_remove"):
+        user_ids = pk_set if reverse else [instance.pk]
+    elif action == "post_clear":
+        user_ids = instance.__dict__.pop("_cleared_user_ids", []) if reverse else [instance.pk]
+    else:
+        return
+    invalidate_roles(user_ids)
+    # الـ roles جوه الـ JWT كمان، فالـ access tokens الحالية لازم تتجدد
+    expire_claims(user_ids)
+
+
+@receiver(pre_save, sender=User)
+def user_claims_changed(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    تغيير الباسورد أو الـ deactivate بيلغي كل الـ tokens، وتغيير أي حاجة في الـ claims
+    بيلغي الـ access tokens بس. الـ version بتزيد في نفس الـ transaction، فأي refresh في النص
+    بياخد الداتا القديمة مع الـ version القديمة وبيترفض بعد الـ commit.
+    """
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    fields = [
+        field for field in (*CLAIM_FIELDS, "password", "is_active")
+        if field not in instance.get_deferred_fields() and (update_fields is None or field in update_fields)
+    ]
+    if not fields:
+        return
+    old = User.objects.filter(pk=instance.pk).values(*fields).first()
+    if old is None:
+        return
+    changed = {field for field in fields if old[field] != getattr(instance, field)}
+    if changed & {"password", "is_active"}:
+        revoke_tokens([instance.pk])
+    elif changed:
+        expire_claims([instance.pk])
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    # الـ access token بيتقبل من الـ claims من غير ما اليوزر يتقرا، فلازم يترفض صراحة
+    revoke_tokens([instance.pk])
+
+
+@receiver(post_save, sender=Order)
+def order_status_changed(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """
+    الـ sales rollup بيتحدث لو الـ status اتغير عن اللي اتقرا من الداتابيز (Order.from_db).
+    الأوردر الجديد بيتسجل من OrderSerializer.create بعد ما الـ items تتعمل.
+    """
+    if raw or (update_fields is not None and "status" not in update_fields):
+        return
+    old_status = instance.__dict__.get("_loaded_status")
+    instance._loaded_status = instance.status
+    if old_status is not None and old_status != instance.status:
+        record_status_change(instance, old_status, instance.status)
+
+
+@receiver(pre_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    # قبل الحذف عشان الـ items لسه موجودة (الـ cascade بيمسحها مع الأوردر)
+    record_order_deleted(instance)
+
+
+# أي تعديل في الكتالوج بيغيّر الـ generation فالـ list المتخزنة في الكاش تتهمل
+@receiver([post_save, post_delete], sender=MenuItem)
+def menuitem_changed(sender, **kwargs):
+    bump_generation(MENU_ITEMS)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_changed(sender, **kwargs):
+    # الـ menu items بتعرض الـ category nested
+    bump_generation(CATEGORIES, MENU_ITEMS)
+
+
+@receiver([post_save, post_delete], sender=MenuItemReview)
+def review_changed(sender, **kwargs):
+    # إحصائيات التقييم على الـ menu item بتتغير مع الريفيو (بـ update() من غير signals)
+    bump_generation(REVIEWS, MENU_ITEMS)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    SQLITE_PRAGMAS (شوف settings_production.py) بتتنفذ مرة لكل connection جديدة، ومع CONN_MAX_AGE
+    الـ connection بتفضل مفتوحة بين الريكويستات. على الـ DB-API connection مباشرة عشان ما تتحسبش queries.
+    """
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", None)
+    if connection.vendor != "sqlite" or not pragmas:
+        return
+    for name, value in pragmas.items():
+        connection.connection.execute(f"PRAGMA {name} = {value}")
+    if connection.alias == REPLICA_ALIAS:
+        # الـ replica بتتكتب من syncreplica بس
+        connection.connection.execute("PRAGMA query_only = ON")
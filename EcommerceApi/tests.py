@@ -1,3 +1,1789 @@
-from django.test import TestCase
+import base64
+import hashlib
+import datetime
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import msgpack
+from django.conf import settings
+from django.contrib.auth.models import User, Group
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from .renderers import ORJSONRenderer, MessagePackRenderer
+from .models import (
+    MenuItem, Category, Cart, CartItem, Order, OrderItem, MenuItemReview,
+    DailySalesRollup, CategorySalesRollup, MenuItemSalesRollup, TokenVersion, IdempotencyLock,
+)
+from .serializers import MenuItemSerializer, CategorySerializer, CartSerializer, OrderSerializer, CartItemGroupedSerializer
+from .throttling import ScopedBucketThrottle
+from .cache_backends import TwoTierCache, _local_tiers
+from . import cache_backends
+from .metrics import registry
+from .querycheck import NPlusOneDetected, QueryBudgetMixin, record_query_shapes
+from .db_routers import PrimaryReplicaRouter, ReplicaRoutingMiddleware
+from .management.commands.syncreplica import sync
+from .analytics import rebuild
+from . import payments, catalog
+from .idempotency import idempotent, LOCK_TIMEOUT, REPLAY_HEADER
+from .search import FTS_TRIGGERS
+from .caching import CATEGORIES, MENU_ITEMS, bump_generation, cache_page_versioned, get_generations
+from .views import MenuItemViewSet, CategoryViewSet, OrderViewSet
+
+
+class QueryPlanTests(TestCase):
+    """
+    كل list endpoint لازم يقرا من index: مفيش SCAN على الجدول كله
+    ومفيش temp b-tree للترتيب.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='x')
+        Group.objects.create(name='Manager').user_set.add(cls.manager)
+        cls.crew = User.objects.create_user('crew', password='x')
+        Group.objects.create(name='Delivery_crew').user_set.add(cls.crew)
+        cls.customer = User.objects.create_user('customer', password='x')
+
+        cls.category = Category.objects.create(name='Mains')
+        for i in range(10):
+            item = MenuItem.objects.create(title=f'Item {i}', price=Decimal(i % 3) + 1, inventory=5, category=cls.category)
+            MenuItemReview.objects.create(menuitem=item, user=cls.customer, rating=4)
+            Order.objects.create(user=cls.customer, delivery_crew=cls.crew, total=10)
+        cls.item = item
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def assertUsesIndexes(self, url, user=None):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+
+        selects = [q['sql'] for q in queries if q['sql'].startswith('SELECT') and 'LIMIT' in q['sql']]
+        self.assertTrue(selects, url)
+        for sql in selects:
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = [row[-1] for row in cursor.fetchall()]
+            for step in plan:
+                self.assertFalse(
+                    step.startswith('SCAN') and 'INDEX' not in step,
+                    f'{url} scans a table: {plan}\n{sql}',
+                )
+                self.assertNotIn('TEMP B-TREE', step, f'{url} sorts without an index: {plan}\n{sql}')
+        return response
+
+    def test_menu_items(self):
+        response = self.assertUsesIndexes('/api/menu-items/?page_size=3')
+        self.assertUsesIndexes(response.json()['next'].replace('http://testserver', ''))
+        self.assertUsesIndexes('/api/menu-items/?ordering=-price')
+        self.assertUsesIndexes('/api/menu-items/?ordering=-rating_average')
+        self.assertUsesIndexes(f'/api/menu-items/?category_id={self.category.pk}')
+        self.assertUsesIndexes(f'/api/categories/{self.category.pk}/menu-items/')
+
+    def test_orders(self):
+        self.assertUsesIndexes('/api/orders/', self.manager)
+        self.assertUsesIndexes('/api/orders/', self.crew)
+        response = self.assertUsesIndexes('/api/orders/?page_size=3', self.customer)
+        self.assertUsesIndexes(response.json()['next'].replace('http://testserver', ''), self.customer)
+
+    def test_reviews(self):
+        self.assertUsesIndexes('/api/reviews/')
+        self.assertUsesIndexes(f'/api/menu-items/{self.item.pk}/reviews/')
+
+    def test_featured_lookup(self):
+        plan = MenuItem.objects.filter(featured=True).explain()
+        self.assertIn('unique_featured_menuitem', plan)
+
+
+class SearchIndexTests(TestCase):
+    def test_index_follows_writes(self):
+        # الـ triggers لازم تفضل موجودة بعد أي migration بتعيد بنا جدول الـ menuitem
+        category = Category.objects.create(name='Soups')
+        item = MenuItem.objects.create(title='Lentil soup', price=2, inventory=5, category=category)
+        MenuItem.objects.bulk_create([MenuItem(title='Tomato soup', price=2, inventory=5, category=category)])
+
+        response = APIClient().get('/api/menu-items/?search=soup')
+        self.assertEqual({row['title'] for row in response.json()['results']}, {'Lentil soup', 'Tomato soup'})
+
+        MenuItem.objects.filter(pk=item.pk).update(title='Lentil stew')
+        cache.clear()
+        response = APIClient().get('/api/menu-items/?search=soup')
+        self.assertEqual([row['title'] for row in response.json()['results']], ['Tomato soup'])
+
+
+class SearchPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.soups, other = Category.objects.create(name='Soups'), Category.objects.create(name='Other')
+        MenuItem.objects.bulk_create([
+            MenuItem(title=f'Soup {i}', price=2, inventory=5, category=cls.soups) for i in range(1050)
+        ] + [
+            MenuItem(title='Soup soup soup', price=2, inventory=5, category=other),
+            MenuItem(title='Bread', price=1, inventory=5, category=other),
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def pages(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.json()['results']]
+            url = response.json()['next']
+        return ids
+
+    def test_pages_through_every_match_by_rank(self):
+        # مفيش حد أقصى للنتايج: الـ keyset على الـ (rank, id) جوه query الـ FTS نفسها
+        ids = self.pages('/api/menu-items/?search=soup&page_size=100')
+        self.assertEqual(len(ids), 1051)
+        self.assertEqual(len(set(ids)), 1051)
+        self.assertEqual(MenuItem.objects.get(pk=ids[0]).title, 'Soup soup soup')
+        self.assertEqual(ids[1:], sorted(ids[1:]))  # نفس الـ rank: الترتيب بالـ id
+
+    def test_category_filter_and_unmatched_queries(self):
+        self.assertEqual(len(self.pages(f'/api/categories/{self.soups.pk}/menu-items/?search=soup&page_size=100')), 1050)
+        self.assertEqual(self.pages('/api/menu-items/?search=bread'), list(MenuItem.objects.filter(title='Bread').values_list('pk', flat=True)))
+        self.assertEqual(self.pages('/api/menu-items/?search=%2A%2A'), [])
+
+    def test_previous_page_and_tampered_cursor(self):
+        first = self.client.get('/api/menu-items/?search=soup&page_size=5').json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual(self.client.get(second['previous']).json()['results'], first['results'])
+
+        cursor = base64.urlsafe_b64encode(b'{"r":0,"p":["abc",1]}').decode().rstrip('=')
+        self.assertEqual(self.client.get(f'/api/menu-items/?search=soup&cursor={cursor}').status_code, 404)
+
+
+class SearchMigrationTests(TransactionTestCase):
+    """الـ migrations نفسها لازم تسيب الـ triggers (الـ executor ما بيبعتش post_migrate)"""
+
+    def triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'EcommerceApi_menuitem'")
+            return {row[0] for row in cursor.fetchall()}
+
+    def test_table_rebuild_keeps_triggers(self):
+        expected = set(FTS_TRIGGERS)
+        executor = MigrationExecutor(connection)
+        leaf = executor.loader.graph.leaf_nodes('EcommerceApi')
+        try:
+            for target in ('0003_menuitem_fts', '0004_menuitem_rating_aggregates', '0003_menuitem_fts'):
+                executor.loader.build_graph()
+                executor.migrate([('EcommerceApi', target)])
+                self.assertEqual(self.triggers(), expected, target)
+        finally:
+            executor.loader.build_graph()
+            executor.migrate(leaf)
+
+
+class FastReadParityTests(TestCase):
+    """الـ values() fast path لازم يطلع نفس الـ JSON بالبايت اللي الـ serializer بيطلعه"""
+
+    URLS = [
+        '/api/menu-items/',
+        '/api/menu-items/?page_size=3',
+        '/api/menu-items/?ordering=-rating_average&page_size=2',
+        '/api/menu-items/?ordering=-price',
+        '/api/menu-items/?search=soup',
+        '/api/menu-items/?fields=id,title,category',
+        '/api/menu-items/?fields=title,category,rating_histogram&expand=category',
+        '/api/menu-items/?fields=price,nope',
+        '/api/categories/',
+        '/api/categories/?fields=name',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', password='x')
+        soups = Category.objects.create(name='Soups')
+        mains = Category.objects.create(name='Mains & "specials"')
+        prices = ['2.50', '10', '0.99', '7.25', '2.50', '1234.5']
+        for i, price in enumerate(prices):
+            category = soups if i % 2 else mains
+            title = f'Lentil soup {i}' if category is soups else f'Grilled ünïcode {i}'
+            item = MenuItem.objects.create(title=title, price=Decimal(price), inventory=i, category=category, featured=i == 3)
+            for rating in range(1, i % 5 + 2):
+                reviewer = User.objects.create_user(f'r{i}-{rating}', password='x')
+                MenuItemReview.objects.create(menuitem=item, user=reviewer, rating=rating)
+        MenuItem.objects.filter(pk=item.pk).update(rating_average=Decimal('3.67'))
+        cls.item = item
+        cls.soups = soups
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get_both(self, url):
+        cache.clear()
+        with mock.patch.object(MenuItemSerializer, 'to_representation', side_effect=AssertionError('slow path')), \
+                mock.patch.object(CategorySerializer, 'to_representation', side_effect=AssertionError('slow path')):
+            fast = self.client.get(url)
+        cache.clear()
+        with mock.patch.object(MenuItemViewSet, 'fast_read', False), mock.patch.object(CategoryViewSet, 'fast_read', False):
+            slow = self.client.get(url)
+        self.assertEqual(slow.status_code, fast.status_code, url)
+        return fast.content, slow.content
+
+    def test_parity(self):
+        urls = self.URLS + [
+            f'/api/menu-items/{self.item.pk}/',
+            f'/api/menu-items/{self.item.pk}/?fields=id,rating_histogram',
+            f'/api/categories/{self.soups.pk}/',
+            f'/api/categories/{self.soups.pk}/menu-items/',
+            '/api/menu-items/999999/',
+        ]
+        for url in urls:
+            fast, slow = self.get_both(url)
+            self.assertEqual(fast, slow, url)
+
+        # الصفحة التانية من الـ cursor
+        first = self.client.get('/api/menu-items/?page_size=2&ordering=-rating_average').json()
+        fast, slow = self.get_both(first['next'].replace('http://testserver', ''))
+        self.assertEqual(fast, slow)
+
+
+class SparseFieldsTests(TestCase):
+    """?fields= و ?expand= على الـ endpoints اللي ما بتعديش على الـ fast path"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', password='x')
+        category = Category.objects.create(name='Mains')
+        item = MenuItem.objects.create(title='Kofta', price=Decimal('4.00'), inventory=5, category=category)
+        cls.cart = Cart.objects.create(user=cls.customer)
+        cart_item = CartItem.objects.create(cart=cls.cart, menuitem=item, quantity=2)
+        cls.order = Order.objects.create(user=cls.customer, total=8)
+        order_item = OrderItem.objects.create(order=cls.order, menuitem=item, quantity=2, unit_price=item.price)
+        cls.cart_item_id, cls.order_item_id = cart_item.pk, order_item.pk
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return response.json(), ' '.join(q['sql'] for q in queries)
+
+    def test_orders(self):
+        url = f'/api/orders/{self.order.pk}/'
+        full, _ = self.get(url)
+        # الـ customer ما بيشوفش حقول الـ delivery crew أصلا
+        self.assertEqual(set(full), {'id', 'user', 'created_at', 'total', 'items', 'status', 'status_display'})
+
+        body, sql = self.get(url + '?fields=id,total,nope')
+        self.assertEqual(body, {'id': self.order.pk, 'total': '8.00'})
+        self.assertNotIn('EcommerceApi_orderitem', sql)
+        body, _ = self.get(url + '?fields=id,items')
+        self.assertEqual(body['items'], [self.order_item_id])
+        body, _ = self.get(url + '?fields=items&expand=items')
+        self.assertEqual(body['items'], full['items'])
+
+        body, _ = self.get('/api/orders/?fields=id')
+        self.assertEqual(body['results'], [{'id': self.order.pk}])
+
+    def test_carts(self):
+        url = f'/api/carts/{self.cart.pk}/'
+        full, _ = self.get(url)
+        body, sql = self.get(url + '?fields=user,items')
+        self.assertEqual(body, {'user': self.customer.pk, 'items': [self.cart_item_id]})
+        self.assertNotIn('auth_user', sql)
+        body, _ = self.get(url + '?fields=user,items&expand=user,items')
+        self.assertEqual(body, {'user': full['user'], 'items': full['items']})
+
+
+class ReviewAggregateTests(TestCase):
+    """الـ review_count والـ rating_sum والـ histogram على الـ MenuItem بيتحدثوا مع كل كتابة على الريفيوهات"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', password='x')
+        category = Category.objects.create(name='Mains')
+        cls.kofta = MenuItem.objects.create(title='Kofta', price=2, inventory=5, category=category)
+        cls.tea = MenuItem.objects.create(title='Tea', price=1, inventory=5, category=category)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def aggregates(self, item):
+        item.refresh_from_db()
+        return item.review_count, item.rating_sum, item.rating_4_count, item.rating_5_count
+
+    def test_create_update_and_delete(self):
+        response = self.client.post(f'/api/menu-items/{self.kofta.pk}/reviews/', {'rating': 5, 'menuitem_id': self.kofta.pk})
+        self.assertEqual(response.status_code, 201)
+        url = f'/api/reviews/{response.data["id"]}/'
+        self.assertEqual(self.aggregates(self.kofta), (1, 5, 0, 1))
+
+        self.assertEqual(self.client.patch(url, {'rating': 4}).status_code, 200)
+        self.assertEqual(self.aggregates(self.kofta), (1, 4, 1, 0))
+
+        # النقل لـ menu item تاني مرفوض بدل ما يسيب إحصائيات الاتنين غلط
+        response = self.client.patch(url, {'menuitem_id': self.tea.pk, 'rating': 5})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('menuitem_id', response.data)
+        self.assertEqual(MenuItemReview.objects.get().menuitem_id, self.kofta.pk)
+        self.assertEqual(self.aggregates(self.kofta), (1, 4, 1, 0))
+        self.assertEqual(self.aggregates(self.tea), (0, 0, 0, 0))
+        # نفس الـ menu item في PUT عادي
+        response = self.client.put(url, {'menuitem_id': self.kofta.pk, 'rating': 5, 'comment': 'Great'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.aggregates(self.kofta), (1, 5, 0, 1))
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.aggregates(self.kofta), (0, 0, 0, 0))
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_superuser('manager', password='x')
+        category = Category.objects.create(name='Mains')
+        for i in range(3):
+            MenuItem.objects.create(title=f'Item {i}', price=Decimal(i + 1), inventory=5, category=category)
+        cls.customers = [User.objects.create_user(f'customer{i}', password='x') for i in range(3)]
+        for user in reversed(cls.customers):
+            for _ in range(2):
+                Order.objects.create(user=user, total=5)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    @staticmethod
+    def cursor(payload):
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+    def test_invalid_and_tampered_cursors(self):
+        cases = [
+            ('/api/menu-items/', 'not base64!'),
+            ('/api/menu-items/', self.cursor({'r': 0, 'p': ['abc', 1]})),
+            ('/api/menu-items/', self.cursor({'r': 0, 'p': [None, 1]})),
+            ('/api/menu-items/', self.cursor({'r': 0, 'p': ['1.00']})),
+            ('/api/menu-items/', self.cursor({'r': 0, 'p': [{'a': 1}, 1]})),
+            ('/api/orders/', self.cursor({'r': 0, 'p': ['yesterday', 1]})),
+            ('/api/orders/', self.cursor({'r': 1, 'p': ['2026-01-01T00:00:00+00:00', 'x']})),
+            ('/api/orders/?ordering=user', self.cursor({'r': 0, 'p': ['customer0', 1]})),
+        ]
+        for url, cursor in cases:
+            with self.subTest(url=url, cursor=cursor):
+                separator = '&' if '?' in url else '?'
+                response = self.client.get(f'{url}{separator}cursor={cursor}')
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json()['detail'], 'Invalid cursor')
+
+    def test_ordering_by_foreign_key(self):
+        pages, url = [], '/api/orders/?ordering=user&page_size=4'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.json()['results']])
+            url = response.json()['next']
+        expected = list(Order.objects.order_by('user_id', 'id').values_list('id', flat=True))
+        self.assertEqual([pk for page in pages for pk in page], expected)
+        self.assertEqual(len(pages), 2)
+
+    def test_ordering_outside_whitelist_is_ignored(self):
+        default = self.client.get('/api/orders/').json()['results']
+        for ordering in ('items', 'delivery_crew', 'payment_session_id'):
+            response = self.client.get(f'/api/orders/?ordering={ordering}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['results'], default)
+
+
+class CachePageVersionedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        Category.objects.create(name='Soups')
+
+    def test_etag_and_not_modified(self):
+        first = self.client.get('/api/categories/')
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+        self.assertIn('no-cache', first['Cache-Control'])
+
+        hit = self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((hit.status_code, hit['ETag']), (304, etag))
+        self.assertEqual(self.client.get('/api/categories/', HTTP_IF_NONE_MATCH='"other"').content, first.content)
+
+        # miss (الكاش اتمسح) والنسخة اللي اتحسبت تاني زي اللي مع العميل: برضه 304
+        cache.clear()
+        miss = self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((miss.status_code, miss['ETag'], miss.content), (304, etag, b''))
+
+    def test_write_invalidates_after_commit(self):
+        etag = self.client.get('/api/categories/')['ETag']
+        generation = get_generations([CATEGORIES])
+        with self.captureOnCommitCallbacks() as callbacks:
+            Category.objects.create(name='Desserts')
+        # قبل الـ commit الـ generation زي ما هي، فالريكويستات اللي بتقرا الداتا القديمة بتخزن عليها
+        self.assertEqual(get_generations([CATEGORIES]), generation)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_generations([CATEGORIES]), generation)
+
+        response = self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('Desserts', [row['name'] for row in response.json()['results']])
+
+
+class RendererParityTests(TestCase):
+    """الـ orjson renderer لازم يطلع نفس بايتات JSONRenderer بتاعة DRF"""
+
+    DATA = {
+        'price': Decimal('12.50'),
+        'created': datetime.datetime(2024, 5, 1, 10, 30, 0, 123456, tzinfo=datetime.timezone.utc),
+        'naive': datetime.datetime(2024, 5, 1, 10, 30),
+        'cairo': timezone.localtime(datetime.datetime(2024, 5, 1, 10, 30, tzinfo=datetime.timezone.utc)),
+        'date': datetime.date(2024, 5, 1),
+        'time': datetime.time(9, 15, 30, 500),
+        'duration': datetime.timedelta(minutes=90),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'lazy': gettext_lazy('Not found.'),
+        'text': 'شوربة عدس \u2028 \u2029 "quoted" \\ \x00',
+        'histogram': {1: 0, 5: 3},
+        'nested': [None, True, 1.5, -7, 2 ** 70, ()],
+    }
+
+    def test_json_bytes_match_drf(self):
+        self.assertEqual(ORJSONRenderer().render(self.DATA), JSONRenderer().render(self.DATA))
+        self.assertEqual(ORJSONRenderer().render(None), JSONRenderer().render(None))
+
+    def test_api_responses(self):
+        cache.clear()
+        Category.objects.create(name='Soups')
+        client = APIClient()
+        response = client.get('/api/categories/')
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+        packed = client.get('/api/categories/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(packed['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(packed.content), response.json())
+        # الـ integers في MessagePack آخرها 64 bit، والـ keys بتفضل int مش بتتحول string زي JSON
+        data = {key: value for key, value in self.DATA.items() if key not in ('nested', 'histogram')}
+        self.assertEqual(msgpack.unpackb(MessagePackRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+
+        bad = client.post('/auth/jwt/create/', b'{"username": ', content_type='application/json')
+        self.assertEqual(bad.status_code, 400)
+
+
+class ClaimsAuthenticationTests(TestCase):
+    """اليوزر والـ roles من الـ JWT: مفيش query على auth_user ولا الجروبات في الريكويستات العادية"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user('crew', email='crew@example.com', password='secret-pass-1')
+        self.group = Group.objects.create(name='Delivery_crew')
+        self.group.user_set.add(self.user)
+
+    def login(self):
+        response = self.client.post('/auth/jwt/create/', {'username': 'crew', 'password': 'secret-pass-1'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def get_orders(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f'JWT {access}')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/orders/')
+        self.client.credentials()
+        return response, [q['sql'] for q in queries]
+
+    def test_no_user_queries(self):
+        tokens = self.login()
+        response, queries = self.get_orders(tokens['access'])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([sql for sql in queries if 'auth_user' in sql and 'FROM "auth_user"' in sql], queries)
+        self.assertFalse([sql for sql in queries if 'auth_group' in sql], queries)
+        # الـ delivery crew بيشوف الأوردرات المتعينة ليه بس
+        self.assertIn('"delivery_crew_id" = %d' % self.user.pk, ' '.join(queries))
+
+    def test_role_change_and_revocation(self):
+        tokens = self.login()
+        self.group.user_set.remove(self.user)
+        response, _ = self.get_orders(tokens['access'])
+        self.assertEqual(response.status_code, 401)
+
+        refreshed = self.client.post('/auth/jwt/refresh/', {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(refreshed.status_code, 200)
+        response, queries = self.get_orders(refreshed.json()['access'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('"user_id" = %d' % self.user.pk, ' '.join(queries))
+
+        self.user.set_password('secret-pass-2')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        response, _ = self.get_orders(refreshed.json()['access'])
+        self.assertEqual(response.status_code, 401)
+        refreshed = self.client.post('/auth/jwt/refresh/', {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(refreshed.status_code, 401)
+
+    def test_revocation_survives_cache_loss(self):
+        tokens = self.login()
+        self.group.user_set.remove(self.user)
+        # الـ versions في الداتابيز، والكاش قدامها بس (cull أو clear)
+        cache.clear()
+        response, queries = self.get_orders(tokens['access'])
+        self.assertEqual(response.status_code, 401)
+        self.assertTrue([sql for sql in queries if 'EcommerceApi_tokenversion' in sql], queries)
+
+        self.client.post('/auth/jwt/revoke/', HTTP_AUTHORIZATION=f'JWT {self.login()["access"]}')
+        cache.clear()
+        refreshed = self.client.post('/auth/jwt/refresh/', {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(refreshed.status_code, 401)
+
+    def test_deleting_user_revokes_tokens(self):
+        tokens, user_id = self.login(), self.user.pk
+        self.user.delete()
+        cache.clear()
+        response, _ = self.get_orders(tokens['access'])
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(TokenVersion.objects.get(user_id=user_id).tokens_version, 1)
+
+
+class RolePermissionTests(TestCase):
+    """IsManager / IsDeliveryCrew من الـ roles المتكاشة، والكاش بيتمسح لما الجروبات تتغير"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.managers = Group.objects.create(name='Manager')
+        cls.manager = User.objects.create_user('manager', password='x')
+        cls.managers.user_set.add(cls.manager)
+        cls.customer = User.objects.create_user('customer', password='x')
+        cls.category = Category.objects.create(name='Mains')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def as_user(self, user):
+        # object جديد في كل ريكويست زي الـ authentication الحقيقي (من غير _roles_cache)
+        self.client.force_authenticate(User.objects.get(pk=user.pk))
+        return self.client
+
+    def create_item(self, user):
+        return self.as_user(user).post('/api/menu-items/', {
+            'title': 'Soup', 'price': '3.00', 'inventory': 3, 'category_id': self.category.pk,
+        })
+
+    def test_manager_only_endpoints(self):
+        self.assertEqual(self.create_item(self.customer).status_code, 403)
+        self.assertEqual(self.as_user(self.customer).get('/api/groups/manager/users/').status_code, 403)
+        self.assertEqual(self.as_user(self.customer).get('/api/groups/delivery-crew/users/').status_code, 403)
+        self.assertEqual(self.create_item(self.manager).status_code, 201)
+        self.assertEqual(self.as_user(self.manager).get('/api/groups/manager/users/').status_code, 200)
+        superuser = User.objects.create_superuser('admin', password='x')
+        self.assertEqual(self.as_user(superuser).get('/api/groups/manager/users/').status_code, 200)
+
+    def test_roles_are_cached_and_invalidated(self):
+        def group_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.create_item(self.customer).status_code, 403)
+            return [q['sql'] for q in queries if 'auth_group' in q['sql']]
+
+        self.assertEqual(len(group_queries()), 1)
+        self.assertEqual(group_queries(), [])
+
+        self.managers.user_set.add(self.customer)
+        self.assertEqual(self.create_item(self.customer).status_code, 201)
+        self.managers.user_set.remove(self.customer)
+        self.assertEqual(self.create_item(self.customer).status_code, 403)
+
+
+@override_settings(CACHES={**settings.CACHES, 'tier-tests': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TwoTierCacheTests(SimpleTestCase):
+    def setUp(self):
+        _local_tiers.clear()
+        self.now = 100.0
+        clock = mock.patch.object(cache_backends, 'time', SimpleNamespace(monotonic=lambda: self.now))
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.cache = TwoTierCache('tier-tests', {'OPTIONS': {
+            'LOCAL_MAX_BYTES': 200, 'LOCAL_TIMEOUT': 10, 'SHARED_ONLY_PREFIXES': ['throttle_'],
+        }})
+        self.cache.clear()
+
+    @property
+    def shared(self):
+        return caches['tier-tests']
+
+    def test_lru_evicts_by_size(self):
+        for key in 'abc':
+            self.cache.set(key, 'x' * 50)
+        self.cache.get('a')  # a بقت أحدث من b
+        self.cache.set('d', 'x' * 50)
+        stats = self.cache.stats()
+        self.assertEqual((stats['evictions'], stats['local_entries']), (1, 3))
+        self.assertLessEqual(stats['local_bytes'], 200)
+
+        self.shared.clear()
+        self.assertEqual([self.cache.get(key) is not None for key in 'abcd'], [True, False, True, True])
+        # أكبر من الـ LRU كله: في الكاش المشترك بس
+        self.cache.set('big', 'x' * 500)
+        self.assertEqual(self.cache.stats()['local_entries'], 3)
+
+    def test_local_copy_expires_after_local_timeout(self):
+        self.cache.set('menu', 1, timeout=3600)
+        self.shared.set('menu', 2, timeout=3600)  # worker تاني غيّرها
+        self.assertEqual(self.cache.get('menu'), 1)
+        self.now += 11
+        self.assertEqual(self.cache.get('menu'), 2)
+        # timeout أقل من الـ LOCAL_TIMEOUT بيتحترم محليًا كمان
+        self.cache.set('short', 1, timeout=2)
+        self.shared.delete('short')
+        self.now += 3
+        self.assertIsNone(self.cache.get('short'))
+
+    def test_shared_only_prefixes_skip_local_tier(self):
+        self.cache.set('throttle_user_7', 5)
+        self.shared.set('throttle_user_7', 6)
+        self.assertEqual(self.cache.get('throttle_user_7'), 6)
+        self.assertEqual(self.cache.incr('throttle_user_7'), 7)
+        self.assertEqual(self.cache.stats()['local_entries'], 0)
+
+    def test_writes_and_stats(self):
+        self.assertIsNone(self.cache.get('k'))
+        self.shared.set('k', 1)
+        self.assertEqual([self.cache.get('k'), self.cache.get('k')], [1, 1])
+        self.cache.delete('k')
+        self.assertFalse(self.cache.has_key('k'))
+        self.cache.set('n', 1)
+        self.assertEqual(self.cache.incr('n'), 2)
+        self.assertEqual(self.cache.get('n'), 2)  # الـ incr شال النسخة المحلية القديمة
+        stats = self.cache.stats()
+        self.assertEqual(
+            {name: stats[name] for name in ('local_hits', 'shared_hits', 'misses')},
+            {'local_hits': 1, 'shared_hits': 2, 'misses': 1},
+        )
+
+    def test_tests_do_not_use_the_developer_cache(self):
+        self.assertNotEqual(str(settings.CACHES['shared']['LOCATION']), str(settings.BASE_DIR / '.django_cache'))
+        self.assertEqual(settings.CACHES['shared']['OPTIONS']['MAX_ENTRIES'], 50000)
+
+
+class TokenBucketThrottleTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = 1000.0
+        self.request = SimpleNamespace(user=SimpleNamespace(is_authenticated=True, pk=7), META={'REMOTE_ADDR': '127.0.0.1'})
+        self.view = SimpleNamespace(throttle_scope='payment')  # 3/minute: token كل 20 ثانية
+
+    def allow(self):
+        throttle = ScopedBucketThrottle()
+        throttle.timer = lambda: self.now
+        return throttle.allow_request(self.request, self.view), throttle
+
+    def test_burst_then_refill(self):
+        self.assertEqual([self.allow()[0] for _ in range(4)], [True, True, True, False])
+        self.now += 20
+        allowed, throttle = self.allow()
+        self.assertFalse(allowed)
+        self.assertEqual(throttle.wait(), 40)
+
+        # الـ bucket بيتملي كله بعد دقيقة من أول ريكويست، والمرفوض ما بيمدش الـ window
+        self.now += 40
+        self.assertEqual([self.allow()[0] for _ in range(4)], [True, True, True, False])
+
+        # الوقت الطويل ما بيتحسبش رصيد أكتر من الـ rate
+        self.now += 3600
+        self.assertEqual([self.allow()[0] for _ in range(4)], [True, True, True, False])
+
+    def test_disabled_by_setting(self):
+        with override_settings(THROTTLE_ENABLED=False):
+            self.assertEqual([self.allow()[0] for _ in range(5)], [True] * 5)
+        # ولا حاجة اتصرفت من الـ bucket وهي مقفولة
+        self.assertEqual([self.allow()[0] for _ in range(4)], [True, True, True, False])
+
+    def test_first_window_is_capped_at_the_rate(self):
+        # الكاش نفسه ماشي على نفس الساعة، فالـ key بيخلص فعلا مع الـ window
+        clock = SimpleNamespace(time=lambda: self.now)
+        for backend in (cache, LocMemCache('throttle-tests', {})):
+            with self.subTest(backend=type(backend).__name__), \
+                    mock.patch.object(ScopedBucketThrottle, 'cache', backend), \
+                    mock.patch('django.core.cache.backends.base.time', clock), \
+                    mock.patch('django.core.cache.backends.filebased.time', clock), \
+                    mock.patch('django.core.cache.backends.locmem.time', clock):
+                backend.clear()
+                allowed = []
+                for offset in (0, 0.5, 20, 40, 59, 60, 61, 90, 119.5, 120):
+                    self.now = 1000.0 + offset
+                    allowed.append(self.allow()[0])
+                # 3/minute: 3 بالكتير في أول دقيقة (مش 3 burst وكمان واحد كل 20 ثانية)
+                self.assertEqual(allowed, [True, True, True, False, False, True, True, True, False, True])
+
+    def test_one_cache_write_per_allowed_request(self):
+        with mock.patch.object(ScopedBucketThrottle, 'cache', LocMemCache('throttle-tests', {})) as backend, \
+                mock.patch.object(backend, 'set', wraps=backend.set) as cache_set:
+            results = [self.allow()[0] for _ in range(5)]
+        self.assertEqual(results, [True, True, True, False, False])
+        self.assertEqual(cache_set.call_count, 3)
+
+
+@override_settings(METRICS_TOKEN='scrape-secret')
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.client = APIClient()
+        Category.objects.create(name='Soups')
+
+    def scrape(self, **headers):
+        return self.client.get('/api/metrics/', **headers)
+
+    def test_route_metrics(self):
+        self.client.get('/api/categories/')
+        self.client.get('/api/categories/')
+        self.client.get('/api/menu-items/')
+        self.client.get('/api/menu-items/')
+
+        self.assertEqual(self.scrape().status_code, 401)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        response = self.scrape(HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+
+        self.assertIn('http_requests_total{view="category-list",action="list",method="GET",status="200"} 2', body)
+        self.assertIn('http_request_duration_seconds_count{view="category-list",action="list"} 2', body)
+        self.assertIn('http_request_duration_seconds_bucket{view="category-list",action="list",le="+Inf"} 2', body)
+        self.assertIn('http_cache_page_total{view="menuitem-list",action="list",result="hit"} 1', body)
+        self.assertIn('http_cache_page_total{view="menuitem-list",action="list",result="miss"} 1', body)
+        self.assertIn('http_request_db_queries_count{view="category-list",action="list"} 2', body)
+        self.assertIn('http_requests_total{view="metrics",action="get",method="GET",status="401"} 2', body)
+
+    def test_throttle_rejections(self):
+        user = User.objects.create_user('customer', password='x')
+        self.client.force_authenticate(user)
+        with mock.patch.dict(ScopedBucketThrottle.THROTTLE_RATES, {'cart': '1/minute'}):
+            statuses = [self.client.post('/api/carts/').status_code for _ in range(2)]
+        self.assertEqual(statuses[1], 429)
+        body = self.scrape(HTTP_AUTHORIZATION='Bearer scrape-secret').content.decode()
+        self.assertIn('http_throttled_total{view="cart-list",action="create",scope="cart"} 1', body)
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    كل action ليه query_budgets على الـ viewset: أي تغيير يزود الـ queries (أو يرجّع N+1) بيفشل هنا.
+    كل حاجة فيها 5 صفوف عشان أي query لكل صف تبان كتكرار.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='x')
+        Group.objects.create(name='Manager').user_set.add(cls.manager)
+        cls.crew = User.objects.create_user('crew', password='x')
+        Group.objects.create(name='Delivery_crew').user_set.add(cls.crew)
+        cls.customer = User.objects.create_user('customer', password='x')
+
+        cls.category = Category.objects.create(name='Mains')
+        cls.cart = Cart.objects.create(user=cls.customer)
+        items = [
+            MenuItem.objects.create(title=f'Item {i}', price=Decimal('2.50'), inventory=50, category=cls.category)
+            for i in range(5)
+        ]
+        for i, item in enumerate(items):
+            reviewer = User.objects.create_user(f'reviewer{i}', password='x')
+            MenuItemReview.objects.create(menuitem=items[0], user=reviewer, rating=4)
+            CartItem.objects.create(cart=cls.cart, menuitem=item, quantity=1)
+            order = Order.objects.create(user=cls.customer, delivery_crew=cls.crew, total=10)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, menuitem=line, quantity=1, unit_price=line.price, price=line.price)
+                for line in items
+            ])
+        cls.item, cls.order = items[0], order
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def as_user(self, user):
+        return self.authenticate(self.client, user)
+
+    def test_catalog(self):
+        get = self.client.get
+        self.assertWithinQueryBudget(get, '/api/menu-items/')
+        self.assertWithinQueryBudget(get, '/api/menu-items/?search=item')
+        self.assertWithinQueryBudget(get, f'/api/menu-items/{self.item.pk}/')
+        self.assertWithinQueryBudget(get, '/api/categories/')
+        self.assertWithinQueryBudget(get, f'/api/categories/{self.category.pk}/')
+        self.assertWithinQueryBudget(get, f'/api/categories/{self.category.pk}/menu-items/')
+        self.assertWithinQueryBudget(get, f'/api/categories/{self.category.pk}/menu-items/?fields=id,category&expand=category')
+        self.assertWithinQueryBudget(get, f'/api/categories/{self.category.pk}/menu-items/{self.item.pk}/')
+        self.assertWithinQueryBudget(get, '/api/reviews/')
+        self.assertWithinQueryBudget(get, f'/api/menu-items/{self.item.pk}/reviews/')
+
+        post = self.as_user(self.manager).post
+        response = self.assertWithinQueryBudget(post, '/api/menu-items/', {
+            'title': 'Soup', 'price': '3.00', 'inventory': 3, 'category_id': self.category.pk,
+        })
+        self.assertEqual(response.status_code, 201)
+        response = self.assertWithinQueryBudget(self.as_user(self.manager).post, f'/api/menu-items/{self.item.pk}/reviews/', {
+            'rating': 5, 'menuitem_id': self.item.pk,
+        })
+        self.assertEqual(response.status_code, 201)
+
+    def test_create_featured_item(self):
+        # عنصر مميز جديد بيلغي القديم بدل ما يكسر unique_featured_menuitem
+        post = self.as_user(self.manager).post
+        for title in ('Soup', 'Salad'):
+            response = self.assertWithinQueryBudget(post, '/api/menu-items/', {
+                'title': title, 'price': '3.00', 'inventory': 3, 'category_id': self.category.pk, 'featured': True,
+            })
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(list(MenuItem.objects.filter(featured=True).values_list('title', flat=True)), ['Salad'])
+        response = self.client.patch(f'/api/menu-items/{self.item.pk}/', {'featured': True})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(MenuItem.objects.filter(featured=True).values_list('pk', flat=True)), [self.item.pk])
+
+    def test_carts(self):
+        self.assertWithinQueryBudget(self.as_user(self.manager).get, '/api/carts/')
+        self.assertWithinQueryBudget(self.as_user(self.customer).get, f'/api/carts/{self.cart.pk}/')
+        self.assertWithinQueryBudget(self.as_user(self.manager).get, '/api/cart-items/')
+        self.assertWithinQueryBudget(self.as_user(self.customer).get, '/api/cart-items/')
+
+        get = self.as_user(self.manager).get
+
+        def stream(path):
+            # الـ export بيقرا الداتابيز وهو بيتبعت، فبنعدّ لحد آخر chunk
+            response = get(path)
+            response.streamed = b''.join(response.streaming_content)
+            return response
+        response = self.assertWithinQueryBudget(stream, '/api/cart-items/?stream=1')
+        self.assertIn(b'"customer"', response.streamed)
+        self.assertWithinQueryBudget(self.as_user(self.manager).get, f'/api/cart-items/{self.customer.pk}/')
+        post = self.as_user(self.customer).post
+        # item موجود في الكارت: الـ response محتاج menuitem و cart.user من غير queries زيادة
+        response = self.assertWithinQueryBudget(post, '/api/cart-items/', {'menuitem_id': self.item.pk, 'quantity': 2})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['cart_name'], 'customer')
+        items = [{'menuitem_id': item.pk, 'quantity': 1} for item in MenuItem.objects.all()]
+        response = self.assertWithinQueryBudget(self.as_user(self.customer).post, '/api/cart-items/bulk/',
+                                                {'op': 'set', 'items': items}, format='json')
+        self.assertEqual(len(response.data), 5)
+        response = self.assertWithinQueryBudget(self.as_user(self.crew).post, '/api/carts/')
+        self.assertEqual(response.status_code, 201)
+
+    def test_orders(self):
+        for user in (self.manager, self.crew, self.customer):
+            self.assertWithinQueryBudget(self.as_user(user).get, '/api/orders/')
+            self.assertWithinQueryBudget(self.as_user(user).get, f'/api/orders/{self.order.pk}/')
+        url = f'/api/orders/{self.order.pk}/'
+        response = self.assertWithinQueryBudget(self.as_user(self.manager).patch, url, {'delivery_crew': self.crew.pk})
+        self.assertEqual(len(response.data['items']), 5)
+        response = self.assertWithinQueryBudget(self.as_user(self.crew).patch, url, {'status': 1})
+        self.assertEqual(response.data['status'], 1)
+        self.assertWithinQueryBudget(self.as_user(self.customer).get, url + 'success_payment/')
+        response = self.assertWithinQueryBudget(self.as_user(self.customer).post, '/api/orders/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['items']), 5)
+
+    def test_over_budget_fails(self):
+        # الـ budget بالظبط على المقاس: query واحدة زيادة (هنا الـ prefetch بتاع الـ items) بتفشل في الـ test وفي الـ middleware
+        url = f'/api/orders/{self.order.pk}/'
+        self.assertWithinQueryBudget(self.as_user(self.customer).get, url)
+        with mock.patch.dict(OrderViewSet.query_budgets, {'retrieve': OrderViewSet.query_budgets['retrieve'] - 1}):
+            with self.assertRaisesMessage(AssertionError, 'OrderViewSet.retrieve budget is 2'):
+                self.assertWithinQueryBudget(self.as_user(self.customer).get, url)
+            # client جديد عشان الـ middleware بيتبني مع أول ريكويست
+            with override_settings(QUERY_DETECTOR_ENABLED=True, QUERY_DETECTOR_RAISE=True), \
+                    self.assertRaisesMessage(NPlusOneDetected, '3 queries, budget for OrderViewSet.retrieve is 2'):
+                self.authenticate(APIClient(), self.customer).get(url)
+
+    def test_detector_points_at_lazy_relation(self):
+        with record_query_shapes() as recorder:
+            [str(line) for line in OrderItem.objects.filter(order=self.order)]
+        (shape, count, stack), = recorder.repeated(2)
+        self.assertIn('EcommerceApi_menuitem', shape)
+        self.assertEqual(count, 5)
+        self.assertIn('return self.menuitem.title', ''.join(stack))
+
+    @override_settings(QUERY_DETECTOR_ENABLED=True)
+    def test_middleware_logs_repeated_queries(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        with self.assertNoLogs('EcommerceApi.querycheck', 'WARNING'):
+            self.assertEqual(self.client.get('/admin/EcommerceApi/orderitem/').status_code, 200)
+            self.assertEqual(self.client.get('/admin/EcommerceApi/order/').status_code, 200)
+        # الـ budget بتاع الـ partial_update فيه مكان لتحديث الـ sales rollups
+        with mock.patch.object(OrderSerializer, 'update', lambda self, instance, data: instance), \
+                mock.patch.dict(OrderViewSet.query_budgets, {'partial_update': 5}), \
+                self.assertLogs('EcommerceApi.querycheck', 'WARNING') as logs:
+            self.as_user(self.manager).patch(f'/api/orders/{self.order.pk}/', {})
+        self.assertIn('repeated 5x', logs.output[0])
+        self.assertIn('OrderViewSet.partial_update', logs.output[0])
+
+
+class CartTotalsTests(TestCase):
+    """الـ total والـ subtotals محسوبين في الداتابيز لازم يطلعوا زي الحساب في بايثون"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', password='x')
+        cls.cart = Cart.objects.create(user=cls.customer)
+        category = Category.objects.create(name='Mains')
+        for title, price, quantity in (('Kofta', '2.50', 3), ('Tea', '0.75', 1)):
+            item = MenuItem.objects.create(title=title, price=Decimal(price), inventory=5, category=category)
+            CartItem.objects.create(cart=cls.cart, menuitem=item, quantity=quantity)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def test_totals(self):
+        cart = self.client.get(f'/api/carts/{self.cart.pk}/').json()
+        self.assertEqual(cart['total'], 8.25)
+        self.assertEqual([(row['menuitem_title'], row['subtotal']) for row in cart['items']], [('Kofta', 7.5), ('Tea', 0.75)])
+        # من غير الـ annotation الـ serializer بيحسبها من الـ items
+        self.assertEqual(CartSerializer(Cart.objects.get(pk=self.cart.pk)).data['total'], Decimal('8.25'))
+
+        self.assertEqual(self.client.get(f'/api/carts/{self.cart.pk}/?fields=id,total').json(), {'id': self.cart.pk, 'total': 8.25})
+        CartItem.objects.all().delete()
+        self.assertEqual(self.client.get(f'/api/carts/{self.cart.pk}/').json()['total'], 0)
+
+
+class CartBulkTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', password='x')
+        category = Category.objects.create(name='Mains')
+        cls.items = [
+            MenuItem.objects.create(title=f'Item {i}', price=Decimal('2.50'), inventory=50, category=category)
+            for i in range(4)
+        ]
+        cls.cart = Cart.objects.create(user=cls.customer)
+        CartItem.objects.create(cart=cls.cart, menuitem=cls.items[0], quantity=2)
+        CartItem.objects.create(cart=cls.cart, menuitem=cls.items[1], quantity=1)
+        other = Cart.objects.create(user=User.objects.create_user('other', password='x'))
+        CartItem.objects.create(cart=other, menuitem=cls.items[0], quantity=7)
+
+    def setUp(self):
+        cache.clear()
+        self.client = self.authenticate(APIClient(), self.customer)
+
+    def bulk(self, op, *lines):
+        items = [{'menuitem_id': self.items[index].pk, 'quantity': quantity} for index, quantity in lines]
+        return self.assertWithinQueryBudget(self.client.post, '/api/cart-items/bulk/', {'op': op, 'items': items}, format='json')
+
+    def cart_contents(self):
+        return dict(self.cart.items.values_list('menuitem__title', 'quantity'))
+
+    def test_operations(self):
+        response = self.bulk('add', (0, 1), (2, 3))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['menuitem_title'], row['quantity'], row['subtotal']) for row in response.data],
+            [('Item 0', 3, Decimal('7.50')), ('Item 1', 1, Decimal('2.50')), ('Item 2', 3, Decimal('7.50'))],
+        )
+
+        self.bulk('set', (0, 5), (1, 0))
+        self.assertEqual(self.cart_contents(), {'Item 0': 5, 'Item 2': 3})
+
+        self.bulk('replace', (3, 1), (2, 2))
+        self.assertEqual(self.cart_contents(), {'Item 2': 2, 'Item 3': 1})
+
+        self.bulk('remove', (3, 0), (1, 0))
+        self.assertEqual(self.cart_contents(), {'Item 2': 2})
+
+        self.assertEqual(self.bulk('replace').data, [])
+        self.assertEqual(self.cart_contents(), {})
+        # كارت اليوزر التاني ما اتلمسش
+        self.assertEqual(CartItem.objects.get(cart__user__username='other').quantity, 7)
+
+    def test_invalid_requests_change_nothing(self):
+        before = self.cart_contents()
+        too_many = [{'menuitem_id': i, 'quantity': 1} for i in range(1, 102)]
+        cases = [
+            self.bulk('add', (0, 1), (0, 2)),
+            self.bulk('add', (2, 0)),
+            self.bulk('set'),
+            self.bulk('clear', (0, 1)),
+            self.client.post('/api/cart-items/bulk/', {'op': 'set', 'items': [{'menuitem_id': 999999}]}, format='json'),
+            self.client.post('/api/cart-items/bulk/', {'op': 'set', 'items': too_many}, format='json'),
+        ]
+        self.assertEqual([response.status_code for response in cases], [400] * len(cases))
+        self.assertIn('999999', str(cases[4].data))
+        self.assertEqual(self.cart_contents(), before)
+
+    def test_creates_missing_cart(self):
+        self.authenticate(self.client, User.objects.create_user('new', password='x'))
+        response = self.bulk('add', (1, 2))
+        self.assertEqual([row['quantity'] for row in response.data], [2])
+        self.assertTrue(Cart.objects.filter(user__username='new').exists())
+
+
+class CartExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='x')
+        Group.objects.create(name='Manager').user_set.add(cls.manager)
+        category = Category.objects.create(name='Mains')
+        items = [
+            MenuItem.objects.create(title=title, price=Decimal(price), inventory=9, category=category)
+            for title, price in (('Kofta', '4.50'), ('Ful "medames"', '0.10'), ('Koshari', '12.35'))
+        ]
+        # اليوزرز مش بنفس ترتيب الـ ids عشان الـ stream بيرتب بالـ username
+        for username, quantities in (('zeinab', (3, 0, 1)), ('أحمد', (0, 7, 0)), ('bassem', (1, 1, 2))):
+            cart = Cart.objects.create(user=User.objects.create_user(username, password='x'))
+            for item, quantity in zip(items, quantities):
+                if quantity:
+                    CartItem.objects.create(cart=cart, menuitem=item, quantity=quantity)
+        Cart.objects.create(user=User.objects.create_user('empty', password='x'))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def test_stream_matches_the_regular_export(self):
+        regular = self.client.get('/api/cart-items/', HTTP_ACCEPT='application/json')
+        streamed = self.client.get('/api/cart-items/?stream=1')
+        self.assertTrue(streamed.streaming)
+        body = b''.join(streamed.streaming_content).decode()
+        # نفس القيم بالظبط (الـ Decimal subtotal بيطلع float في الاتنين)، والـ stream مرتب باليوزر
+        self.assertEqual(json.loads(body), regular.json())
+        self.assertEqual(list(json.loads(body)), ['bassem', 'zeinab', 'أحمد'])
+        self.assertEqual(json.loads(body)['zeinab'][0]['subtotal'], 13.5)
+
+        # chunks صغيرة: الحدود بين الـ chunks ما تبوظش الـ JSON
+        queryset = CartItem.objects.with_subtotals()
+        for chunk_size in (1, 2, 5):
+            with self.subTest(chunk_size=chunk_size):
+                chunks = list(CartItemGroupedSerializer.stream(queryset, chunk_size=chunk_size))
+                self.assertEqual(''.join(chunks), body)
+        self.assertEqual(''.join(CartItemGroupedSerializer.stream(queryset.none())), '{}')
+
+    def test_stream_is_for_managers_only(self):
+        self.client.force_authenticate(User.objects.get(username='bassem'))
+        response = self.client.get('/api/cart-items/?stream=1')
+        self.assertFalse(response.streaming)
+        self.assertEqual(list(response.json()), ['bassem'])
+
+
+class CatalogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='x')
+        Group.objects.create(name='Manager').user_set.add(cls.manager)
+        cls.mains = Category.objects.create(name='Mains')
+        cls.kofta = MenuItem.objects.create(title='Kofta', price=Decimal('4.50'), inventory=5, category=cls.mains)
+        cls.salad = MenuItem.objects.create(title='Salad, "green"', price=Decimal('2.00'), inventory=0, category=cls.mains)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def export(self, resource, fmt):
+        response = self.client.get(f'/api/catalog/{resource}/{fmt}/')
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="{resource}.{fmt}"')
+        return b''.join(response.streaming_content).decode()
+
+    def upload(self, resource, fmt, body):
+        return self.client.post(f'/api/catalog/{resource}/{fmt}/', body, content_type=catalog.CONTENT_TYPES[fmt])
+
+    def test_export_formats(self):
+        self.assertEqual(self.export('menu-items', 'csv').splitlines(), [
+            'id,title,price,inventory,category',
+            f'{self.kofta.pk},Kofta,4.50,5,Mains',
+            f'{self.salad.pk},"Salad, ""green""",2.00,0,Mains',
+        ])
+        rows = [json.loads(line) for line in self.export('menu-items', 'ndjson').splitlines()]
+        self.assertEqual(rows[0], {'id': self.kofta.pk, 'title': 'Kofta', 'price': '4.50', 'inventory': 5, 'category': 'Mains'})
+        self.assertEqual(self.export('categories', 'ndjson'), json.dumps({'id': self.mains.pk, 'name': 'Mains'}) + '\n')
+
+    def test_round_trip_upserts_by_id(self):
+        exported = self.export('menu-items', 'csv')
+        edited = exported.replace('Kofta,4.50,5,Mains', 'Kofta,5.00,9,Grills') + ',Soup,3.25,4,Mains\r\n'
+        response = self.upload('menu-items', 'csv', edited)
+        self.assertEqual(response.data, {'resource': 'menu-items', 'processed': 3, 'error_count': 0, 'errors': []})
+
+        self.kofta.refresh_from_db()
+        self.assertEqual((self.kofta.price, self.kofta.inventory, self.kofta.category.name), (Decimal('5.00'), 9, 'Grills'))
+        self.assertEqual(MenuItem.objects.count(), 3)
+        # export تاني بعد الـ import بيطلع نفس الداتا
+        self.assertEqual(self.export('menu-items', 'csv'), edited.replace(',Soup', f'{self.kofta.pk + 2},Soup'))
+
+    def test_error_rows_are_reported_and_skipped(self):
+        body = '\n'.join([
+            json.dumps({'title': 'Tea', 'price': '1.5', 'inventory': 3, 'category': 'Drinks'}),
+            '{not json',
+            json.dumps(['a list']),
+            json.dumps({'title': 'Cake', 'price': '1.234', 'inventory': 1, 'category': 'Sweets'}),
+            '',
+            json.dumps({'title': ' ', 'price': '1', 'inventory': 1, 'category': 'Sweets'}),
+            json.dumps({'id': 'x', 'title': 'Pie', 'price': '1', 'inventory': 1, 'category': 'Sweets'}),
+            json.dumps({'title': 'Pie', 'price': 'NaN', 'inventory': 1, 'category': 'Sweets'}),
+            json.dumps({'title': 'Pie', 'price': '1', 'inventory': 'lots', 'category': 'Sweets'}),
+        ])
+        response = self.upload('menu-items', 'ndjson', body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['processed'], response.data['error_count']), (1, 7))
+        self.assertEqual(response.data['errors'], [
+            {'line': 2, 'error': 'invalid row'},
+            {'line': 3, 'error': 'invalid row'},
+            {'line': 4, 'error': 'price must be between 0 and 999999.99 with at most 2 decimals'},
+            {'line': 6, 'error': 'title is required'},
+            {'line': 7, 'error': 'id must be an integer'},
+            {'line': 8, 'error': 'price must be between 0 and 999999.99 with at most 2 decimals'},
+            {'line': 9, 'error': 'inventory must be an integer'},
+        ])
+        self.assertEqual(MenuItem.objects.get(title='Tea').category.name, 'Drinks')
+        self.assertFalse(Category.objects.filter(name='Sweets').exists())
+
+    def test_batches_and_duplicate_ids(self):
+        importer = catalog.CatalogImporter('categories', batch_size=2)
+        lines = [f'{self.mains.pk},First', f'{self.mains.pk},Second', ',Drinks', ',Sweets', ',Soups']
+        summary = importer.run(['id,name', *lines], catalog.CSV)
+        self.assertEqual((summary['processed'], summary['error_count']), (5, 0))
+        self.assertEqual(list(Category.objects.order_by('id').values_list('name', flat=True)), ['Second', 'Drinks', 'Sweets', 'Soups'])
+
+    def test_malformed_file_still_invalidates_cached_lists(self):
+        before = self.client.get('/api/categories/').content
+        generation = get_generations([CATEGORIES])
+        # ملف utf-8 بايظ بعد أكتر من batch: الـ batches اللي قبل الغلط اتحفظت والكاش لازم يتهمل
+        body = 'id,name\n'.encode() + ''.join(f',Imported {i:05}\n' for i in range(2500)).encode() + b',Caf\xe9\n'
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.upload('categories', 'csv', body)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Malformed file', response.data['detail'])
+        self.assertEqual(response.data['processed'], 2000)
+        self.assertEqual(Category.objects.filter(name__startswith='Imported').count(), 2000)
+        self.assertNotEqual(get_generations([CATEGORIES]), generation)
+        self.assertNotEqual(self.client.get('/api/categories/').content, before)
+
+        # ولو مفيش ولا batch اتكتب الكاش بيفضل زي ما هو
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.assertEqual(self.upload('categories', 'csv', b'id,name\n,Caf\xe9\n').status_code, 400)
+        self.assertEqual(callbacks, [])
+
+    def test_upload_and_rejections(self):
+        upload = io.BytesIO('id,name\n,Drinks\n'.encode())
+        upload.name = 'categories.csv'
+        response = self.client.post('/api/catalog/categories/csv/', {'file': upload}, format='multipart')
+        self.assertEqual(response.data['processed'], 1)
+        self.assertEqual(self.client.post('/api/catalog/categories/csv/', {}, format='multipart').status_code, 400)
+
+        response = self.upload('categories', 'csv', 'id,name\n,Caf\xe9\n'.encode('latin-1'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Malformed file', response.data['detail'])
+        self.assertEqual(self.client.get('/api/catalog/orders/csv/').status_code, 404)
+        self.assertEqual(self.client.get('/api/catalog/categories/xml/').status_code, 404)
+        self.client.force_authenticate(User.objects.create_user('customer', password='x'))
+        self.assertEqual(self.client.get('/api/catalog/categories/csv/').status_code, 403)
+
+    def test_management_commands(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'menu.ndjson')
+            out = io.StringIO()
+            call_command('export_catalog', format='ndjson', output=path, stdout=out)
+            self.assertIn('Exported 2 menu-items', out.getvalue())
+            MenuItem.objects.update(inventory=0)
+            call_command('import_catalog', path, batch_size=1, stdout=out)
+        self.assertIn('Imported 2 menu-items (0 rows skipped)', out.getvalue())
+        self.assertEqual(MenuItem.objects.get(pk=self.kofta.pk).inventory, 5)
+
+
+# loadbench بيكلم الـ API على localhost زي ما بيتشغل على جهاز المطور
+@override_settings(ALLOWED_HOSTS=['localhost'])
+class BenchmarkCommandTests(TestCase):
+    COUNTS = {'categories': 3, 'menu_items': 30, 'customers': 6, 'managers': 1, 'crew': 2, 'carts': 4,
+              'orders': 20, 'reviews': 15}
+
+    def setUp(self):
+        cache.clear()
+
+    def test_generatedata_and_loadbench(self):
+        out = io.StringIO()
+        call_command('generatedata', batch_size=7, seed=3, stdout=out, **self.COUNTS)
+        self.assertEqual(MenuItem.objects.count(), 30)
+        self.assertEqual(Order.objects.count(), 20)
+        self.assertEqual(User.objects.filter(groups__name='Manager').count(), 1)
+        # الـ rollups بتتبني في الآخر من الأوردرات المتولدة
+        self.assertEqual(DailySalesRollup.objects.aggregate(total=Sum('order_count'))['total'], 20)
+        # التواريخ متوزعة على السنة اللي فاتت مش وقت الـ bulk_create
+        self.assertLess(Order.objects.earliest('created_at').created_at, timezone.now() - datetime.timedelta(days=1))
+        self.assertLess(MenuItemReview.objects.earliest('created_at').created_at, timezone.now() - datetime.timedelta(days=1))
+        with self.assertRaisesMessage(CommandError, 'pass --reset'):
+            call_command('generatedata', stdout=out, **self.COUNTS)
+        bench_user = User.objects.filter(username__startswith='bench_').first()
+        # الـ reset ما بيشغلش الـ signals بتاعة كل صف (rollups و revoke لكل أوردر/يوزر)
+        with mock.patch('EcommerceApi.signals.record_order_deleted') as order_deleted, \
+                mock.patch('EcommerceApi.signals.revoke_tokens') as user_deleted:
+            call_command('generatedata', reset=True, batch_size=7, seed=3, stdout=out, **self.COUNTS)
+        order_deleted.assert_not_called()
+        user_deleted.assert_not_called()
+        self.assertEqual(TokenVersion.objects.get(user_id=bench_user.pk).tokens_version, 1)
+        self.assertEqual(Order.objects.count(), 20)
+        self.assertEqual(DailySalesRollup.objects.aggregate(total=Sum('order_count'))['total'], 20)
+
+        orders = Order.objects.count()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.json')
+            call_command('loadbench', requests=20, warmup=5, users=3, output=path, stdout=out)
+            call_command('loadbench', requests=20, warmup=5, users=3, output=path, compare=path, stdout=out)
+            with open(path, encoding='utf-8') as results_file:
+                results = json.load(results_file)
+        # كل flow فيه ريكويست أو أكتر
+        self.assertGreaterEqual(sum(row['requests'] for row in results['endpoints'].values()), 20)
+        self.assertEqual([name for name, row in results['endpoints'].items() if row['errors']], [])
+        self.assertEqual(results['dataset']['menu_items'], 30)
+        self.assertIn('Compared with', out.getvalue())
+        # الكتابات اللي عملها الـ bench بترجع (rollback) من غير --keep-writes
+        self.assertEqual(Order.objects.count(), orders)
+
+        with self.assertRaisesMessage(CommandError, 'Unknown flows'):
+            call_command('loadbench', flows='browse,nope', stdout=out)
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    # TestCase بيفتح transaction حوالين كل test، والـ router بيقرا من الـ primary جوه أي transaction
+
+    def setUp(self):
+        cache.clear()
+        self.router = PrimaryReplicaRouter()
+        with mock.patch.dict(settings.DATABASES, {'replica': {}}):
+            self.middleware = ReplicaRoutingMiddleware(self.view)
+
+    def view(self, request):
+        # زي الـ handler: process_view قبل الـ view، والـ view بيقرا ويكتب
+        match = request.resolver_match
+        self.middleware.process_view(request, match.func, match.args, match.kwargs)
+        self.read_from = self.router.db_for_read(MenuItem)
+        with transaction.atomic():
+            self.read_in_transaction = self.router.db_for_read(MenuItem)
+        return HttpResponse(status=201 if request.method == 'POST' else 200)
+
+    def send(self, method, path, **headers):
+        request = getattr(RequestFactory(), method.lower())(path, **headers)
+        request.resolver_match = resolve(path)
+        self.response = self.middleware(request)
+        return self.read_from
+
+    def test_read_actions_use_replica(self):
+        self.assertEqual(self.send('GET', '/api/menu-items/'), 'replica')
+        self.assertEqual(self.send('GET', '/api/orders/1/'), 'replica')
+        self.assertEqual(self.read_in_transaction, 'default')
+        # GET بس بيكتب، و views مش viewsets
+        self.assertEqual(self.send('GET', '/api/orders/1/success_payment/'), 'default')
+        self.assertEqual(self.send('GET', '/api/cache-stats/'), 'default')
+        self.assertEqual(self.router.db_for_read(MenuItem), 'default')
+        self.assertEqual(self.router.db_for_write(MenuItem), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'EcommerceApi'))
+
+    def test_writer_is_pinned_to_primary(self):
+        self.send('POST', '/api/orders/', HTTP_AUTHORIZATION='JWT writer')
+        self.assertEqual(self.send('GET', '/api/orders/', HTTP_AUTHORIZATION='JWT writer'), 'default')
+        self.assertEqual(self.send('GET', '/api/orders/', HTTP_AUTHORIZATION='JWT reader'), 'replica')
+
+    def test_cached_lists_are_built_from_primary(self):
+        # الـ entry بيتخزن تحت الـ generation الجديدة لساعات، فلو اتبنى من الـ replica المتأخرة
+        # اليوزرز التانيين كانوا هيفضلوا يشوفوا الداتا القديمة لحد الكتابة الجاية
+        cached = cache_page_versioned(60, MENU_ITEMS)(lambda request: HttpResponse(self.router.db_for_read(MenuItem)))
+
+        def view(request):
+            self.view(request)
+            return cached(request)
+        with mock.patch.dict(settings.DATABASES, {'replica': {}}):
+            self.middleware = ReplicaRoutingMiddleware(view)
+
+        self.send('POST', '/api/menu-items/', HTTP_AUTHORIZATION='JWT manager')
+        bump_generation(MENU_ITEMS)
+        self.assertEqual(self.send('GET', '/api/menu-items/', HTTP_AUTHORIZATION='JWT reader'), 'replica')
+        self.assertEqual(self.response.content, b'default')
+        self.send('GET', '/api/menu-items/', HTTP_AUTHORIZATION='JWT other-reader')
+        self.assertEqual((self.response.content, self.response.has_header('ETag')), (b'default', True))
+        # الريكويستات اللي مش متكاشة لسه بتقرا من الـ replica
+        self.assertEqual(self.send('GET', '/api/orders/', HTTP_AUTHORIZATION='JWT reader'), 'replica')
+
+
+class SyncReplicaTests(SimpleTestCase):
+    def test_sync_updates_open_replica(self):
+        with tempfile.TemporaryDirectory() as directory:
+            primary_path, replica_path = (os.path.join(directory, name) for name in ('primary.db', 'replica.db'))
+            primary = sqlite3.connect(primary_path)
+            primary.execute('PRAGMA journal_mode = WAL')
+            primary.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+            primary.execute('INSERT INTO item VALUES (1)')
+            primary.commit()
+            sync(primary_path, replica_path)
+
+            # connection مفتوحة على الـ replica (زي CONN_MAX_AGE) بتشوف الـ sync اللي بعده
+            replica = sqlite3.connect(replica_path)
+            self.assertEqual(replica.execute('SELECT COUNT(*) FROM item').fetchone(), (1,))
+            primary.execute('INSERT INTO item VALUES (2)')
+            primary.commit()
+            sync(primary_path, replica_path)
+            self.assertEqual(replica.execute('SELECT COUNT(*) FROM item').fetchone(), (2,))
+            self.assertEqual(replica.execute('PRAGMA journal_mode').fetchone(), ('wal',))
+            replica.close()
+            primary.close()
+
+
+class CheckoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', password='x')
+        cls.cart = Cart.objects.create(user=cls.customer)
+        category = Category.objects.create(name='Mains')
+        cls.kofta = MenuItem.objects.create(title='Kofta', price=Decimal('4.00'), inventory=5, category=category)
+        cls.rice = MenuItem.objects.create(title='Rice', price=Decimal('1.50'), inventory=1, category=category)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def inventory(self):
+        return dict(MenuItem.objects.values_list('title', 'inventory'))
+
+    def test_checkout_reserves_inventory_and_empties_cart(self):
+        CartItem.objects.create(cart=self.cart, menuitem=self.kofta, quantity=2)
+        CartItem.objects.create(cart=self.cart, menuitem=self.rice, quantity=1)
+        response = self.client.post('/api/orders/')
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(pk=response.data['id'])
+        self.assertEqual(order.total, Decimal('9.50'))
+        self.assertEqual(
+            sorted(order.items.values_list('menuitem__title', 'quantity', 'unit_price', 'price')),
+            [('Kofta', 2, Decimal('4.00'), Decimal('8.00')), ('Rice', 1, Decimal('1.50'), Decimal('1.50'))],
+        )
+        self.assertEqual(self.inventory(), {'Kofta': 3, 'Rice': 0})
+        self.assertFalse(CartItem.objects.filter(cart=self.cart).exists())
+
+    def test_out_of_stock_changes_nothing(self):
+        CartItem.objects.create(cart=self.cart, menuitem=self.kofta, quantity=2)
+        CartItem.objects.create(cart=self.cart, menuitem=self.rice, quantity=2)
+        response = self.client.post('/api/orders/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['out_of_stock'], ['Rice'])
+        self.assertEqual(self.inventory(), {'Kofta': 5, 'Rice': 1})
+        self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), 2)
+        self.assertFalse(Order.objects.exists())
+
+    def test_empty_cart(self):
+        response = self.client.post('/api/orders/')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+
+class SalesRollupTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='x')
+        Group.objects.create(name='Manager').user_set.add(cls.manager)
+        cls.crew = User.objects.create_user('crew', password='x')
+        Group.objects.create(name='Delivery_crew').user_set.add(cls.crew)
+        cls.customer = User.objects.create_user('customer', password='x')
+        cls.mains, cls.drinks = Category.objects.create(name='Mains'), Category.objects.create(name='Drinks')
+        cls.kofta = MenuItem.objects.create(title='Kofta', price=Decimal('4.00'), inventory=50, category=cls.mains)
+        cls.rice = MenuItem.objects.create(title='Rice', price=Decimal('1.50'), inventory=50, category=cls.mains)
+        cls.tea = MenuItem.objects.create(title='Tea', price=Decimal('0.75'), inventory=50, category=cls.drinks)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def as_user(self, user):
+        return self.authenticate(self.client, user)
+
+    def checkout(self, *lines):
+        cart, _ = Cart.objects.get_or_create(user=self.customer)
+        for item, quantity in lines:
+            CartItem.objects.create(cart=cart, menuitem=item, quantity=quantity)
+        response = self.as_user(self.customer).post('/api/orders/')
+        self.assertEqual(response.status_code, 201)
+        return Order.objects.get(pk=response.data['id'])
+
+    def rollups(self):
+        fields = ('quantity', 'revenue', 'order_count', 'delivered_quantity', 'delivered_revenue', 'delivered_order_count')
+        return {
+            'days': list(DailySalesRollup.objects.order_by('day').values_list('day', *fields)),
+            'categories': list(CategorySalesRollup.objects.order_by('category_id').values_list('category_id', *fields)),
+            'menu_items': list(MenuItemSalesRollup.objects.order_by('menuitem_id').values_list('menuitem_id', *fields)),
+        }
+
+    def test_checkout_and_status_changes_update_rollups(self):
+        first = self.checkout((self.kofta, 2), (self.rice, 1), (self.tea, 3))
+        self.checkout((self.kofta, 1))
+        today = timezone.localdate()
+        self.assertEqual(self.rollups()['days'], [(today, 7, Decimal('15.75'), 2, 0, Decimal('0'), 0)])
+        # أوردر فيه صنفين من الـ Mains بيتحسب مرة واحدة في الـ category
+        self.assertEqual(self.rollups()['categories'], [
+            (self.mains.pk, 4, Decimal('13.50'), 2, 0, Decimal('0'), 0),
+            (self.drinks.pk, 3, Decimal('2.25'), 1, 0, Decimal('0'), 0),
+        ])
+
+        first.delivery_crew = self.crew
+        first.save()
+        response = self.as_user(self.crew).patch(f'/api/orders/{first.pk}/', {'status': 1})
+        self.assertEqual(response.status_code, 200)
+        rollups = self.rollups()
+        self.assertEqual(rollups['days'], [(today, 7, Decimal('15.75'), 2, 6, Decimal('11.75'), 1)])
+        self.assertEqual(rollups['menu_items'][0], (self.kofta.pk, 3, Decimal('12.00'), 2, 2, Decimal('8.00'), 1))
+
+        # الـ rebuild (backfill) بيطلع نفس الأرقام
+        rebuild()
+        self.assertEqual(self.rollups(), rollups)
+
+        # رجوع الأوردر out for delivery بيشيل الـ delivered تاني
+        first.refresh_from_db()
+        first.status = 0
+        first.save(update_fields=['status'])
+        self.assertEqual(self.rollups()['days'], [(today, 7, Decimal('15.75'), 2, 0, Decimal('0'), 0)])
+
+    def test_status_changes_reuse_loaded_items(self):
+        order = self.checkout((self.kofta, 2), (self.tea, 1))
+        order.delivery_crew = self.crew
+        order.save()
+        today = timezone.localdate()
+        # الـ budget فيه الـ 3 upserts بس: الـ status القديم والـ items من اللي اتحمّل للـ response
+        response = self.assertWithinQueryBudget(self.as_user(self.crew).patch, f'/api/orders/{order.pk}/', {'status': 1})
+        self.assertEqual(response.data['status'], 1)
+        self.assertEqual(self.rollups()['days'], [(today, 3, Decimal('8.75'), 1, 3, Decimal('8.75'), 1)])
+
+        Order.objects.filter(pk=order.pk).update(status=0)
+        self.as_user(self.customer).get('/api/orders/')  # الـ roles في الكاش زي باقي الـ budgets
+        self.assertWithinQueryBudget(self.as_user(self.customer).get, f'/api/orders/{order.pk}/success_payment/?fields=id')
+        self.assertEqual(self.rollups()['days'], [(today, 3, Decimal('8.75'), 1, 6, Decimal('17.50'), 2)])
+        rebuild()
+        self.assertEqual(self.rollups()['days'], [(today, 3, Decimal('8.75'), 1, 3, Decimal('8.75'), 1)])
+
+    def test_deleting_orders_reverses_rollups(self):
+        def counted():
+            # الـ upsert بيسيب صفوف بأصفار، الـ rebuild ما بيعملهاش
+            return {table: [row for row in rows if any(row[1:])] for table, rows in self.rollups().items()}
+
+        self.checkout((self.kofta, 1))
+        delivered = self.checkout((self.kofta, 2), (self.tea, 1))
+        delivered.status = 1
+        delivered.save()
+        self.checkout((self.tea, 4))
+
+        response = self.as_user(self.manager).delete(f'/api/orders/{delivered.pk}/')
+        self.assertEqual(response.status_code, 204)
+        incremental = counted()
+        rebuild()
+        self.assertEqual(counted(), incremental)
+        self.assertEqual(incremental['days'], [(timezone.localdate(), 5, Decimal('7.00'), 2, 0, Decimal('0'), 0)])
+
+        # حذف اليوزر بيمسح أوردراته بالـ cascade، وبرضه بيتشالوا من الأرقام
+        self.customer.delete()
+        self.assertEqual(counted(), {'days': [], 'categories': [], 'menu_items': []})
+
+    def test_rebuild_range(self):
+        order = self.checkout((self.tea, 2))
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - datetime.timedelta(days=10))
+        self.checkout((self.kofta, 1))
+        old_day = timezone.localdate() - datetime.timedelta(days=10)
+        self.assertEqual(rebuild(old_day, old_day), {'days': 1, 'categories': 1, 'menu_items': 1})
+        # اليوم القديم اتحسب من جديد واليوم الحالي زي ما هو (الـ upsert سجّل الأوردر في النهارده)
+        self.assertEqual(
+            list(DailySalesRollup.objects.order_by('day').values_list('day', 'quantity')),
+            [(old_day, 2), (timezone.localdate(), 3)],
+        )
+
+    def test_report(self):
+        self.checkout((self.kofta, 2), (self.tea, 4))
+        url = '/api/analytics/sales/'
+        self.assertEqual(self.as_user(self.customer).get(url).status_code, 403)
+
+        get = self.as_user(self.manager).get
+        response = self.assertWithinQueryBudget(get, url)
+        self.assertEqual(response.data['totals']['revenue'], '11.00')
+        self.assertEqual(response.data['results'][0]['day'], timezone.localdate())
+        response = self.assertWithinQueryBudget(get, url + '?group_by=menuitem&limit=1')
+        self.assertEqual(
+            [(row['menuitem'], row['quantity'], row['revenue']) for row in response.data['results']],
+            [('Kofta', 2, '8.00')],
+        )
+        response = get(url + '?group_by=category')
+        self.assertEqual([row['category'] for row in response.data['results']], ['Mains', 'Drinks'])
+
+        self.assertEqual(get(url + '?start=2026-02-01&end=2026-01-01').status_code, 400)
+        self.assertEqual(get(url + '?start=2020-01-01&end=2026-01-01').status_code, 400)
+        self.assertEqual(get(url + '?group_by=user').status_code, 400)
+
+
+class IdempotencyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', password='x')
+        category = Category.objects.create(name='Mains')
+        item = MenuItem.objects.create(title='Kofta', price=Decimal('4.00'), inventory=5, category=category)
+        CartItem.objects.create(cart=Cart.objects.create(user=cls.customer), menuitem=item, quantity=2)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def view(self, statuses):
+        calls = []
+
+        class View:
+            nested = False
+
+            @idempotent()
+            def post(view, request):
+                calls.append(request.data)
+                if view.nested:
+                    view.nested = False
+                    # الكاش المشترك ممكن يخسر أي entry (cull، clear، أو add مش atomic بين processes)
+                    cache.clear()
+                    calls.append(view.post(request).status_code)
+                return Response({'call': len(calls)}, status=statuses.pop(0))
+
+        request = SimpleNamespace(
+            META={'HTTP_IDEMPOTENCY_KEY': 'k1'}, user=self.customer, method='POST', path='/api/x/', data={'a': 1},
+        )
+        return View(), request, calls
+
+    def test_checkout_is_replayed(self):
+        first = self.client.post('/api/orders/', HTTP_IDEMPOTENCY_KEY='checkout-1')
+        self.assertEqual(first.status_code, 201)
+        again = self.client.post('/api/orders/', HTTP_IDEMPOTENCY_KEY='checkout-1')
+        self.assertEqual((again.status_code, again.data['id'], again[REPLAY_HEADER]), (201, first.data['id'], 'true'))
+        self.assertEqual(Order.objects.count(), 1)
+
+        other = self.client.post('/api/orders/', {'note': 'x'}, format='json', HTTP_IDEMPOTENCY_KEY='checkout-1')
+        self.assertEqual(other.status_code, 422)
+        # الـ key لنفس اليوزر بس
+        self.client.force_authenticate(User.objects.create_user('other', password='x'))
+        self.assertFalse(self.client.post('/api/orders/', HTTP_IDEMPOTENCY_KEY='checkout-1').has_header(REPLAY_HEADER))
+
+    def test_request_in_flight_conflicts(self):
+        view, request, calls = self.view([201])
+        view.nested = True
+        self.assertEqual(view.post(request).status_code, 201)
+        self.assertEqual(calls, [{'a': 1}, 409])
+        # الـ lock اتشال والـ 201 اتخزن
+        self.assertEqual(view.post(request).data, {'call': 2})
+
+    def test_lock_is_a_database_row(self):
+        view, request, calls = self.view([201, 201])
+        digest = hashlib.sha256(f'{self.customer.pk}|POST|/api/x/|k1'.encode()).hexdigest()
+        # process تاني شايل الـ lock
+        IdempotencyLock.objects.create(key=digest)
+        self.assertEqual(view.post(request).status_code, 409)
+        # ووقع من غير ما يشيله: بعد LOCK_TIMEOUT الـ lock بيتاخد
+        IdempotencyLock.objects.filter(key=digest).update(
+            created_at=timezone.now() - datetime.timedelta(seconds=LOCK_TIMEOUT + 1),
+        )
+        self.assertEqual(view.post(request).status_code, 201)
+        self.assertEqual(len(calls), 1)
+        self.assertFalse(IdempotencyLock.objects.exists())
+
+    def test_transient_errors_are_not_replayed(self):
+        view, request, calls = self.view([429, 409, 400, 201])
+        self.assertEqual([view.post(request).status_code for _ in range(4)], [429, 409, 400, 400])
+        self.assertEqual(len(calls), 3)
+
+
+@override_settings(PAYMENT_PROVIDER='stub', PAYMENT_STUB_LATENCY=0, PAYMENT_STUB_FAIL=False,
+                   PAYMENT_BREAKER_THRESHOLD=2, PAYMENT_BREAKER_RESET=30)
+class PaymentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', email='c@example.com', password='x')
+        category = Category.objects.create(name='Mains')
+        item = MenuItem.objects.create(title='Kofta', price=Decimal('4.00'), inventory=5, category=category)
+        cls.order = Order.objects.create(user=cls.customer, total=8)
+        OrderItem.objects.create(order=cls.order, menuitem=item, quantity=2, unit_price=item.price, price=8)
+
+    def setUp(self):
+        cache.clear()
+        payments._runtime()
+        # breaker جديد لكل test (الـ pool والـ breaker واحد لكل process)
+        patcher = mock.patch.object(payments, '_breaker', payments.CircuitBreaker(2, 30))
+        self.breaker = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stub_session_is_saved_and_reused(self):
+        session = payments.initiate_payment(self.order)
+        self.assertTrue(session.id.startswith('cs_stub_'))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.payment_session_url, session.url)
+        with mock.patch.object(payments.StubProvider, 'create_session', side_effect=AssertionError('called')):
+            self.assertEqual(payments.initiate_payment(self.order).id, session.id)
+
+    @override_settings(PAYMENT_STUB_LATENCY=0.5, PAYMENT_TIMEOUT=0.05)
+    def test_provider_timeout(self):
+        started = time.monotonic()
+        with self.assertRaisesMessage(payments.PaymentUnavailable, 'timed out'):
+            payments.initiate_payment(self.order)
+        self.assertLess(time.monotonic() - started, 0.4)
+        self.assertEqual(self.breaker._failures, 1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.payment_session_url, '')
+
+    @override_settings(PAYMENT_STUB_FAIL=True)
+    def test_failures_open_the_breaker(self):
+        for _ in range(2):
+            with self.assertLogs('EcommerceApi.payments', 'ERROR') as logs, \
+                    self.assertRaises(payments.PaymentUnavailable):
+                payments.initiate_payment(self.order)
+            self.assertIn('stub provider failure', '\n'.join(logs.output))
+        self.assertTrue(self.breaker.is_open)
+        # الدايرة مفتوحة: 503 من غير ما نكلم الـ provider
+        with mock.patch.object(payments.StubProvider, 'create_session', side_effect=AssertionError('called')), \
+                self.assertRaises(payments.PaymentUnavailable):
+            payments.initiate_payment(self.order)
+
+    def test_pay_endpoint_returns_503_when_open(self):
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        for _ in range(2):
+            self.breaker.record_failure()
+        response = client.post(f'/api/orders/{self.order.pk}/pay/')
+        self.assertEqual(response.status_code, 503)
+        self.breaker.record_success()
+        response = client.post(f'/api/orders/{self.order.pk}/pay/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('/stub-checkout/cs_stub_', response.data['session_url'])
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 100.0
+        patcher = mock.patch('EcommerceApi.payments.time.monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = payments.CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+    def test_open_half_open_closed(self):
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow())
+
+        # half-open: طلب تجربة واحد بس، والتجربة الفاشلة بتفتحها تاني على طول
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow())
+
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertFalse(self.breaker.is_open)
+        self.assertTrue(self.breaker.allow())
+        # العداد بدأ من الأول: فشل واحد مش كفاية يفتحها
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+
+
+@override_settings(BATCH_MAX_WORKERS=1)
+class BatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', password='x')
+        cls.other = User.objects.create_user('other', password='x')
+        cls.category = Category.objects.create(name='Mains')
+        cls.items = [
+            MenuItem.objects.create(title=f'Item {i}', price=Decimal('2.00'), inventory=5, category=cls.category)
+            for i in range(2)
+        ]
+        Cart.objects.create(user=cls.customer)
+        cls.order = Order.objects.create(user=cls.customer, total=4)
+        Order.objects.create(user=cls.other, total=9)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def batch(self, *requests):
+        return self.client.post('/api/batch/', {'requests': list(requests)}, format='json')
+
+    def test_results_in_request_order(self):
+        first, second = self.items
+        response = self.batch(
+            {'path': f'/api/menu-items/{second.pk}/'},
+            {'path': '/api/menu-items/999999/'},
+            {'path': f'/api/menu-items/{first.pk}/?fields=id,title'},
+            {'path': f'/api/categories/{self.category.pk}/'},
+            {'path': '/api/categories/'},
+        )
+        self.assertEqual(response.status_code, 200)
+        responses = response.json()['responses']
+        self.assertEqual([entry['status'] for entry in responses], [200, 404, 200, 200, 200])
+        self.assertEqual(responses[0]['body']['title'], 'Item 1')
+        self.assertEqual(responses[2]['body'], {'id': first.pk, 'title': 'Item 0'})
+        self.assertEqual(responses[3]['body']['name'], 'Mains')
+        self.assertIn('ETag', responses[4]['headers'])
+
+    def test_user_is_propagated_and_writes_run_in_order(self):
+        # الـ batch من غير login: الـ sub-requests anonymous (الـ Authorization مش بيتنقل)
+        response = self.batch({'path': '/api/orders/'})
+        self.assertEqual(response.json()['responses'][0]['status'], 403)
+
+        self.client.force_authenticate(self.customer)
+        response = self.batch(
+            {'path': '/api/orders/'},
+            {'method': 'POST', 'path': '/api/cart-items/', 'body': {'menuitem_id': self.items[0].pk, 'quantity': 2}},
+            {'path': '/api/cart-items/'},
+        )
+        orders, created, cart = response.json()['responses']
+        self.assertEqual([row['id'] for row in orders['body']['results']], [self.order.pk])
+        self.assertEqual(created['status'], 201)
+        self.assertEqual([row['quantity'] for row in cart['body']['customer']], [2])
+
+    def test_rejected_batches(self):
+        too_many = [{'path': f'/api/menu-items/{self.items[0].pk}/'}] * 21
+        cases = [
+            [{'path': '/api/batch/', 'method': 'POST'}],
+            [{'path': '/admin/'}],
+            [{'path': '/api/nope/'}],
+            [{'path': '/api/orders/', 'headers': {'Authorization': 'JWT stolen'}}],
+            too_many,
+            [],
+        ]
+        for requests in cases:
+            with self.subTest(requests=requests[:1]):
+                self.assertEqual(self.batch(*requests).status_code, 400)
+        self.assertIn('cannot be nested', str(self.batch({'path': '/api/batch/'}).json()))
+
+    def test_sub_request_error_is_logged(self):
+        with mock.patch.object(CategoryViewSet, 'retrieve', side_effect=RuntimeError('boom')), \
+                self.assertLogs('EcommerceApi.batch', 'ERROR') as logs:
+            response = self.batch(
+                {'path': f'/api/categories/{self.category.pk}/'},
+                {'path': f'/api/menu-items/{self.items[0].pk}/'},
+            )
+        self.assertEqual([entry['status'] for entry in response.json()['responses']], [500, 200])
+        self.assertIn('boom', logs.output[0])
@@ -0,0 +1,63 @@
+import math
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from rest_framework.throttling import SimpleRateThrottle, AnonRateThrottle, UserRateThrottle, ScopedRateThrottle
+
+from .metrics import mark
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    بديل SimpleRateThrottle: بدل list فيها timestamp لكل ريكويست في الـ window، كل key ليه
+    (بداية الـ window، عدد الـ tokens اللي اتصرفت) بس.
+
+    الـ bucket فيه num_requests token وبيتملي كله مرة واحدة بعد duration من أول ريكويست، فـ "60/minute"
+    معناها 60 ريكويست بالكتير (burst أو متفرقين) في الدقيقة اللي بتبدأ بأول ريكويست، مش burst كامل
+    وكمان refill جوه نفس الدقيقة. نفس الـ rates ونفس الـ scopes.
+
+    get واحد لكل ريكويست و set واحد للي بيعدي بس (المرفوض ما بيتكتبش ولا بيمد الـ window).
+    الـ get + set مش atomic زي DRF بالظبط: ريكويستين في نفس اللحظة ممكن يتحسبوا token واحد.
+    """
+    cache = default_cache
+    # throttle_ عشان الـ keys تفضل shared-only في TwoTierCache، و bucket_ عشان ما تتلخبطش مع lists الـ DRF القديمة
+    cache_format = 'throttle_bucket_%(scope)s_%(ident)s'
+
+    def allow_request(self, request, view):
+        if self.rate is None or not getattr(settings, 'THROTTLE_ENABLED', True):
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        start, used = self.cache.get(self.key, (self.now, 0))
+        if self.now - start >= self.duration:
+            # الـ bucket اتملى تاني (الكاش نفسه ممكن ما يكونش مسح الـ key لسه)
+            start, used = self.now, 0
+        self.refill_at = start + self.duration
+        if used >= self.num_requests:
+            mark(request, 'throttle', self.scope)
+            return self.throttle_failure()
+        # الـ key بيخلص مع الـ window، فمفيش touch ولا cleanup
+        self.cache.set(self.key, (start, used + 1), math.ceil(self.refill_at - self.now))
+        return self.throttle_success()
+
+    def throttle_success(self):
+        return True
+
+    def wait(self):
+        return max(0, self.refill_at - self.now)
+
+
+class AnonBucketThrottle(AnonRateThrottle, TokenBucketThrottle):
+    pass
+
+
+class UserBucketThrottle(UserRateThrottle, TokenBucketThrottle):
+    pass
+
+
+class ScopedBucketThrottle(ScopedRateThrottle, TokenBucketThrottle):
+    pass
@@ -2,6 +2,7 @@ from django.urls import path, include
 # from rest_framework import routers
 from rest_framework_nested import routers
 from . import views
+from .batch import BatchView
 
 router = routers.DefaultRouter()
 router.register('menu-items', views.MenuItemViewSet)
@@ -24,5 +25,10 @@ urlpatterns = [
     path('', include(router.urls)),
     path('', include(router_menuitems.urls)),
     path('', include(router_category.urls)),
+    path('cache-stats/', views.CacheStatsView.as_view(), name='cache-stats'),
+    path('metrics/', views.MetricsView.as_view(), name='metrics'),
+    path('analytics/sales/', views.SalesAnalyticsView.as_view(), name='sales-analytics'),
+    path('batch/', BatchView.as_view(), name='batch'),
+    path('catalog/<str:resource>/<str:fmt>/', views.CatalogView.as_view(), name='catalog'),
    
 ]
@@ -1,44 +1,156 @@
+import csv
 
-from rest_framework import viewsets, permissions, generics, status, mixins
+from rest_framework import viewsets, permissions, status, mixins
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.http import HttpResponse, StreamingHttpResponse
 from django.contrib.auth.models import User, Group
-from .models import MenuItem, Category, Cart, CartItem, Order, OrderItem
-from rest_framework.pagination import PageNumberPagination
+from django.db import transaction
+from django.db.models import Prefetch
+from .models import MenuItem, Category, Cart, CartItem, Order, OrderItem, RATING_CHOICES
+from .pagination import KeysetPagination, PriceKeysetPagination
+from .search import MenuItemSearchFilter
+from .fastpath import RowBuilder, FastPathUnsupported
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.filters import OrderingFilter
 from .serializers import *
-from .serializers import UserCreateSerializer
-from django.conf import settings
 from rest_framework.decorators import action
-import stripe
-from rest_framework.exceptions import ValidationError
+from rest_framework.views import APIView
+from rest_framework.exceptions import ValidationError, NotFound
 from django.core.cache import cache
-from django.views.decorators.cache import cache_page
+from .caching import cache_page_versioned, MENU_ITEMS, CATEGORIES, REVIEWS
 from django.utils.decorators import method_decorator
+from .roles import is_manager, is_delivery_crew
+from .payments import initiate_payment, PaymentFailed
+from .idempotency import idempotent
+from .authentication import revoke_tokens
+from .metrics import registry, metrics_token_matches
+from . import catalog
+from .analytics import sales_report
 
 
 
 
 
 
+class SparseFieldsMixin:
+    """
+    بيضيّق الـ queryset على قد ?fields= و ?expand= (شوف DynamicFieldsMixin في serializers.py):
+    الـ joins والـ prefetches بتتعمل للحقول المطلوبة بس، والأعمدة بـ only().
+
+    field_columns: حقل الـ serializer → أعمدة الموديل اللي محتاجها لو مختلفة عن اسمه
+    (وللشكل الـ expanded بنستخدم 'field+').
+    """
+    field_columns = {}
+
+    def sparse_fields(self):
+        return parse_field_list(self.request, FIELDS_PARAM)
+
+    def wants(self, field):
+        fields = self.sparse_fields()
+        return fields is None or field in fields
+
+    def expands(self, field):
+        fields = self.sparse_fields()
+        return fields is None or (field in fields and field in (parse_field_list(self.request, EXPAND_PARAM) or ()))
+
+    def only_requested(self, queryset):
+        fields = self.sparse_fields()
+        if fields is None:
+            return queryset
+        columns = {'id'}
+        # أعمدة الترتيب لازم تتقري عشان الـ keyset cursor ما يعملش query لكل صف
+        if isinstance(self.paginator, KeysetPagination):
+            columns.update(field.lstrip('-') for field in self.paginator.get_ordering(self.request, queryset, self))
+        for field in fields:
+            key = field + '+' if self.expands(field) and field + '+' in self.field_columns else field
+            columns.update(self.field_columns.get(key, [field]))
+
+        model_fields = {f.name for f in queryset.model._meta.concrete_fields}
+        return queryset.only(*[column for column in columns if column.split('__')[0] in model_fields])
+
+
+class FastReadMixin:
+    """
+    list/retrieve من صفوف values() بدل ما كل صف يعدي على الـ ModelSerializer:
+    RowBuilder بيتبني مرة لكل ريكويست من نفس الـ serializer (بعد ?fields= و ?expand=)
+    فالـ JSON بيطلع هو هو بالبايت. لو الـ serializer فيه حقل مش مدعوم بنرجع للطريق العادي.
+
+    الـ permissions هنا على مستوى الـ view بس (list/retrieve عامة، من غير object permissions).
+    """
+    fast_read = True
+
+    def _row_builder(self):
+        if not self.fast_read:
+            return None
+        try:
+            return RowBuilder(self.get_serializer())
+        except FastPathUnsupported:
+            return None
+
+    def _values(self, queryset, build, extra=()):
+        return queryset.values(*build.columns, *[column for column in extra if column not in build.columns])
+
+    def list(self, request, *args, **kwargs):
+        build = self._row_builder()
+        if build is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering = []
+        if isinstance(self.paginator, KeysetPagination):
+            # الـ cursor بيتبني من قيم الترتيب فلازم تبقى في الصف
+            ordering = [field.lstrip('-') for field in self.paginator.get_ordering(request, queryset, self)]
+        rows = self._values(queryset, build, ordering)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response([build(row) for row in page])
+        return Response([build(row) for row in rows])
+
+    def retrieve(self, request, *args, **kwargs):
+        build = self._row_builder()
+        if build is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(self._values(queryset, build), **{self.lookup_field: kwargs[lookup_url_kwarg]})
+        return Response(build(row))
+
+
 # صلاحيات مخصصة
 class IsManager(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user and (request.user.is_superuser or request.user.groups.filter(name='Manager').exists())
+        return request.user and is_manager(request.user)
 
 class IsDeliveryCrew(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user and (request.user.is_superuser or request.user.groups.filter(name='Delivery_crew').exists())
+        return request.user and (request.user.is_superuser or is_delivery_crew(request.user))
+
+class CanReadMetrics(permissions.BasePermission):
+    """المانجر، أو Prometheus بالـ METRICS_TOKEN"""
+    def has_permission(self, request, view):
+        return metrics_token_matches(request) or is_manager(request.user)
 
 # ViewSet للمنتجات والفئات (عامة)
-@method_decorator(cache_page(60*5), name='list')  # cache 5 دقائق
-class MenuItemViewSet(viewsets.ModelViewSet):
+@method_decorator(cache_page_versioned(60*60*6, MENU_ITEMS), name='list')  # الكاش بيتهمل مع أي تعديل
+class MenuItemViewSet(FastReadMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     serializer_class = MenuItemSerializer
     queryset = MenuItem.objects.select_related('category').all()
     filterset_fields = ['category_id']
-    ordering_fields = ['price']
+    ordering_fields = ['price', 'rating_average', 'review_count']
     search_fields = ['title']
-    pagination_class=PageNumberPagination
-    
+    filter_backends = [DjangoFilterBackend, OrderingFilter, MenuItemSearchFilter]
+    pagination_class = PriceKeysetPagination
+    field_columns = {
+        'category+': ['category__id', 'category__name'],
+        'rating_histogram': ['rating_%d_count' % rating for rating in RATING_CHOICES],
+    }
+    # أقصى عدد queries لكل action (بيتشيك في الـ tests وبالـ NPlusOneMiddleware، شوف querycheck.py)،
+    # للريكويست كله: بـ query الـ TokenVersion بتاعة الـ JWT لما الـ versions ما تكونش في الكاش
+    query_budgets = {'list': 3, 'retrieve': 1, 'create': 4}
+
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
             return [permissions.AllowAny()]
@@ -46,9 +158,12 @@ class MenuItemViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         category_id = self.kwargs.get("category_pk")  # لاحظ الاسم: category_pk
+        queryset = MenuItem.objects.all()
         if category_id:
-            return MenuItem.objects.filter(category_id=category_id)
-        return MenuItem.objects.select_related('category').all()
+            queryset = queryset.filter(category_id=category_id)
+        if self.expands('category'):
+            queryset = queryset.select_related('category')
+        return self.only_requested(queryset)
     
     def get_serializer_context(self):
         context = super().get_serializer_context()  # ياخد أي context افتراضي
@@ -57,22 +172,28 @@ class MenuItemViewSet(viewsets.ModelViewSet):
         return context
 
     
-@method_decorator(cache_page(60*10), name='list')  # cache 10 دقائق
-class CategoryViewSet(viewsets.ModelViewSet):
+@method_decorator(cache_page_versioned(60*60*6, CATEGORIES), name='list')
+class CategoryViewSet(FastReadMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     queryset = Category.objects.all()
+    query_budgets = {'list': 2, 'retrieve': 1}
+
+    def get_queryset(self):
+        return self.only_requested(super().get_queryset())
+
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
             return [permissions.AllowAny()]
         return [IsManager()]
     
     
-class CartViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet,mixins.CreateModelMixin,
+class CartViewSet(SparseFieldsMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet,mixins.CreateModelMixin,
                   mixins.DestroyModelMixin,
                   mixins.ListModelMixin,mixins.UpdateModelMixin):
     serializer_class = CartSerializer
     permission_classes = [permissions.IsAuthenticated]
     throttle_scope = "cart"
+    query_budgets = {'list': 4, 'retrieve': 3, 'create': 4}
 
    
     def get_permissions(self):
@@ -90,12 +211,23 @@ class CartViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet,mixins.Crea
         نتحكم الداتا اللي اليوزر يشوفها
         """
         user = self.request.user
-        if user.is_superuser or user.groups.filter(name="Manager").exists():
+        if is_manager(user):
             # الأدمن أو المانجر يشوفوا كل الكروت
-            return Cart.objects.all()
+            queryset = Cart.objects.order_by('id')
         else:
             # يوزر عادي يشوف بس الكارت بتاعه
-            return Cart.objects.filter(user=user)
+            queryset = Cart.objects.filter(user=user)
+
+        # joins والـ prefetch بتاعة الحقول المطلوبة بس (?fields=)
+        if self.expands('user'):
+            queryset = queryset.select_related('user')
+        if self.expands('items'):
+            queryset = queryset.with_items()
+        elif self.wants('items'):
+            queryset = queryset.prefetch_related(Prefetch('items', queryset=CartItem.objects.only('id', 'cart_id')))
+        if self.wants('total'):
+            queryset = queryset.with_total()
+        return queryset
 
     def perform_create(self, serializer):
         """
@@ -107,20 +239,42 @@ class CartItemViewSet(viewsets.ModelViewSet):
     serializer_class = CartItemSerializer
     permission_classes = [permissions.IsAuthenticated]
     throttle_scope = "cart"
+    # bulk: أكتر حاجة add على كارت جديد (get_or_create + قراية الكميات الحالية)
+    query_budgets = {'list': 2, 'retrieve': 3, 'create': 6, 'bulk': 7}
 
     def get_queryset(self):
         user = self.request.user
-        if user.is_superuser or user.groups.filter(name="Manager").exists():
-            return CartItem.objects.all()
-        return CartItem.objects.filter(cart__user=user)
+        queryset = CartItem.objects.with_subtotals().select_related('cart__user')
+        if is_manager(user):
+            return queryset
+        return queryset.filter(cart__user=user)
     
     def perform_create(self, serializer):
-        # جلب الكارت الخاص باليوزر
-        cart = Cart.objects.get(user=self.request.user)
+        # جلب الكارت الخاص باليوزر (ومعاه الـ user عشان cart_name في الـ response)
+        cart = Cart.objects.select_related('user').get(user=self.request.user)
         serializer.save(cart=cart)
 
+    @action(detail=False, methods=['post'], throttle_scope="cart")
+    def bulk(self, request):
+        """
+        POST /api/cart-items/bulk/ {"op": "add", "items": [{"menuitem_id": 1, "quantity": 2}, ...]}
+        كله ريكويست واحد (throttle واحد) بدل ريكويست لكل منتج، وبيرجع الكارت بعد التعديل.
+        """
+        serializer = CartBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        cart, _ = Cart.objects.get_or_create(user=request.user)
+        serializer.save(cart)
+
+        items = CartItem.objects.with_subtotals().select_related('cart__user').filter(cart=cart).order_by('id')
+        return Response(CartItemSerializer(items, many=True).data)
+
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
+        if request.query_params.get('stream') in ('1', 'true') and is_manager(request.user):
+            # المانجر بيصدّر كل الكروت: stream بدل ما نبني dict كبير في الميموري
+            return StreamingHttpResponse(
+                CartItemGroupedSerializer.stream(queryset), content_type='application/json'
+            )
         serializer = CartItemGroupedSerializer(queryset, many=False)
         return Response(serializer.data)
 
@@ -134,30 +288,46 @@ class CartItemViewSet(viewsets.ModelViewSet):
         except User.DoesNotExist:
             return Response({"detail": "User not found"}, status=404)
 
-        cart_items = CartItem.objects.filter(cart__user=user)
+        cart_items = CartItem.objects.with_subtotals().select_related('cart__user').filter(cart__user=user)
         serializer = CartItemSerializer(cart_items, many=True)
         return Response(serializer.data)
 
     
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
     throttle_scope = "order"
+    pagination_class = KeysetPagination
+    ordering_fields = ['created_at', 'total', 'status', 'user']
+    query_budgets = {'list': 3, 'retrieve': 3, 'create': 12, 'partial_update': 8, 'update': 8, 'success_payment': 7}
+    field_columns = {
+        'items': [],
+        'status_display': ['status'],
+        'delivery_crew_name': ['delivery_crew__username'],
+    }
+
+    @idempotent()
+    def create(self, request, *args, **kwargs):
+        # retry بنفس الـ Idempotency-Key بياخد نفس الأوردر من غير checkout تاني
+        return super().create(request, *args, **kwargs)
 
     @action(detail=True, methods=['POST'],throttle_scope="payment")
+    @idempotent()
     def pay(self, request, pk=None):
         order = self.get_object()
-        session = initiate_payment(order.id)   # ✅ خليها كده
-        if session:
-            return Response({"session_url": session.url}, status=status.HTTP_200_OK)
-        return Response({"error": "Failed to create payment session"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            session = initiate_payment(order)   # نداء الـ provider في thread pool بـ timeout
+        except PaymentFailed:
+            return Response({"error": "Failed to create payment session"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"session_url": session.url}, status=status.HTTP_200_OK)
 
 
     @action(detail=True, methods=['get'])
     def success_payment(self, request, pk=None):
         order = self.get_object()
         order.status = 1  # Delivered / Paid حسب الـ choices عندك
-        order.save()
+        with transaction.atomic():   # الـ status والـ sales rollups (signals) مع بعض
+            order.save()
         serializer = self.get_serializer(order)
         return Response({"msg": "Payment Successful ✅", "data": serializer.data})
      
@@ -165,11 +335,27 @@ class OrderViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        if user.is_superuser or user.groups.filter(name="Manager").exists():
-            return Order.objects.all()
-        elif user.groups.filter(name="Delivery_crew").exists():
-            return Order.objects.filter(delivery_crew=user)
-        return Order.objects.filter(user=user)
+        if is_manager(user):
+            queryset = Order.objects.all()
+        elif is_delivery_crew(user):
+            queryset = Order.objects.filter(delivery_crew=user)
+        else:
+            queryset = Order.objects.filter(user=user)
+        if self.action not in ('list', 'retrieve', 'success_payment'):
+            return queryset
+
+        # الـ items (والـ menuitems بتاعتها) والـ delivery crew بيتجابوا مع بعض بس لو مطلوبين.
+        # success_payment بيغيّر الـ status فالـ sales rollups محتاجة الـ items كاملة
+        if self.expands('items') or self.action == 'success_payment':
+            queryset = queryset.prefetch_related(Prefetch('items', queryset=OrderItem.objects.select_related('menuitem')))
+        elif self.wants('items'):
+            queryset = queryset.prefetch_related(Prefetch('items', queryset=OrderItem.objects.only('id', 'order_id')))
+        if self.wants('delivery_crew_name'):
+            queryset = queryset.select_related('delivery_crew')
+        if self.action == 'success_payment':
+            # الـ status المتقري لازم يبقى محمّل (Order.from_db) عشان الـ rollups تشوف التغيير
+            return queryset
+        return self.only_requested(queryset)
 
     def get_serializer_context(self):
         """
@@ -219,21 +405,29 @@ class DeliveryCrewGroupViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_404_NOT_FOUND)
 
 
-@method_decorator(cache_page(60*5), name='list')
-class MenuItemReviewViewSet(viewsets.ModelViewSet):
+@method_decorator(cache_page_versioned(60*60*6, REVIEWS), name='list')
+class MenuItemReviewViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     serializer_class = MenuItemReviewSerializer
     # السماح بالقراءة للجميع، لكن الإضافة / التعديل / الحذف للمستخدمين المسجلين فقط
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     throttle_scope = "review"
+    pagination_class = KeysetPagination
+    ordering_fields = ['created_at', 'rating']
+    query_budgets = {'list': 1, 'retrieve': 1, 'create': 5}
+    field_columns = {'user': ['user__username']}
 
     def get_queryset(self):
         # لو جاي من nested route (مثال: /api/menu-items/2/reviews/)
         menuitem_id = self.kwargs.get("menuitem_pk")
+        queryset = MenuItemReview.objects.all()
         if menuitem_id:
-            return MenuItemReview.objects.filter(menuitem_id=menuitem_id)
-        
+            queryset = queryset.filter(menuitem_id=menuitem_id)
         # لو جاي من /api/reviews/ → رجّع كل الريفيوهات
-        return MenuItemReview.objects.all()
+
+        # الـ user بيترجع كـ username (StringRelatedField) فبنجيبه في نفس الـ query
+        if self.wants('user'):
+            queryset = queryset.select_related('user')
+        return self.only_requested(queryset)
 
     def perform_create(self, serializer):
         # لو جاي من nested route لازم أجيب الـ menuitem
@@ -241,48 +435,106 @@ class MenuItemReviewViewSet(viewsets.ModelViewSet):
         if not menuitem_id:
             raise serializers.ValidationError("لازم تضيف الريفيو من خلال المنتج المحدد (/api/menu-items/<id>/reviews/).")
 
-        menuitem = get_object_or_404(MenuItem, id=menuitem_id)
+        # الـ menuitem_id اللي في الـ body اتجاب في الـ validation، والـ URL هو اللي بيحدد
+        menuitem = serializer.validated_data.get('menuitem')
+        if menuitem is None or str(menuitem.pk) != str(menuitem_id):
+            menuitem = get_object_or_404(MenuItem, id=menuitem_id)
 
         # امنع نفس اليوزر يكتب أكتر من ريفيو على نفس الـ menuitem
         if MenuItemReview.objects.filter(menuitem=menuitem, user=self.request.user).exists():
             raise serializers.ValidationError("لقد قمت بكتابة مراجعة لهذا العنصر بالفعل.")
 
-        serializer.save(user=self.request.user, menuitem=menuitem)
-
-
-stripe.api_key = settings.STRIPE_SECRET_KEY
-
-def initiate_payment(order_id):
-    try:
-        order = Order.objects.get(id=order_id)
-        order_items = OrderItem.objects.filter(order=order)
-
-        line_items = []
-        for item in order_items:
-            line_items.append({
-                "price_data": {
-                    "currency": "usd",  # غيّرها للعملة اللي عايزها (مثلا egp)
-                    "product_data": {
-                        "name": item.menuitem.title,
-                        "description": f"Quantity: {item.quantity}",
-                    },
-                    "unit_amount": int(item.unit_price * 100),  # Stripe بيحسب بالـ cents
-                },
-                "quantity": item.quantity,
-            })
-
-        session = stripe.checkout.Session.create(
-            payment_method_types=["card"],
-            line_items=line_items,
-            metadata={
-                "order_id": order.id
-            },
-            customer_email=order.user.email,
-            mode="payment",
-            success_url=f"http://127.0.0.1:8000/api/orders/{order.id}/success_payment",
-            cancel_url=f"http://127.0.0.1:8000/api/orders/{order.id}/cancel_payment",
-        )
-        return session
-    except Exception as e:
-        print("Error creating Stripe session:", e)
-        return None
\ No newline at end of file
+        with transaction.atomic():
+            review = serializer.save(user=self.request.user, menuitem=menuitem)
+            MenuItem.objects.filter(pk=menuitem.pk).apply_rating_change(added=review.rating)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            old_rating = serializer.instance.rating
+            review = serializer.save()
+            if review.rating != old_rating:
+                MenuItem.objects.filter(pk=review.menuitem_id).apply_rating_change(added=review.rating, removed=old_rating)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            MenuItem.objects.filter(pk=instance.menuitem_id).apply_rating_change(removed=instance.rating)
+
+
+class CatalogView(APIView):
+    """
+    GET  /api/catalog/<resource>/<csv|ndjson>/  → export كـ stream (server-side iterator)
+    POST /api/catalog/<resource>/<csv|ndjson>/  → import من body الريكويست أو ملف multipart اسمه file
+    resource = menu-items أو categories
+    """
+    permission_classes = [IsManager]
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if kwargs['resource'] not in catalog.RESOURCES or kwargs['fmt'] not in catalog.FORMATS:
+            raise NotFound()
+
+    def get(self, request, resource, fmt):
+        response = StreamingHttpResponse(catalog.export_catalog(resource, fmt), content_type=catalog.CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = f'attachment; filename="{resource}.{fmt}"'
+        return response
+
+    def post(self, request, resource, fmt):
+        if request.content_type.startswith('multipart/'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                raise ValidationError({'file': 'This field is required.'})
+            chunks = upload.chunks()
+        else:
+            # body الريكويست نفسه بيتقرا كـ stream من غير ما DRF تعمله parse
+            chunks = iter(lambda: request._request.read(64 * 1024), b'')
+        importer = catalog.CatalogImporter(resource)
+        try:
+            importer.run(catalog.decode_lines(chunks), fmt)
+        except (UnicodeDecodeError, csv.Error) as e:
+            # الـ batches اللي قبل الغلط اتحفظت (والكاش اتهمل)، فبنرجع لحد فين وصلنا
+            return Response({**importer.summary(), 'detail': f'Malformed file: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(importer.summary(), status=status.HTTP_200_OK)
+
+
+class CacheStatsView(APIView):
+    """hit/miss/eviction للـ LRU المحلي في الـ worker ده (عشان نظبط LOCAL_MAX_BYTES)"""
+    permission_classes = [IsManager]
+
+    def get(self, request):
+        if not hasattr(cache, 'stats'):
+            return Response({"detail": "Cache backend does not expose stats."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(cache.stats())
+
+
+class SalesAnalyticsView(APIView):
+    """
+    GET /api/analytics/sales/?start=2026-01-01&end=2026-03-31&group_by=day|category|menuitem
+    الإيرادات والكميات وعدد الأوردرات (والمتسلم منها) من جداول الـ sales rollups بدل الأوردرات.
+    """
+    permission_classes = [IsManager]
+    query_budgets = {'get': 3}
+
+    def get(self, request):
+        params = SalesReportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return Response(sales_report(**params.validated_data))
+
+
+class MetricsView(APIView):
+    """latency و queries و cache_page و throttles لكل route في الـ worker ده (Prometheus text format)"""
+    permission_classes = [CanReadMetrics]
+
+    def get(self, request):
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class RevokeTokensView(APIView):
+    """POST /auth/jwt/revoke/: logout من كل الأجهزة (كل الـ JWTs بتاعة اليوزر بتترفض)"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        revoke_tokens([request.user.pk])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+